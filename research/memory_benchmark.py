@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+
+# Run from the repo root: python research/memory_benchmark.py [documents] [queries]
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+DIM = 384           # all-MiniLM-L6-v2
+BATCH = 100         # Documents per upsert (store_many-sized batches)
+N_RESULTS = 9       # 3 results x candidate_multiplier 3, as MemoryModule queries
+
+STARTUP_SNIPPET = """
+import sys, time
+start = time.time()
+sys.path.insert(0, {root!r})
+from src.vector_store import make_store
+store = make_store({backend!r}, {path!r})
+store.count()
+opened = time.time() - start
+# What the bot pays on boot: the embedder is warmed in startup_event
+from src.core.embeddings import EmbeddingService
+warmed = EmbeddingService().warm()
+print(opened, time.time() - start if warmed else "nan", "chromadb" in sys.modules)
+"""
+
+def synthetic_data(n_documents, n_queries, seed=0):
+    """Random unit vectors stand in for embeddings, so only the storage layer is measured."""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n_documents, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = rng.normal(size=(n_queries, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    now = time.time()
+    metadatas = [{"source": "Benchmark", "ts": now - i * 3600.0} for i in range(n_documents)]
+    return vectors, queries, metadatas
+
+def measure_startup(backend, path, runs=3):
+    """
+    Fresh interpreter: import + open an existing store, then load the embedding model (what a
+    process restart pays). Returns (store seconds, cold start seconds, chromadb imported);
+    the cold start is NaN if the model could not be loaded (e.g. offline first run).
+    """
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    timings = []
+    for _ in range(runs):
+        code = STARTUP_SNIPPET.format(root=root, backend=backend, path=path)
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        opened, cold, chromadb = output.strip().splitlines()[-1].split()
+        timings.append((float(opened), float(cold), chromadb == "True"))
+    return min(timings)
+
+def benchmark_backend(backend, vectors, queries, metadatas):
+    from src.vector_store import make_store
+    path = tempfile.mkdtemp(prefix=f"sentix_{backend}_")
+    try:
+        store = make_store(backend, path)
+        ids = [f"doc{i}" for i in range(len(vectors))]
+        documents = [f"Synthetic news event {i}" for i in range(len(vectors))]
+
+        start = time.time()
+        for i in range(0, len(ids), BATCH):
+            store.upsert(ids[i:i + BATCH], documents[i:i + BATCH], vectors[i:i + BATCH], metadatas[i:i + BATCH])
+        insert = time.time() - start
+
+        latencies = []
+        for query in queries:
+            start = time.time()
+            store.query(query[None, :], N_RESULTS)
+            latencies.append(time.time() - start)
+
+        # Last 30 days only (metadata-filtered path)
+        min_ts = time.time() - 30 * 86400
+        start = time.time()
+        for query in queries:
+            store.query(query[None, :], N_RESULTS, min_ts=min_ts)
+        filtered = (time.time() - start) / len(queries)
+
+        result = {
+            "insert": insert,
+            "query_p50": float(np.percentile(latencies, 50)),
+            "query_p95": float(np.percentile(latencies, 95)),
+            "query_filtered": filtered,
+        }
+        result["startup"], result["cold_start"], result["chromadb"] = measure_startup(backend, path)
+        return result
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+def run_benchmark(n_documents=5000, n_queries=200):
+    print("=" * 98)
+    print("SENTIX MEMORY BACKEND BENCHMARK")
+    print("=" * 98)
+    print(f"Documents: {n_documents} (batches of {BATCH}) | Queries: {n_queries} | Dim: {DIM} | k: {N_RESULTS}")
+    print("Embeddings are synthetic: insert and query timings exclude the embedding model.")
+    print("Store: import + open the store. Cold: store + loading the embedding model (as on boot).")
+    print("-" * 98)
+
+    vectors, queries, metadatas = synthetic_data(n_documents, n_queries)
+
+    print(f"{'Backend':<10} | {'Insert (s)':>10} | {'Query p50 (ms)':>14} | {'p95 (ms)':>8} | {'30d (ms)':>8} | "
+          f"{'Store (s)':>9} | {'Cold (s)':>8} | {'chromadb':>8}")
+    print("-" * 98)
+    results = {}
+    for backend in ("chroma", "numpy"):
+        r = benchmark_backend(backend, vectors, queries, metadatas)
+        results[backend] = r
+        print(f"{backend:<10} | {r['insert']:>10.3f} | {r['query_p50'] * 1000:>14.2f} | {r['query_p95'] * 1000:>8.2f} | "
+              f"{r['query_filtered'] * 1000:>8.2f} | {r['startup']:>9.3f} | {r['cold_start']:>8.3f} | "
+              f"{'imported' if r['chromadb'] else 'no':>8}")
+    print("-" * 98)
+
+    for metric in ("insert", "query_p50", "startup", "cold_start"):
+        if np.isnan(results["chroma"][metric]) or np.isnan(results["numpy"][metric]):
+            print(f"{metric}: not measured (embedding model unavailable)")
+            continue
+        ratio = results["chroma"][metric] / max(results["numpy"][metric], 1e-9)
+        print(f"{metric}: numpy is {ratio:.1f}x {'faster' if ratio >= 1 else 'slower'} than chroma")
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run_benchmark(*args)
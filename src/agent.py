@@ -3,6 +3,9 @@ import json
 import logging
 from dotenv import load_dotenv
 from src.core.llm import call_llm
+from src.core.jsonutil import parse_or_fix
+from src.core.prompt import AliasMap
+from src.grounding import MIN_CLAIM_COVERAGE, PreCriticStats, check_claims, claim_coverage
 
 load_dotenv()
 logger = logging.getLogger("AnalysisAgent")
@@ -29,11 +32,38 @@ LOCALIZATION = {
     }
 }
 
+# Structured-output schema for the analysis draft (enforced by Gemini, see call_llm response_schema)
+ANALYSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "sentiment": {"type": "STRING", "enum": ["BULLISH", "BEARISH", "NEUTRAL"]},
+        "reasoning": {"type": "STRING"},
+        "tweet": {"type": "STRING"},
+        "knowledge_base_entry": {"type": "STRING"},
+        "hallucination_check": {"type": "ARRAY", "items": {"type": "STRING"}}
+    },
+    "required": ["sentiment", "reasoning", "tweet", "knowledge_base_entry", "hallucination_check"]
+}
+
+# Batch mode: one analysis per event, tagged with the event's id
+BATCH_ANALYSIS_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": dict({"id": {"type": "STRING"}}, **ANALYSIS_SCHEMA["properties"]),
+        "required": ["id"] + ANALYSIS_SCHEMA["required"]
+    }
+}
+
 class AnalysisAgent:
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
         self.language = "en"  # Default
         self.critic_enabled = True # Default
+        self.precheck_stats = PreCriticStats()  # How often the local claim check skips the critic
+        self.batch_size = 3 # Events analyzed per batch call (config.json "analysis_batch")
+        self.cycle_interval_hours = 4 # Hours between scheduled cycles (one publishing slot each)
+        self.batch_max_age_hours = 12 # Queued analyses older than this are not published
 
         # Load Configuration
         self._load_config()
@@ -49,6 +79,10 @@ class AnalysisAgent:
                     config = json.load(f)
                     self.language = config.get("language", "en")
                     self.critic_enabled = config.get("critic_enabled", True)
+                    batch = config.get("analysis_batch", {})
+                    self.batch_size = batch.get("size", self.batch_size)
+                    self.cycle_interval_hours = batch.get("cycle_interval_hours", self.cycle_interval_hours)
+                    self.batch_max_age_hours = batch.get("max_age_hours", self.batch_max_age_hours)
 
                     if self.language not in LOCALIZATION:
                         logger.warning(f"Language '{self.language}' not supported. Defaulting to 'en'.")
@@ -58,6 +92,16 @@ class AnalysisAgent:
         except Exception as e:
             logger.error(f"Error loading config.json: {e}. Using defaults.")
 
+        # One queued analysis is published per cycle, so the last of a batch goes out
+        # (size - 1) cycles after the first; one more cycle of slack covers a failed post
+        min_age = self.cycle_interval_hours * self.batch_size
+        if self.batch_max_age_hours < min_age:
+            logger.warning(
+                f"analysis_batch.max_age_hours ({self.batch_max_age_hours}) would expire queued analyses before their slot. "
+                f"Using {min_age}h ({self.batch_size} x {self.cycle_interval_hours}h cycles)."
+            )
+            self.batch_max_age_hours = min_age
+
     def analyze_situation(self, verified_event, whale_data, historical_context):
         """
         Analyzes a SINGLE VERIFIED EVENT.
@@ -75,17 +119,9 @@ class AnalysisAgent:
         topic = verified_event.get('title', 'Unknown Topic')
         score = verified_event.get('source_count', 0)
         sources = verified_event.get('sources', [])
-        facts = verified_event.get('facts', [])
 
         # Prepare Facts Text for Prompt
-        facts_text = ""
-        for f in facts:
-            facts_text += f"- {f['fact']} (Verified by {', '.join(f['sources'])})\n"
-
-        # Fallback if no facts (shouldn't happen if pipeline worked, but safe to keep items)
-        if not facts_text:
-            for i, item in enumerate(verified_event.get('items', [])):
-                facts_text += f"- Article {i+1}: {item.get('title')} - {item.get('summary')}\n"
+        facts_text = self._format_facts(verified_event)
 
         # 2. Construct Main Prompt
         prompt = f"""
@@ -142,14 +178,16 @@ class AnalysisAgent:
         
         try:
             # Generate Initial Draft using Core LLM (Retry/Fallback handled there)
-            initial_json = call_llm(prompt, model='gemini-3-flash-preview')
+            initial_json = call_llm(prompt, stage='analysis', response_schema=ANALYSIS_SCHEMA)
 
             if not initial_json:
                 return self._fallback_response("LLM Rate Limited or Failed")
 
             # 3. Critic Loop (Self-Correction)
             if self.critic_enabled:
-                final_json = self._critic_loop(initial_json, facts_text, prompt)
+                # Evidence for the local pre-critic check: facts, market/whale data, sources and score
+                evidence = [facts_text, whale_data, topic, ", ".join(sources), f"Verified by {score} sources"]
+                final_json = self._critic_loop(initial_json, facts_text, prompt, evidence)
                 return final_json
 
             return initial_json
@@ -158,19 +196,180 @@ class AnalysisAgent:
             logger.error(f"Gemini API Error: {e}")
             return self._fallback_response(str(e))
 
-    def _critic_loop(self, draft_json_str, facts_text, original_prompt):
+    def analyze_batch(self, verified_events, whale_data, historical_contexts=None):
         """
-        Critic Option B: Validates the generated tweet against verified facts.
+        Analyzes SEVERAL VERIFIED EVENTS in one structured LLM call.
+        `historical_contexts` maps event_id -> RAG context.
+        Returns {event_id: {sentiment, reasoning, tweet, knowledge_base_entry, hallucination_check}}
+        for the events the model covered ({} on failure). The critic does not run here: with the
+        critic enabled each analysis carries a "critic_context" for review_analysis(), so only
+        the analyses that actually get published cost a critic call.
         """
-        logger.info("Running Critic Loop...")
+        if not self.api_key or not verified_events:
+            return {}
+
+        loc = LOCALIZATION.get(self.language, LOCALIZATION["en"])
+        headers = loc["headers"]
+        prompt_instruction = loc["prompt_instruction"]
+        historical_contexts = historical_contexts or {}
+
+        aliases = AliasMap("e")
+        blocks = []
+        for event in verified_events:
+            blocks.append(f"""
+        [EVENT id={aliases.alias(event.get('event_id'))}]
+        Topic: {event.get('title', 'Unknown Topic')}
+        Consensus Score: {event.get('source_count', 0)} Sources (Sources: {', '.join(event.get('sources', []))})
+        Verified Facts:
+        {self._format_facts(event)}
+        Historical RAG Context: "{historical_contexts.get(event.get('event_id'), '')}"
+""")
+
+        prompt = f"""
+        You are 'Sentix', an elite crypto sentiment analyst AI.
+
+        TASK: Analyze EACH of the following VERIFIED EVENTS independently to generate trusted trading signals.
+        {''.join(blocks)}
+        **SHARED MARKET CONTEXT:**
+        Whale Data: "{whale_data}"
+
+        INSTRUCTIONS (apply to every event separately):
+        1. **Fact Checking & Citations:**
+           - Base each analysis STRICTLY on that event's "Verified Facts".
+           - **CRITICAL:** You MUST append a short citation for your main claims, e.g. "Bitcoin hits $100k [Source: CoinDesk]".
+
+        2. **Synthesis & Persona:**
+           - Adopt a **Crypto-Native Persona**: Be sharp, insightful, and engaging. Avoid robotic language.
+           - Explicitly state the "Consensus Level" based on the event's Consensus Score.
+
+        3. **Analysis:**
+           - Determine the sentiment (BULLISH, BEARISH, or NEUTRAL).
+           - Focus on the **IMPACT** (Why this matters for price/market).
+           - Generate a "Knowledge Base Entry" (RAG Context).
+           - {prompt_instruction}
+
+        TWEET FORMAT:
+        {headers['summary']}: [Synthesized Event] (Verified by [Consensus Score] sources)
+
+        {headers['impact']}: [Deep analysis of impact + Citations]
+
+        {headers['sentiment']}: [BULLISH/BEARISH/NEUTRAL] [Engaging closing line]
+
+        (Ensure total length < 280 chars. Use hashtags like #BTC #Crypto #Sentix at the end.)
+
+        OUTPUT FORMAT (JSON array, one entry per event, using the event's id):
+        [
+            {{
+                "id": "e1",
+                "sentiment": "BULLISH/BEARISH/NEUTRAL",
+                "reasoning": "Explain your synthesis of the cluster.",
+                "tweet": "The formatted tweet string.",
+                "knowledge_base_entry": "The long RAG memory sentence.",
+                "hallucination_check": ["List", "of", "key", "facts", "claimed"]
+            }}
+        ]
+
+        Respond ONLY with the JSON string.
+        """
+
         try:
-            # Parse Draft
-            clean_json = draft_json_str.replace("```json", "").replace("```", "").strip()
-            draft = json.loads(clean_json)
-            tweet = draft.get("tweet", "")
+            raw = call_llm(prompt, stage='analysis', response_schema=BATCH_ANALYSIS_SCHEMA)
         except Exception as e:
-            logger.warning(f"Critic failed to parse draft: {e}")
+            logger.error(f"Gemini API Error: {e}")
+            return {}
+
+        parsed = parse_or_fix(raw)
+        by_id = {event.get('event_id'): event for event in verified_events}
+        results = {}
+        for item in parsed if isinstance(parsed, list) else []:
+            if not isinstance(item, dict) or not item.get("tweet"):
+                continue
+            event_id = aliases.resolve(item.pop("id", None))
+            event = by_id.get(event_id)
+            if event is None:
+                continue
+            if self.critic_enabled:
+                # Reviewed by review_analysis() when its publishing slot comes up
+                facts_text = self._format_facts(event)
+                score = event.get('source_count', 0)
+                item["critic_context"] = {
+                    "facts": facts_text,
+                    "evidence": [facts_text, whale_data, event.get('title'), ", ".join(event.get('sources', [])),
+                                 f"Verified by {score} sources"]
+                }
+            results[event_id] = item
+
+        logger.info(f"Batch analysis covered {len(results)}/{len(verified_events)} events in one call.")
+        return results
+
+    def review_analysis(self, analysis):
+        """
+        Runs the critic on a batch analysis right before it is published.
+        Returns the (possibly rewritten) analysis without its "critic_context".
+        """
+        analysis = dict(analysis)
+        context = analysis.pop("critic_context", None)
+        if not context or not self.critic_enabled:
+            return analysis
+
+        reviewed = parse_or_fix(self._critic_loop(json.dumps(analysis), context["facts"], None, context["evidence"]))
+        if isinstance(reviewed, dict) and reviewed.get("tweet"):
+            return reviewed
+        return analysis
+
+    def _format_facts(self, verified_event):
+        facts_text = ""
+        for f in verified_event.get('facts', []):
+            facts_text += f"- {f['fact']} (Verified by {', '.join(f['sources'])})\n"
+
+        # Fallback if no facts (shouldn't happen if pipeline worked, but safe to keep items)
+        if not facts_text:
+            for i, item in enumerate(verified_event.get('items', [])):
+                facts_text += f"- Article {i+1}: {item.get('title')} - {item.get('summary')}\n"
+        return facts_text
+
+    def _critic_loop(self, draft_json_str, facts_text, original_prompt, evidence=None):
+        """
+        Critic Option B: Validates the generated tweet against verified facts.
+        A deterministic check runs first: numbers, prices, percentages, tickers and names in the
+        tweet are matched against `evidence`. The critic LLM call is skipped only if all of them
+        are grounded and they make up most of the tweet (see MIN_CLAIM_COVERAGE), so prose the
+        check can't read (Thai, qualitative claims) is always reviewed. Otherwise the critic is
+        pointed at the unmatched claims first.
+        """
+        logger.info("Running Critic Loop...")
+        # Parse Draft (tolerates fences, trailing commas and truncation)
+        draft = parse_or_fix(draft_json_str)
+        if not isinstance(draft, dict) or not draft:
+            logger.warning("Critic failed to parse draft.")
             return draft_json_str
+        tweet = draft.get("tweet", "")
+
+        # Deterministic Pre-Critic Check
+        grounded, unmatched = check_claims(tweet, evidence or [facts_text])
+        coverage = claim_coverage(tweet, grounded)
+        skipped = bool(grounded) and not unmatched and coverage >= MIN_CLAIM_COVERAGE
+        self.precheck_stats.record(skipped, len(unmatched))
+        stats = self.precheck_stats.snapshot()
+        if skipped:
+            logger.info(
+                f"Pre-critic: all {len(grounded)} claims grounded ({coverage:.0%} of the tweet). Skipping critic call "
+                f"(skip rate {stats['skip_rate']:.0%} over {stats['checks']} tweets)."
+            )
+            return draft_json_str
+        logger.info(
+            f"Pre-critic: {len(unmatched)} unmatched claims: {', '.join(c['text'] for c in unmatched) or 'none found'}; "
+            f"claims cover {coverage:.0%} of the tweet. "
+            f"Running critic (skip rate {stats['skip_rate']:.0%} over {stats['checks']} tweets)."
+        )
+        if unmatched:
+            unmatched_text = "\n".join(f"- {c['text']} ({c['type']})" for c in unmatched)
+            focus = f"""
+        UNVERIFIED CLAIMS (not found in the facts; everything else in the tweet already matched):
+{unmatched_text}
+"""
+        else:
+            focus = ""
 
         critic_prompt = f"""
         You are a STRICT FACT-CHECKING CRITIC.
@@ -180,9 +379,9 @@ class AnalysisAgent:
 
         DRAFT TWEET (To Check):
         {tweet}
-
+        {focus}
         TASK:
-        1. Compare the tweet against the Verified Facts.
+        1. Compare the tweet against the Verified Facts, starting with any unverified claims listed above.
         2. Check for HALLUCINATIONS (claims not in facts) or Exaggerations.
         3. If the tweet is 100% supported by facts, return ONLY the string "PASS".
         4. If there are errors, REWRITE the tweet to be accurate and engaging.
@@ -193,7 +392,7 @@ class AnalysisAgent:
         """
 
         try:
-            critique = call_llm(critic_prompt, model='gemini-3-flash-preview')
+            critique = call_llm(critic_prompt, stage='critic')
 
             if not critique:
                 logger.warning("Critic LLM call failed. Proceeding with original draft.")
@@ -231,7 +430,8 @@ class AnalysisAgent:
             "sentiment": "NEUTRAL",
             "reasoning": f"AI Model unavailable ({error_msg}). Defaulting to neutral.",
             "tweet": fallback_tweet,
-            "hallucination_check": []
+            "hallucination_check": [],
+            "fallback": True  # Generic placeholder, not an analysis of the event
         })
 
 if __name__ == "__main__":
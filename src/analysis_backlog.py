@@ -0,0 +1,49 @@
+import logging
+from datetime import datetime, timedelta
+from src.models import PendingAnalysis
+
+logger = logging.getLogger("AnalysisBacklog")
+
+class AnalysisBacklog:
+    """
+    Analyses produced by a batch agent call that are waiting for a publishing slot.
+    Later cycles publish from here without new LLM calls; entries older than
+    `max_age_hours` are expired (their market context is stale).
+    The bot only refills the backlog once no pending entry is left, so queued items never go
+    through the pipeline twice. An entry's items are only recorded as processed once it is
+    published; expired entries release theirs for a fresh analysis.
+    """
+    def __init__(self, max_age_hours=6):
+        self.max_age = timedelta(hours=max_age_hours)
+
+    def push_many(self, db, entries):
+        """Queues analyses ({event_id, topic, symbol, source_count, sources, items, analysis}). Caller commits."""
+        for entry in entries:
+            db.add(PendingAnalysis(**entry))
+        if entries:
+            logger.info(f"Queued {len(entries)} analyses for upcoming publishing slots.")
+
+    def expire_stale(self, db):
+        cutoff = datetime.utcnow() - self.max_age
+        expired = db.query(PendingAnalysis).filter(
+            PendingAnalysis.status == "PENDING",
+            PendingAnalysis.created_at < cutoff
+        ).update({"status": "EXPIRED"}, synchronize_session=False)
+        if expired:
+            logger.info(f"Expired {expired} stale queued analyses. Their items are released for re-analysis.")
+        return expired
+
+    def next(self, db):
+        """Best pending analysis (most sources, then newest), or None."""
+        self.expire_stale(db)
+        return db.query(PendingAnalysis).filter(PendingAnalysis.status == "PENDING").order_by(
+            PendingAnalysis.source_count.desc(), PendingAnalysis.created_at.desc(), PendingAnalysis.id.desc()
+        ).first()
+
+    def mark_published(self, entry):
+        entry.status = "PUBLISHED"
+
+    def pending_count(self, db):
+        """Number of publishable entries (expires stale entries first)."""
+        self.expire_stale(db)
+        return db.query(PendingAnalysis).filter(PendingAnalysis.status == "PENDING").count()
@@ -0,0 +1,182 @@
+import hashlib
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import numpy as np
+from src.core.llm import call_llm
+from src.core.jsonutil import parse_or_fix
+from src.core.prompt import compact_json, strip_html
+
+logger = logging.getLogger("Clustering")
+
+# Similarity Thresholds (cosine)
+SAME_EVENT_THRESHOLD = 0.82   # At or above: same event, no LLM needed
+AMBIGUOUS_THRESHOLD = 0.65    # Between this and SAME_EVENT_THRESHOLD: ask the LLM
+TIME_WINDOW_HOURS = 24        # Articles further apart than this are never grouped
+MAX_ADJUDICATIONS = 40        # Cap on borderline pairs sent to the LLM per cycle
+
+def _get_default_embed_fn():
+    # Shared with the RAG memory, so titles are embedded once and cached on disk
+    from src.core.embeddings import get_embedding_service
+    return get_embedding_service()
+
+def _article_text(article):
+    return f"{article.get('title', '')}. {strip_html(article.get('summary', ''))[:300]}"
+
+def _parse_published(value):
+    """Best-effort parse of RSS (RFC 822) or ISO timestamps. Returns None if unknown."""
+    if not value:
+        return None
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            dt = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+def similarity_matrix(vectors):
+    """Vectorized cosine similarity of all row pairs."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+    return matrix @ matrix.T
+
+def time_window_mask(articles, hours=TIME_WINDOW_HOURS):
+    """Boolean matrix: True where two articles are within the time window (or a date is unknown)."""
+    stamps = [_parse_published(a.get('published')) for a in articles]
+    known = np.array([s is not None for s in stamps])
+    seconds = np.array([s.timestamp() if s else 0.0 for s in stamps])
+    within = np.abs(seconds[:, None] - seconds[None, :]) <= hours * 3600
+    return within | ~known[:, None] | ~known[None, :]
+
+def adjudicate_pairs(articles, pairs):
+    """Asks the LLM whether each borderline pair describes the same real-world event."""
+    if not pairs:
+        return []
+
+    payload = [
+        {
+            "pair": n,
+            "a": {"t": articles[i].get('title'), "d": strip_html(articles[i].get('summary', ''))[:200]},
+            "b": {"t": articles[j].get('title'), "d": strip_html(articles[j].get('summary', ''))[:200]}
+        }
+        for n, (i, j) in enumerate(pairs)
+    ]
+
+    prompt = f"""
+You are a JSON API.
+
+Return ONLY valid JSON.
+No explanation. No markdown.
+
+For each pair of news articles, decide if both describe the SAME concrete real-world occurrence
+(same organization, same specific action, same object, same timeframe).
+Same topic, analysis, opinion or market reaction is NOT the same event.
+
+Pairs:
+{compact_json(payload)}
+
+Return a JSON array of booleans, one per pair, in the same order:
+[true, false, ...]
+"""
+    raw = call_llm(prompt, stage='events')
+    decisions = parse_or_fix(raw)
+    if not isinstance(decisions, list) or len(decisions) != len(pairs):
+        logger.warning("Adjudication response invalid. Treating borderline pairs as different events.")
+        return [False] * len(pairs)
+    return [bool(d) for d in decisions]
+
+def write_titles(clusters):
+    """Asks the LLM for one factual title per multi-article cluster. Returns {index: title}."""
+    payload = [
+        {"cluster": n, "headlines": [a.get('title') for a in members]}
+        for n, members in enumerate(clusters) if len(members) > 1
+    ]
+    if not payload:
+        return {}
+
+    prompt = f"""
+You are a JSON API.
+
+Return ONLY valid JSON.
+No explanation. No markdown.
+
+Each cluster contains headlines describing the same real-world event.
+Write one clear factual description of what happened for each cluster.
+
+Clusters:
+{compact_json(payload)}
+
+Return a JSON object mapping cluster number to title:
+{{"0": "title", "3": "title"}}
+"""
+    raw = call_llm(prompt, stage='events')
+    titles = parse_or_fix(raw)
+    if not isinstance(titles, dict):
+        return {}
+    return {int(k): v for k, v in titles.items() if str(k).isdigit() and isinstance(v, str)}
+
+def cluster_articles(articles, embed_fn=None, adjudicate=True, llm_titles=False):
+    """
+    Groups articles into events locally using sentence embeddings.
+    Returns the same structure as resolve_events: [{event_id, title, articles: [ids]}].
+    """
+    if not articles:
+        return []
+
+    embed_fn = embed_fn or _get_default_embed_fn()
+    vectors = embed_fn([_article_text(a) for a in articles])
+
+    sims = similarity_matrix(vectors)
+    allowed = time_window_mask(articles)
+    upper = np.triu(np.ones_like(sims, dtype=bool), k=1) & allowed
+
+    confident = np.argwhere(upper & (sims >= SAME_EVENT_THRESHOLD))
+    borderline = np.argwhere(upper & (sims >= AMBIGUOUS_THRESHOLD) & (sims < SAME_EVENT_THRESHOLD))
+
+    links = [tuple(p) for p in confident.tolist()]
+
+    if adjudicate and len(borderline):
+        # Most similar borderline pairs first, capped to keep the prompt small
+        ordered = sorted(borderline.tolist(), key=lambda p: sims[p[0], p[1]], reverse=True)[:MAX_ADJUDICATIONS]
+        logger.info(f"Adjudicating {len(ordered)} borderline article pairs with LLM...")
+        decisions = adjudicate_pairs(articles, ordered)
+        links.extend(tuple(p) for p, same in zip(ordered, decisions) if same)
+
+    # Union-Find over accepted links
+    parent = list(range(len(articles)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in links:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    grouped = {}
+    for idx, article in enumerate(articles):
+        grouped.setdefault(find(idx), []).append(article)
+    clusters = [grouped[root] for root in sorted(grouped)]
+
+    titles = write_titles(clusters) if llm_titles else {}
+
+    events = []
+    for n, members in enumerate(clusters):
+        ids = [a.get('id', a.get('link')) for a in members]
+        events.append({
+            "event_id": "evt_" + hashlib.md5("|".join(sorted(ids)).encode()).hexdigest()[:10],
+            "title": titles.get(n, members[0].get('title')),
+            "articles": ids
+        })
+
+    logger.info(f"Local clustering: {len(articles)} articles -> {len(events)} events.")
+    return events
@@ -0,0 +1,158 @@
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger("CircuitBreaker")
+
+CLOSED = "CLOSED"         # Normal operation
+OPEN = "OPEN"             # Model is skipped (callers go straight to the fallback)
+HALF_OPEN = "HALF_OPEN"   # Cooldown over; a limited number of probe calls decide the next state
+
+class CircuitBreaker:
+    """
+    Per-model breaker. Trips on consecutive rate limits, on a high error rate or on a
+    high share of slow calls over a sliding window. All transitions are lock-protected.
+    """
+    def __init__(self, model, consecutive_threshold=4, window_size=20, min_calls=8,
+                 error_rate_threshold=0.5, slow_call_seconds=120, slow_rate_threshold=0.5,
+                 cooldown_seconds=600, half_open_probes=1):
+        self.model = model
+        self.consecutive_threshold = consecutive_threshold
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_until = 0
+        self.last_trip_reason = None
+        self.trips = 0
+        self._probes_in_flight = 0
+        self._window = deque(maxlen=window_size)  # (ok, latency_seconds)
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """True if a call to this model may be sent now (reserves a probe slot when HALF_OPEN)."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.time() < self.opened_until:
+                    return False
+                self._transition(HALF_OPEN, "cooldown expired")
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def is_open(self):
+        """True while the breaker is OPEN and cooling down (does not reserve a probe)."""
+        with self._lock:
+            return self.state == OPEN and time.time() < self.opened_until
+
+    def cancel_probe(self):
+        """Releases a HALF_OPEN probe slot whose call was cancelled before completing."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def latency_percentile(self, q, min_samples=5):
+        """q-quantile of recent successful call latencies, or None with too few samples."""
+        with self._lock:
+            latencies = sorted(latency for ok, latency in self._window if ok)
+        if len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def record_success(self, latency):
+        with self._lock:
+            self._window.append((True, latency))
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._window.clear()
+                self._transition(CLOSED, "probe succeeded")
+                return
+            self._check_rates()
+
+    def record_failure(self, latency=0.0, rate_limited=False):
+        with self._lock:
+            self._window.append((False, latency))
+            if rate_limited:
+                self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._trip("probe failed")
+                return
+            if self.state == CLOSED and self.consecutive_failures >= self.consecutive_threshold:
+                self._trip(f"{self.consecutive_failures} consecutive rate limits")
+                return
+            self._check_rates()
+
+    def _check_rates(self):
+        # Caller holds the lock
+        if self.state != CLOSED or len(self._window) < self.min_calls:
+            return
+        total = len(self._window)
+        error_rate = sum(1 for ok, _ in self._window if not ok) / total
+        slow_rate = sum(1 for _, latency in self._window if latency >= self.slow_call_seconds) / total
+        if error_rate >= self.error_rate_threshold:
+            self._trip(f"error rate {error_rate:.0%}")
+        elif slow_rate >= self.slow_rate_threshold:
+            self._trip(f"slow call rate {slow_rate:.0%}")
+
+    def _trip(self, reason):
+        # Caller holds the lock
+        self.opened_until = time.time() + self.cooldown_seconds
+        self.last_trip_reason = reason
+        self.trips += 1
+        self._transition(OPEN, reason)
+
+    def _transition(self, state, reason):
+        # Caller holds the lock
+        if state == self.state:
+            return
+        log = logger.error if state == OPEN else logger.info
+        log(f"Circuit for {self.model}: {self.state} -> {state} ({reason}).")
+        self.state = state
+        if state != HALF_OPEN:
+            self._probes_in_flight = 0
+        if state == CLOSED:
+            self.consecutive_failures = 0
+
+    def snapshot(self):
+        with self._lock:
+            total = len(self._window)
+            latencies = sorted(latency for ok, latency in self._window if ok)
+            return {
+                "model": self.model,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "error_rate": round(sum(1 for ok, _ in self._window if not ok) / total, 3) if total else 0.0,
+                "p50_latency": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                "window_calls": total,
+                "trips": self.trips,
+                "last_trip_reason": self.last_trip_reason,
+                "reopens_in": max(0, int(self.opened_until - time.time())) if self.state == OPEN else 0
+            }
+
+class BreakerRegistry:
+    """One breaker per model, created on first use."""
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, model):
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(model, **self.breaker_options)
+            return self._breakers[model]
+
+    def snapshot(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [b.snapshot() for b in breakers]
@@ -0,0 +1,252 @@
+import os
+import sys
+import time
+import sqlite3
+import tarfile
+import hashlib
+import threading
+import logging
+import numpy as np
+
+logger = logging.getLogger("Embeddings")
+
+# Chroma's default model; also what the RAG collection was originally embedded with
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Chroma's ONNX export of the model. Sharing its cache directory means an existing
+# chromadb download is reused, and vice versa.
+MODEL_URL = "https://chroma-onnx-models.s3.amazonaws.com/all-MiniLM-L6-v2/onnx.tar.gz"
+MODEL_SHA256 = "913d7300ceae3b2dbc2c50d1de4baacab4be7b9380491c27fab7418616a16ec3"
+MODEL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "chroma", "onnx_models", DEFAULT_MODEL_NAME)
+
+def embedding_key(model_name, text):
+    """Content address of an embedding: model + text."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """SQLite-backed store of float32 vectors keyed by embedding_key, with LRU size eviction."""
+    def __init__(self, path="embedding_cache.db", max_entries=50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, last_access REAL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """Returns {key: vector} for the keys present (one IN query) and refreshes their LRU timestamp."""
+        if not keys:
+            return {}
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._lock:
+            # SQLite caps bound parameters, so look up in chunks
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", chunk).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                self._conn.execute(f"UPDATE embeddings SET last_access = ? WHERE key IN ({marks})", [now] + chunk)
+            self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        """Stores {key: vector}."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+            )
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+class OnnxMiniLM:
+    """
+    all-MiniLM-L6-v2 on onnxruntime + tokenizers, without importing chromadb. Tokenization,
+    mean pooling and normalization follow chromadb's DefaultEmbeddingFunction, so the vectors
+    (and the embedding cache built from them) are the same.
+    """
+    MAX_TOKENS = 256
+
+    def __init__(self, path=MODEL_DIR, tokenizer=None, session=None):
+        self.path = path
+        self._tokenizer = tokenizer
+        self._session = session
+
+    def _download(self):
+        os.makedirs(self.path, exist_ok=True)
+        archive = os.path.join(self.path, "onnx.tar.gz")
+        if not os.path.exists(archive) or _sha256(archive) != MODEL_SHA256:
+            logger.info(f"Downloading {DEFAULT_MODEL_NAME} from {MODEL_URL}...")
+            import requests
+            with requests.get(MODEL_URL, stream=True, timeout=(5, 60)) as response:
+                response.raise_for_status()
+                with open(archive, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+            if _sha256(archive) != MODEL_SHA256:
+                os.remove(archive)
+                raise ValueError(f"Downloaded {DEFAULT_MODEL_NAME} archive failed its SHA256 check")
+        with tarfile.open(archive, "r:gz") as tar:
+            if sys.version_info >= (3, 12):
+                tar.extractall(path=self.path, filter="data")
+            else:
+                tar.extractall(path=self.path)
+
+    def _load(self):
+        if self._session is not None:
+            return
+        model_dir = os.path.join(self.path, "onnx")
+        if not all(os.path.exists(os.path.join(model_dir, name)) for name in ("model.onnx", "tokenizer.json")):
+            self._download()
+
+        import onnxruntime
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=self.MAX_TOKENS)
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]", length=self.MAX_TOKENS)
+
+        options = onnxruntime.SessionOptions()
+        options.log_severity_level = 3
+        # CoreML rejects this graph; chromadb drops it too
+        providers = [p for p in onnxruntime.get_available_providers() if p != "CoreMLExecutionProvider"]
+        self._session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), sess_options=options, providers=providers
+        )
+        self._tokenizer = tokenizer
+
+    def __call__(self, texts):
+        self._load()
+        encoded = self._tokenizer.encode_batch(list(texts))
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        hidden = self._session.run(None, {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.zeros_like(input_ids)
+        })[0]
+
+        # Mean over real tokens, then unit length
+        mask = np.broadcast_to(np.expand_dims(attention_mask, -1), hidden.shape)
+        pooled = np.sum(hidden * mask, 1) / np.clip(mask.sum(1), a_min=1e-9, a_max=None)
+        norms = np.linalg.norm(pooled, axis=1)
+        norms[norms == 0] = 1e-12
+        return list((pooled / norms[:, np.newaxis]).astype(np.float32))
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class EmbeddingService:
+    """
+    Shared text embedder: every string is embedded once, then served from the on-disk cache.
+    `model` is any callable mapping a list of texts to vectors (default: OnnxMiniLM, loaded on
+    warm() or first use). Calling the service returns a float32
+    matrix with one row per text, so it can be passed wherever an embed_fn is expected.
+    """
+    def __init__(self, model=None, model_name=None, cache=None, batch_size=64):
+        self._model = model
+        self.model_name = model_name or (type(model).__name__ if model is not None else DEFAULT_MODEL_NAME)
+        self.cache = cache
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._model_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                start = time.time()
+                self._model = OnnxMiniLM()
+                # The model is downloaded (first run only) and its ONNX session created on the first call
+                self._model(["warm up"])
+                logger.info(f"Loaded embedding model {self.model_name} in {time.time() - start:.1f}s")
+            return self._model
+
+    def warm(self):
+        """Loads the model up front so the first cycle doesn't stall on it."""
+        try:
+            self._get_model()
+            return True
+        except Exception as e:
+            logger.error(f"Embedding model warm-up failed: {e}")
+            return False
+
+    def embed(self, texts):
+        """Embeds texts (cache first, misses in batches). Returns an (n, dim) float32 array."""
+        texts = [t or "" for t in texts]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        keys = [embedding_key(self.model_name, t) for t in texts]
+        vectors = self.cache.get_many(set(keys)) if self.cache is not None else {}
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)  # Each distinct text is embedded once
+
+        if missing:
+            model = self._get_model()
+            new = {}
+            items = list(missing.items())
+            for i in range(0, len(items), self.batch_size):
+                batch = items[i:i + self.batch_size]
+                for (key, _), vector in zip(batch, model([text for _, text in batch])):
+                    new[key] = np.asarray(vector, dtype=np.float32)
+            if self.cache is not None:
+                self.cache.put_many(new)
+            vectors.update(new)
+
+        with self._stats_lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+
+        return np.vstack([vectors[key] for key in keys])
+
+    __call__ = embed
+
+    def stats(self):
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "cached": self.cache.count() if self.cache is not None else 0
+            }
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_embedding_service():
+    """Process-wide embedder configured from EMBEDDING_CACHE_PATH / EMBEDDING_CACHE_MAX_ENTRIES / EMBEDDING_BATCH_SIZE."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            cache = EmbeddingCache(
+                path=os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db"),
+                max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+            )
+            _service = EmbeddingService(cache=cache, batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")))
+        return _service
@@ -0,0 +1,82 @@
+import os
+import json
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger("Hedging")
+
+# Opt-in via "hedging" in config.json
+DEFAULT_HEDGE_SETTINGS = {
+    "enabled": False,
+    "percentile": 0.9,    # Hedge once the primary exceeds this percentile of its recent latency
+    "min_samples": 5,     # Recent primary latencies required before hedging kicks in
+    "min_delay": 2.0      # Never hedge earlier than this (seconds)
+}
+
+class HedgeStats:
+    """Per-stage counters: how often we hedged and which side won."""
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, hedged, hedge_won=False):
+        with self._lock:
+            s = self._stats.setdefault(stage or "default", {"calls": 0, "hedged": 0, "hedge_wins": 0})
+            s["calls"] += 1
+            if hedged:
+                s["hedged"] += 1
+                if hedge_won:
+                    s["hedge_wins"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                stage: dict(
+                    s,
+                    hedge_rate=round(s["hedged"] / s["calls"], 3) if s["calls"] else 0.0,
+                    win_rate=round(s["hedge_wins"] / s["hedged"], 3) if s["hedged"] else 0.0
+                )
+                for stage, s in self._stats.items()
+            }
+
+async def run_hedged(primary_factory, hedge_factory, delay, stats, stage=None):
+    """
+    Starts the primary call; if it hasn't finished after `delay` seconds, also starts the hedge.
+    The first non-None result wins and the other call is cancelled.
+    """
+    primary = asyncio.ensure_future(primary_factory())
+    pending = {primary}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if done:
+            stats.record(stage, hedged=False)
+            return primary.result()
+
+        logger.info(f"Primary call ({stage or 'default'}) exceeded {delay:.1f}s. Sending hedge request.")
+        hedge = asyncio.ensure_future(hedge_factory())
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and task.result() is not None:
+                    stats.record(stage, hedged=True, hedge_won=(task is hedge))
+                    return task.result()
+
+        # Both sides finished without a valid response
+        stats.record(stage, hedged=True)
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+def load_hedge_settings(path="config.json"):
+    """Reads the optional "hedging" section from config.json."""
+    settings = dict(DEFAULT_HEDGE_SETTINGS)
+    try:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                settings.update(json.load(f).get("hedging", {}))
+    except Exception as e:
+        logger.error(f"Error loading hedging settings from {path}: {e}. Using defaults.")
+    return settings
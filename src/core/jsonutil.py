@@ -4,15 +4,196 @@ import logging
 
 logger = logging.getLogger("JsonUtil")
 
-def parse_or_fix(raw_text, original_prompt=None):
-    if not raw_text:
-        return {}
+_FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+
+# Bare words LLMs emit in place of JSON literals
+_LITERALS = {"True": "true", "False": "false", "None": "null", "NaN": "null"}
+
+def _strip_trailing_comma(out):
+    while out and not out[-1].strip():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+def repair_json(text):
+    """
+    Best-effort repair of LLM JSON output: drops fences and surrounding prose, quotes bare
+    keys, removes trailing commas and closes truncated arrays/objects.
+    A truncated payload is cut back to its last complete element before closing.
+    Returns (repaired_text, truncated), or (None, truncated) if nothing is salvageable.
+    """
+    text = _FENCE_RE.sub("", text or "")
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return None, False
+
+    out = []
+    stack = []
+    checkpoint = None  # (output length, open containers) after the last complete element
+    in_string = escape = False
+    i, n = min(starts), len(text)
+
+    while i < n:
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+            if len(stack) == 1:
+                checkpoint = (len(out), list(stack))
+        elif ch in "}]":
+            if stack[-1] != ch:
+                break  # Mismatched closer: treat the rest as corrupt
+            _strip_trailing_comma(out)
+            out.append(stack.pop())
+            if not stack:
+                return "".join(out), False  # Anything after the root value is ignored
+            checkpoint = (len(out), list(stack))
+        elif ch == ",":
+            _strip_trailing_comma(out)
+            checkpoint = (len(out), list(stack))
+            out.append(ch)
+        elif ch.isalpha() or ch in "_$":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] in "_$-"):
+                j += 1
+            word = text[i:j]
+            k = j
+            while k < n and text[k].isspace():
+                k += 1
+            if k < n and text[k] == ":":
+                out.append(json.dumps(word))  # Unquoted key
+            else:
+                out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    # Truncated (or corrupt): keep everything up to the last complete element
+    if checkpoint is None:
+        return None, True
+    length, stack = checkpoint
+    out = out[:length]
+    _strip_trailing_comma(out)
+    return "".join(out) + "".join(reversed(stack)), True
 
-    # Strip code fences
-    clean_text = raw_text.replace("```json", "").replace("```", "").strip()
+def parse_partial(raw_text):
+    """
+    Parses LLM JSON output, repairing it if needed.
+    Returns (data, complete): `complete` is False when the response was cut off and only
+    its leading elements could be recovered. data is None if nothing could be parsed.
+    """
+    if not raw_text:
+        return None, False
 
+    clean_text = _FENCE_RE.sub("", raw_text).strip()
     try:
-        return json.loads(clean_text)
+        return json.loads(clean_text), True
     except json.JSONDecodeError as e:
-        logger.warning(f"JSON Decode Error: {e}. Raw: {raw_text[:50]}...")
-        return {}
+        error = e
+
+    repaired, truncated = repair_json(clean_text)
+    if repaired is not None:
+        try:
+            data = json.loads(repaired)
+            if truncated:
+                logger.warning(f"JSON truncated or corrupt ({error}). Salvaged the complete leading elements.")
+            else:
+                logger.info(f"Repaired malformed JSON ({error}).")
+            return data, not truncated
+        except json.JSONDecodeError:
+            pass
+
+    logger.warning(f"JSON Decode Error: {error}. Raw: {raw_text[:50]}...")
+    return None, False
+
+def parse_or_fix(raw_text):
+    """Parses (and if needed repairs) LLM JSON output. Returns {} if nothing is salvageable."""
+    data, _ = parse_partial(raw_text)
+    return {} if data is None else data
+
+class JsonStreamParser:
+    """
+    Incremental parser for a streamed top-level JSON array (or object).
+    feed() returns the elements completed by the new chunk: array items, or (key, value)
+    pairs for an object. Elements are parsed tolerantly; an element cut off by the end of
+    the stream is never returned.
+    """
+    def __init__(self):
+        self.text = ""
+        self.complete = False   # Root value closed
+        self._root = None
+        self._pos = 0
+        self._depth = 0
+        self._start = None      # Offset of the current top-level element
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk):
+        self.text += chunk or ""
+        items = []
+        text = self.text
+        while self._pos < len(text) and not self.complete:
+            ch = text[self._pos]
+            if self._root is None:
+                # Skip fences / prose before the payload
+                if ch in "[{":
+                    self._root = ch
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth == 1:
+                    self._emit(self._pos + 1, items)
+                elif self._depth == 0:
+                    self._emit(self._pos, items)
+                    self.complete = True
+            elif ch == ",":
+                if self._depth == 1:
+                    self._emit(self._pos, items)
+            elif not ch.isspace():
+                if self._depth == 1 and self._start is None:
+                    self._start = self._pos
+                if ch == '"':
+                    self._in_string = True
+                elif ch in "[{":
+                    self._depth += 1
+            self._pos += 1
+        return items
+
+    def _emit(self, end, items):
+        if self._start is None:
+            return
+        element = self.text[self._start:end].strip()
+        self._start = None
+        if not element:
+            return
+        if self._root == "{":
+            data, complete = parse_partial("{" + element + "}")
+            if complete and isinstance(data, dict) and len(data) == 1:
+                items.append(next(iter(data.items())))
+                return
+        else:
+            data, complete = parse_partial("[" + element + "]")
+            if complete and isinstance(data, list) and len(data) == 1:
+                items.append(data[0])
+                return
+        logger.warning(f"Skipping unparseable streamed element: {element[:50]}...")
@@ -4,97 +4,315 @@ import os
 import logging
 import time
 import random
+import asyncio
+import queue
+import threading
 from dotenv import load_dotenv
+from src.core.llm_cache import SingleFlight, cache_key, get_cache_mode, get_response_cache
+from src.core.ratelimit import ModelRateLimiter, load_quotas
+from src.core.prompt import estimate_tokens
+from src.core.breaker import BreakerRegistry
+from src.core.hedge import HedgeStats, load_hedge_settings, run_hedged
+from src.core.routing import ModelRouter, STAGES as ROUTING_STAGES
 
 load_dotenv()
 logger = logging.getLogger("CoreLLM")
 
-# Global Circuit Breaker State
-_FAILURE_COUNT = 0
-_FALLBACK_ACTIVE = False
-_FALLBACK_UNTIL = 0
-_COOLDOWN_SECONDS = 600  # 10 minutes
+# Per-model Circuit Breakers (trip on consecutive 429s, error rate or slow calls; 10 min cooldown)
+BREAKERS = BreakerRegistry(consecutive_threshold=4, cooldown_seconds=600)
 
-def call_llm(prompt, model='gemini-3-flash-preview', fallback_model='gemini-2.5-flash'):
-    global _FAILURE_COUNT, _FALLBACK_ACTIVE, _FALLBACK_UNTIL
+# Coalesces concurrent identical requests into one in-flight call
+_SINGLE_FLIGHT = SingleFlight()
 
+# Proactive per-model RPM/TPM pacing (quotas from config.json "rate_limits")
+RATE_LIMITER = ModelRateLimiter(load_quotas())
+
+# Opt-in hedged requests against the fallback model (settings from config.json "hedging")
+HEDGE_SETTINGS = load_hedge_settings()
+HEDGE_STATS = HedgeStats()
+
+# Per-stage model, fallback and generation settings (config.json "model_routing", hot-reloaded)
+ROUTER = ModelRouter()
+
+# Process-wide Gemini client (keeps its HTTP connection pool across calls)
+_CLIENT = None
+_CLIENT_KEY = None
+_CLIENT_LOCK = threading.Lock()
+
+# Dedicated event loop that owns the client's async transport.
+# All LLM calls run here, whichever thread or loop they are issued from.
+_LOOP = None
+_LOOP_LOCK = threading.Lock()
+
+def get_client():
+    """Returns the shared Gemini client, (re)creating it if the API key changed."""
+    global _CLIENT, _CLIENT_KEY
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         logger.error("GEMINI_API_KEY not found.")
         return None
 
-    client = None
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT_KEY != api_key:
+            try:
+                # Use v1alpha as in agent.py to support newer models/features
+                _CLIENT = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(api_version='v1alpha')
+                )
+                _CLIENT_KEY = api_key
+            except Exception as e:
+                logger.error(f"Failed to initialize Gemini Client: {e}")
+                return None
+        return _CLIENT
+
+def reset_client():
+    """Drops the shared client (next call builds a new one)."""
+    global _CLIENT, _CLIENT_KEY
+    with _CLIENT_LOCK:
+        _CLIENT = None
+        _CLIENT_KEY = None
+
+def _get_loop():
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, name="llm-loop", daemon=True).start()
+        return _LOOP
+
+def _resolve_route(stage, model, fallback_model, max_output_tokens, temperature, response_schema=None):
+    """Explicit arguments win; anything left as None comes from the stage's route."""
+    route = ROUTER.get(stage)
+    options = {
+        "max_output_tokens": max_output_tokens if max_output_tokens is not None else route["max_output_tokens"],
+        "temperature": temperature if temperature is not None else route["temperature"],
+        "response_schema": response_schema
+    }
+    return model or route["model"], fallback_model or route["fallback_model"], options
+
+def call_llm(prompt, model=None, fallback_model=None, stage=None, max_output_tokens=None, temperature=None,
+             response_schema=None):
+    """
+    Calls Gemini with retry, fallback and circuit breaker (blocking).
+    Thin wrapper over call_llm_async; safe to call from any thread.
+    `stage` names the pipeline step (events, facts, analysis, critic); it selects the
+    model route from config.json "model_routing" and tags metrics.
+    `response_schema` (OpenAPI-style dict) requests schema-enforced JSON output.
+    """
+    model, fallback_model, options = _resolve_route(stage, model, fallback_model, max_output_tokens, temperature,
+                                                    response_schema)
+    future = asyncio.run_coroutine_threadsafe(_call_llm_core(prompt, model, fallback_model, stage, options), _get_loop())
+    return future.result()
+
+async def call_llm_async(prompt, model=None, fallback_model=None, stage=None, max_output_tokens=None, temperature=None,
+                         response_schema=None):
+    """
+    Coroutine version of call_llm with the same routing, retry, fallback and circuit-breaker semantics.
+    Several calls can be awaited concurrently (e.g. with asyncio.gather).
+    """
+    model, fallback_model, options = _resolve_route(stage, model, fallback_model, max_output_tokens, temperature,
+                                                    response_schema)
+    loop = _get_loop()
     try:
-        # Use v1alpha as in agent.py to support newer models/features
-        client = genai.Client(
-            api_key=api_key,
-            http_options=types.HttpOptions(api_version='v1alpha')
-        )
-    except Exception as e:
-        logger.error(f"Failed to initialize Gemini Client: {e}")
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        return await _call_llm_core(prompt, model, fallback_model, stage, options)
+    # Issued from another loop: run on the LLM loop and await the result here
+    return await asyncio.wrap_future(
+        asyncio.run_coroutine_threadsafe(_call_llm_core(prompt, model, fallback_model, stage, options), loop)
+    )
+
+_STREAM_END = object()
+
+def stream_llm(prompt, model=None, fallback_model=None, stage=None, max_output_tokens=None, temperature=None,
+               response_schema=None):
+    """
+    Streaming variant of call_llm: yields text chunks as Gemini generates them (blocking
+    generator, safe to consume from any thread). Same routing, fallback, rate limiting and
+    breakers; a failure before the first chunk is retried, one mid-stream ends the stream
+    early. Closing the generator cancels the request.
+    """
+    model, fallback_model, options = _resolve_route(stage, model, fallback_model, max_output_tokens, temperature,
+                                                    response_schema)
+    chunks = queue.Queue()
+
+    async def pump():
+        try:
+            async for chunk in _stream_llm_core(prompt, model, fallback_model, options):
+                chunks.put(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"LLM stream interrupted: {e}")
+        finally:
+            chunks.put(_STREAM_END)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _get_loop())
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is _STREAM_END:
+                return
+            yield chunk
+    finally:
+        future.cancel()
+
+async def _stream_llm_core(prompt, model, fallback_model, options):
+    """Streams from the response cache when possible (see LLM_CACHE_MODE), recording complete streams."""
+    mode = get_cache_mode()
+    key = cache_key(model, prompt, fallback=fallback_model, **options)
+    if mode in ("cache", "replay"):
+        cached = get_response_cache().get(key, ignore_ttl=(mode == "replay"))
+        if cached is not None:
+            yield cached
+            return
+        if mode == "replay":
+            logger.warning("LLM replay miss: no recorded response for this prompt.")
+            return
+
+    parts = []
+    async for chunk in _stream_llm_uncached(prompt, model, fallback_model, options):
+        parts.append(chunk)
+        yield chunk
+
+    if parts and mode in ("cache", "record"):
+        get_response_cache().put(key, model, "".join(parts))
+
+async def _call_llm_core(prompt, model, fallback_model, stage=None, options=None):
+    """
+    Responses are optionally cached on disk (see LLM_CACHE_MODE), and concurrent
+    identical requests share a single in-flight call.
+    """
+    options = options or {}
+    mode = get_cache_mode()
+    key = cache_key(model, prompt, fallback=fallback_model, **options)
+
+    async def fetch():
+        if mode in ("cache", "replay"):
+            cached = get_response_cache().get(key, ignore_ttl=(mode == "replay"))
+            if cached is not None:
+                return cached
+            if mode == "replay":
+                logger.warning("LLM replay miss: no recorded response for this prompt.")
+                return None
+
+        response = await _call_llm_hedged(prompt, model, fallback_model, stage, options)
+
+        if response is not None and mode in ("cache", "record"):
+            get_response_cache().put(key, model, response)
+        return response
+
+    return await _SINGLE_FLIGHT.do_async(key, fetch)
+
+async def _call_llm_hedged(prompt, model, fallback_model, stage=None, options=None):
+    """
+    With hedging enabled, the same prompt is also sent to the fallback model if the primary
+    is slower than its recent latency percentile. The first valid response wins.
+    """
+    if HEDGE_SETTINGS.get("enabled") and fallback_model and fallback_model != model:
+        breaker = BREAKERS.get(model)
+        delay = breaker.latency_percentile(HEDGE_SETTINGS["percentile"], HEDGE_SETTINGS["min_samples"])
+        if delay is not None and not breaker.is_open():
+            return await run_hedged(
+                lambda: _call_llm_uncached(prompt, model, fallback_model, options),
+                lambda: _call_llm_uncached(prompt, fallback_model, None, options),
+                max(delay, HEDGE_SETTINGS["min_delay"]),
+                HEDGE_STATS,
+                stage
+            )
+
+    return await _call_llm_uncached(prompt, model, fallback_model, options)
+
+def get_llm_cache_stats():
+    stats = get_response_cache().stats() if get_cache_mode() != "off" else {}
+    stats["mode"] = get_cache_mode()
+    stats["coalesced"] = _SINGLE_FLIGHT.coalesced
+    return stats
+
+def _generation_config(options):
+    """GenerateContentConfig for the set options, or None to use the model defaults."""
+    options = {k: v for k, v in (options or {}).items() if v is not None}
+    if "response_schema" in options:
+        options["response_mime_type"] = "application/json"
+    return types.GenerateContentConfig(**options) if options else None
+
+def _attempt_model(model, fallback_model, attempt, max_retries):
+    """Model for this attempt: the fallback on the last attempt, or as soon as the primary's breaker trips."""
+    if fallback_model and model != fallback_model:
+        if attempt == max_retries - 1:
+            logger.warning(f"Max retries nearing limit. Switching to FALLBACK model: {fallback_model} for final attempt.")
+            return fallback_model
+        if BREAKERS.get(model).is_open():
+            logger.warning(f"Circuit for {model} opened. Switching to FALLBACK model: {fallback_model}.")
+            return fallback_model
+    return model
+
+def _is_rate_limit(error):
+    error_str = str(error)
+    return "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "Quota exceeded" in error_str
+
+async def _call_llm_uncached(prompt, model, fallback_model, options=None):
+    client = get_client()
+    if client is None:
         return None
 
-    # Check Circuit Breaker Status
-    if _FALLBACK_ACTIVE:
-        if time.time() < _FALLBACK_UNTIL:
-            logger.warning(f"Global Fallback Mode ACTIVE. Skipping {model}, using {fallback_model} immediately. (Resets in {int(_FALLBACK_UNTIL - time.time())}s)")
-            model = fallback_model  # Force primary model to be the fallback
-        else:
-            logger.info("Global Fallback Mode Cooldown Expired. Attempting to revert to Primary Model.")
-            _FALLBACK_ACTIVE = False
-            _FAILURE_COUNT = 0
+    request = {}
+    config = _generation_config(options)
+    if config is not None:
+        request["config"] = config
+
+    # Check Circuit Breaker Status (HALF_OPEN lets one probe call through)
+    if fallback_model and model != fallback_model and not BREAKERS.get(model).allow_request():
+        logger.warning(f"Circuit for {model} is OPEN. Using {fallback_model} immediately.")
+        model = fallback_model  # Force primary model to be the fallback
 
     max_retries = 5
     base_delay = 5  # Start with 5 seconds
+    prompt_tokens = estimate_tokens(prompt)
 
     for attempt in range(max_retries):
-        # Determine current model for this attempt
-        current_model = model
+        current_model = _attempt_model(model, fallback_model, attempt, max_retries)
+        breaker = BREAKERS.get(current_model)
 
-        # Logic for local fallback on last attempt (if global fallback isn't already forcing it)
-        # If we are already in global fallback, 'model' is already 'fallback_model', so this logic is redundant but harmless.
-        if attempt == max_retries - 1 and fallback_model and current_model != fallback_model:
-            logger.warning(f"Max retries nearing limit. Switching to FALLBACK model: {fallback_model} for final attempt.")
-            current_model = fallback_model
+        # Queue for quota capacity before sending
+        await RATE_LIMITER.acquire(current_model, prompt_tokens)
 
+        started = time.monotonic()
         try:
-            response = client.models.generate_content(
+            response = await client.aio.models.generate_content(
                 model=current_model,
-                contents=prompt
+                contents=prompt,
+                **request
             )
 
-            # If we succeed on the PRIMARY model, we can verify if we should reset counters?
-            # Actually, we reset counters only when cooldown expires or maybe on success?
-            # The requirement says "switch... for a while". So cooldown logic is safer.
-            # But if we accidentally get a success on primary, maybe we shouldn't reset immediately to avoid flapping.
-            # However, if we are NOT in fallback mode, and we succeed, we should probably reset failure count
-            # to avoid accumulated failures over long periods triggering the breaker.
-            if not _FALLBACK_ACTIVE and current_model != fallback_model:
-                 _FAILURE_COUNT = 0
+            breaker.record_success(time.monotonic() - started)
+            RATE_LIMITER.on_success(current_model)
 
             return response.text
 
+        except asyncio.CancelledError:
+            # Lost a hedge race (or caller gave up): don't count it, but free any probe slot
+            breaker.cancel_probe()
+            raise
+
         except Exception as e:
-            error_str = str(e)
-            is_rate_limit = "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "Quota exceeded" in error_str
+            is_rate_limit = _is_rate_limit(e)
 
-            if is_rate_limit:
-                # Handle Rate Limit Logic
-                if not _FALLBACK_ACTIVE and current_model != fallback_model:
-                    _FAILURE_COUNT += 1
-                    logger.warning(f"Rate Limit Hit on Primary. Global Failure Count: {_FAILURE_COUNT}/4")
+            breaker.record_failure(time.monotonic() - started, rate_limited=is_rate_limit)
 
-                    if _FAILURE_COUNT >= 4:
-                        _FALLBACK_ACTIVE = True
-                        _FALLBACK_UNTIL = time.time() + _COOLDOWN_SECONDS
-                        logger.error(f"Global Rate Limit Threshold Reached ({_FAILURE_COUNT}). ACTIVATING GLOBAL FALLBACK MODE for {_COOLDOWN_SECONDS}s.")
+            if is_rate_limit:
+                # Slow down proactive pacing for this model
+                RATE_LIMITER.on_rate_limited(current_model)
 
                 # Standard Retry Logic
                 if attempt < max_retries - 1:
                     # Exponential Backoff with Jitter
                     delay = (base_delay * (2 ** attempt)) + random.uniform(0, 1)
                     logger.warning(f"LLM Rate Limit Hit (429) on {current_model}. Retrying in {delay:.2f}s... (Attempt {attempt+1}/{max_retries})")
-                    time.sleep(delay)
+                    await asyncio.sleep(delay)
                     continue
                 else:
                     logger.error(f"LLM Rate Limit Exceeded after {max_retries} attempts. Final attempt with {current_model} failed. Error: {e}")
@@ -105,3 +323,64 @@ def call_llm(prompt, model='gemini-3-flash-preview', fallback_model='gemini-2.5-
                 return None
 
     return None
+
+async def _stream_llm_uncached(prompt, model, fallback_model, options=None):
+    client = get_client()
+    if client is None:
+        return
+
+    request = {}
+    config = _generation_config(options)
+    if config is not None:
+        request["config"] = config
+
+    if fallback_model and model != fallback_model and not BREAKERS.get(model).allow_request():
+        logger.warning(f"Circuit for {model} is OPEN. Using {fallback_model} immediately.")
+        model = fallback_model
+
+    max_retries = 5
+    base_delay = 5
+    prompt_tokens = estimate_tokens(prompt)
+
+    for attempt in range(max_retries):
+        current_model = _attempt_model(model, fallback_model, attempt, max_retries)
+        breaker = BREAKERS.get(current_model)
+        await RATE_LIMITER.acquire(current_model, prompt_tokens)
+
+        started = time.monotonic()
+        streamed = False
+        try:
+            stream = await client.aio.models.generate_content_stream(
+                model=current_model,
+                contents=prompt,
+                **request
+            )
+            async for response in stream:
+                if response.text:
+                    streamed = True
+                    yield response.text
+
+            breaker.record_success(time.monotonic() - started)
+            RATE_LIMITER.on_success(current_model)
+            return
+
+        except (asyncio.CancelledError, GeneratorExit):
+            breaker.cancel_probe()
+            raise
+
+        except Exception as e:
+            is_rate_limit = _is_rate_limit(e)
+            breaker.record_failure(time.monotonic() - started, rate_limited=is_rate_limit)
+            if is_rate_limit:
+                RATE_LIMITER.on_rate_limited(current_model)
+
+            # Chunks already went downstream: retrying would duplicate them
+            if streamed:
+                raise
+            if is_rate_limit and attempt < max_retries - 1:
+                delay = (base_delay * (2 ** attempt)) + random.uniform(0, 1)
+                logger.warning(f"LLM Rate Limit Hit (429) on {current_model}. Retrying stream in {delay:.2f}s... (Attempt {attempt+1}/{max_retries})")
+                await asyncio.sleep(delay)
+                continue
+            logger.error(f"LLM Stream Error on {current_model}: {e}")
+            return
@@ -0,0 +1,139 @@
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger("LLMCache")
+
+# Modes:
+#   off    - no caching (default)
+#   cache  - read-through cache with TTL
+#   record - always call the model, store every response
+#   replay - serve only from the store (no network); misses return None
+CACHE_MODES = ("off", "cache", "record", "replay")
+
+def cache_key(model, prompt, **options):
+    """Content address of a request: model + prompt + any generation options."""
+    parts = [model or "", prompt or ""] + [f"{k}={options[k]}" for k in sorted(options) if options[k] is not None]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """SQLite-backed LLM response store with TTL, LRU size eviction and hit/miss counters."""
+    def __init__(self, path="llm_cache.db", ttl_seconds=86400, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, created_at REAL, last_access REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key, ignore_ttl=False):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and (ignore_ttl or now - row[1] <= self.ttl_seconds):
+                self._conn.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, model, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            # LRU eviction beyond max_entries
+            self._conn.execute(
+                "DELETE FROM llm_responses WHERE key IN ("
+                "SELECT key FROM llm_responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+            self.stores += 1
+
+    def purge_expired(self):
+        """Deletes entries past the TTL. Returns the number removed."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+        if cursor.rowcount:
+            logger.info(f"Purged {cursor.rowcount} expired LLM cache entries.")
+        return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": size
+        }
+
+class SingleFlight:
+    """Coalesces concurrent identical calls: one caller runs, the others wait for its result."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self.coalesced = 0
+
+    async def do_async(self, key, coro_fn):
+        """Runs coro_fn() once per key at a time. Callers must share one event loop (see core.llm's LLM loop)."""
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = asyncio.ensure_future(coro_fn())
+                self._tasks[key] = task
+
+                def _done(_task):
+                    with self._lock:
+                        self._tasks.pop(key, None)
+                task.add_done_callback(_done)
+            else:
+                self.coalesced += 1
+        # Shield so one cancelled waiter doesn't cancel the shared call
+        return await asyncio.shield(task)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache_mode():
+    mode = os.getenv("LLM_CACHE_MODE", "off").lower()
+    if mode not in CACHE_MODES:
+        logger.warning(f"Unknown LLM_CACHE_MODE '{mode}'. Caching disabled.")
+        return "off"
+    return mode
+
+def get_response_cache():
+    """Process-wide cache configured from LLM_CACHE_PATH / LLM_CACHE_TTL / LLM_CACHE_MAX_ENTRIES."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                path=os.getenv("LLM_CACHE_PATH", "llm_cache.db"),
+                ttl_seconds=int(os.getenv("LLM_CACHE_TTL", "86400")),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+            )
+            # Expired rows are otherwise only replaced on a key collision. Record/replay
+            # stores are kept whole: replay serves entries regardless of age.
+            if get_cache_mode() == "cache":
+                _cache.purge_expired()
+        return _cache
@@ -0,0 +1,111 @@
+import json
+import re
+import html
+import logging
+
+logger = logging.getLogger("PromptBuilder")
+
+# Default per-call input budget for the data section of a prompt
+PROMPT_TOKEN_BUDGET = 8000
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+def estimate_tokens(text):
+    # Rough heuristic (~4 characters per token) - good enough for budgeting
+    return len(text) // 4 + 1
+
+def strip_html(text):
+    """Removes tags and entities from RSS summaries and collapses whitespace."""
+    if not text:
+        return ""
+    text = html.unescape(_TAG_RE.sub(" ", str(text)))
+    return _SPACE_RE.sub(" ", text).strip()
+
+def compact_json(data):
+    """JSON without indentation or padding (pretty-printing roughly doubles token count)."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+class AliasMap:
+    """Maps long IDs (URLs, slugs) to short prompt aliases and back."""
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._to_alias = {}
+        self._to_id = {}
+
+    def alias(self, real_id):
+        if real_id not in self._to_alias:
+            short = f"{self.prefix}{len(self._to_alias) + 1}"
+            self._to_alias[real_id] = short
+            self._to_id[short] = real_id
+        return self._to_alias[real_id]
+
+    def resolve(self, short):
+        # Unknown values are passed through unchanged (e.g. the model echoed a real ID)
+        return self._to_id.get(short, short)
+
+def compact_article(article, aliases, summary_chars=200, include_source=False):
+    """Minimal article record: aliased id, title, cleaned summary (link/published dropped)."""
+    record = {
+        "id": aliases.alias(article.get('id', article.get('link'))),
+        "t": strip_html(article.get('title', '')),
+        "d": strip_html(article.get('summary', ''))[:summary_chars]
+    }
+    if include_source:
+        record["s"] = article.get('source')
+    if not record["d"]:
+        del record["d"]
+    return record
+
+def truncate_field(field, limit):
+    """Budget step: shortens `field` on every record (and nested `children`) to `limit` chars."""
+    def step(records):
+        out = []
+        for r in records:
+            r = dict(r)
+            for key, value in list(r.items()):
+                if key == field and isinstance(value, str):
+                    if limit:
+                        r[key] = value[:limit]
+                    else:
+                        del r[key]
+                elif isinstance(value, list) and value and isinstance(value[0], dict):
+                    r[key] = step(value)
+            out.append(r)
+        return out
+    return step
+
+def trim_children(key, max_items):
+    """Budget step: keeps at most `max_items` entries in each record's `key` list."""
+    def step(records):
+        return [dict(r, **{key: r.get(key, [])[:max_items]}) for r in records]
+    return step
+
+def drop_tail(fraction=0.8):
+    """Budget step: keeps only the leading `fraction` of records (inputs are ordered by value)."""
+    def step(records):
+        return records[:max(1, int(len(records) * fraction))]
+    return step
+
+def enforce_budget(records, budget=PROMPT_TOKEN_BUDGET, steps=None):
+    """
+    Applies reduction steps in order until the compact JSON fits the token budget.
+    Returns (records, rendered_text).
+    """
+    if steps is None:
+        steps = [truncate_field("d", 120), truncate_field("d", 60), truncate_field("d", 0)] + [drop_tail()] * 5
+
+    text = compact_json(records)
+    original = estimate_tokens(text)
+    for step in steps:
+        if estimate_tokens(text) <= budget:
+            break
+        records = step(records)
+        text = compact_json(records)
+
+    final = estimate_tokens(text)
+    if final < original:
+        logger.info(f"Prompt data compacted to fit budget: ~{original} -> ~{final} tokens (budget {budget}).")
+    if final > budget:
+        logger.warning(f"Prompt data still over budget after compaction (~{final} > {budget} tokens).")
+    return records, text
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger("RateLimiter")
+
+# Per-model quotas (requests / tokens per minute). Override via "rate_limits" in config.json.
+DEFAULT_QUOTAS = {
+    "gemini-3-flash-preview": {"rpm": 10, "tpm": 250000},
+    "gemini-2.5-flash": {"rpm": 10, "tpm": 250000},
+    "default": {"rpm": 10, "tpm": 250000}
+}
+
+# Adaptive Behaviour (AIMD)
+BACKOFF_FACTOR = 0.5      # Rate multiplier applied on every 429
+RECOVERY_STEP = 0.1       # Fraction of the configured rate restored per successful call
+MIN_RATE_FRACTION = 0.1   # Never slow below this fraction of the configured rate
+
+class TokenBucket:
+    """Classic token bucket. Not locked itself; ModelRateLimiter serializes access."""
+    def __init__(self, per_minute):
+        self.base_rate = per_minute / 60.0   # Configured refill (units per second)
+        self.rate = self.base_rate           # Current (adaptive) refill
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` units are available (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount):
+        self.level -= min(amount, self.capacity)
+
+class ModelRateLimiter:
+    """
+    Proactive per-model RPM + TPM limiter. Callers queue (sleep) until both buckets
+    have capacity. Rates halve on a 429 and recover gradually on success.
+    Thread-safe; the async path never holds the lock across an await.
+    """
+    def __init__(self, quotas=None):
+        self.quotas = dict(DEFAULT_QUOTAS)
+        if quotas:
+            self.quotas.update(quotas)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _get_buckets(self, model):
+        # Caller holds the lock
+        if model not in self._buckets:
+            quota = self.quotas.get(model, self.quotas["default"])
+            self._buckets[model] = (TokenBucket(quota["rpm"]), TokenBucket(quota["tpm"]))
+        return self._buckets[model]
+
+    def _reserve(self, model, tokens):
+        """Consumes capacity and returns 0, or returns the seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            requests_bucket, tokens_bucket = self._get_buckets(model)
+            wait = max(requests_bucket.wait_time(1, now), tokens_bucket.wait_time(tokens, now))
+            if wait == 0:
+                requests_bucket.consume(1)
+                tokens_bucket.consume(tokens)
+            return wait
+
+    async def acquire(self, model, tokens=0):
+        while True:
+            wait = self._reserve(model, tokens)
+            if wait == 0:
+                return
+            self._log_wait(model, wait)
+            await asyncio.sleep(wait)
+
+    def _log_wait(self, model, wait):
+        with self._lock:
+            self.waited_seconds += wait
+        logger.info(f"Rate limiter: waiting {wait:.2f}s for {model} capacity.")
+
+    def on_rate_limited(self, model):
+        """Multiplicative decrease after a 429 that slipped through."""
+        with self._lock:
+            for bucket in self._get_buckets(model):
+                bucket.rate = max(bucket.base_rate * MIN_RATE_FRACTION, bucket.rate * BACKOFF_FACTOR)
+            rpm = self._buckets[model][0].rate * 60
+        logger.warning(f"Rate limiter: 429 on {model}. Pacing reduced to {rpm:.1f} RPM.")
+
+    def on_success(self, model):
+        """Additive increase back toward the configured quota."""
+        with self._lock:
+            for bucket in self._get_buckets(model):
+                if bucket.rate < bucket.base_rate:
+                    bucket.rate = min(bucket.base_rate, bucket.rate + bucket.base_rate * RECOVERY_STEP)
+
+    def stats(self):
+        with self._lock:
+            return {
+                model: {
+                    "rpm": round(buckets[0].rate * 60, 2),
+                    "tpm": round(buckets[1].rate * 60),
+                    "requests_available": round(buckets[0].level, 2),
+                    "tokens_available": round(buckets[1].level)
+                }
+                for model, buckets in self._buckets.items()
+            }
+
+def load_quotas(path="config.json"):
+    """Reads the optional "rate_limits" section from config.json."""
+    try:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("rate_limits", {})
+    except Exception as e:
+        logger.error(f"Error loading rate limits from {path}: {e}. Using defaults.")
+    return {}
@@ -0,0 +1,79 @@
+import os
+import json
+import threading
+import logging
+
+logger = logging.getLogger("ModelRouter")
+
+# Pipeline stages that can be routed independently
+STAGES = ("events", "facts", "analysis", "critic")
+ROUTE_FIELDS = ("model", "fallback_model", "max_output_tokens", "temperature")
+
+# Used for any field a stage doesn't set in config.json "model_routing"
+DEFAULT_ROUTE = {
+    "model": "gemini-3-flash-preview",
+    "fallback_model": "gemini-2.5-flash",
+    "max_output_tokens": None,
+    "temperature": None
+}
+
+class ModelRouter:
+    """
+    Per-stage routing table (primary model, fallback model, max output tokens, temperature)
+    read from the "model_routing" section of config.json. The file is re-read whenever it
+    changes, so edits apply to the next call without a restart.
+    """
+    def __init__(self, path="config.json"):
+        self.path = path
+        self._routes = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self):
+        # Caller holds the lock
+        try:
+            mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        routes = {}
+        if mtime is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    routes = json.load(f).get("model_routing", {})
+            except Exception as e:
+                logger.error(f"Error loading model routing from {self.path}: {e}. Keeping previous routes.")
+                return
+        self._routes = routes
+        logger.info(f"Model routing loaded for stages: {', '.join(sorted(routes)) or 'none (defaults)'}.")
+
+    def get(self, stage=None):
+        """Effective route for a stage: default < "default" entry < stage entry."""
+        with self._lock:
+            self._reload_if_changed()
+            route = dict(DEFAULT_ROUTE)
+            route.update({k: v for k, v in self._routes.get("default", {}).items() if k in ROUTE_FIELDS})
+            if stage:
+                route.update({k: v for k, v in self._routes.get(stage, {}).items() if k in ROUTE_FIELDS})
+            return route
+
+    def update(self, stage, values):
+        """Changes a stage's route at runtime and persists it to config.json."""
+        values = {k: v for k, v in values.items() if k in ROUTE_FIELDS}
+        with self._lock:
+            config = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    config = json.load(f)
+            routing = config.setdefault("model_routing", {})
+            routing.setdefault(stage, {}).update(values)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(config, f, indent=4)
+            self._mtime = None  # Force reload on next get
+        logger.info(f"Model routing for '{stage}' updated: {values}")
+        return self.get(stage)
+
+    def snapshot(self):
+        return {stage: self.get(stage) for stage in ("default",) + STAGES}
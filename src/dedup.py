@@ -0,0 +1,90 @@
+import re
+import zlib
+import random
+import logging
+
+logger = logging.getLogger("Dedup")
+
+# MinHash Settings
+NUM_PERM = 64        # Signature length
+BANDS = 16           # LSH bands (NUM_PERM / BANDS rows per band)
+SHINGLE_SIZE = 5     # Character shingle length
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed so signatures are stable across runs
+_rng = random.Random(1337)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_NON_WORD_RE = re.compile(r"[^\w$%.]+")
+
+def normalize_text(item):
+    """Lowercased title + summary with HTML and punctuation stripped."""
+    text = f"{item.get('title', '')} {item.get('summary', '')}"
+    text = _TAG_RE.sub(" ", text).lower()
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+def shingles(text, k=SHINGLE_SIZE):
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+def minhash_signature(shingle_set):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingle_set]
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERM
+    return [min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS]
+
+def estimate_similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+def collapse_near_duplicates(items, threshold=0.8):
+    """
+    Groups near-identical articles (syndicated copies, light rewrites).
+    Returns a list of groups in input order; the first item of each group is its representative.
+    """
+    if len(items) < 2:
+        return [[item] for item in items]
+
+    signatures = [minhash_signature(shingles(normalize_text(item))) for item in items]
+
+    # LSH banding: only articles sharing at least one band are compared
+    rows = NUM_PERM // BANDS
+    buckets = {}
+    for idx, sig in enumerate(signatures):
+        for band in range(BANDS):
+            key = (band, tuple(sig[band * rows:(band + 1) * rows]))
+            buckets.setdefault(key, []).append(idx)
+
+    # Union-Find over matching pairs
+    parent = list(range(len(items)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for members in buckets.values():
+        for pos, i in enumerate(members):
+            for j in members[pos + 1:]:
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if estimate_similarity(signatures[i], signatures[j]) >= threshold:
+                    root_i, root_j = find(i), find(j)
+                    if root_i != root_j:
+                        # Keep the earliest article as the root (representative)
+                        parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for idx, item in enumerate(items):
+        groups.setdefault(find(idx), []).append(item)
+
+    result = [groups[root] for root in sorted(groups)]
+    collapsed = len(items) - len(result)
+    if collapsed:
+        logger.info(f"Collapsed {collapsed} near-duplicate articles ({len(items)} -> {len(result)}).")
+    return result
@@ -1,8 +1,137 @@
-import json
-from src.core.llm import call_llm
-from src.core.jsonutil import parse_or_fix
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from src.core.llm import call_llm, stream_llm
+from src.core.jsonutil import JsonStreamParser, parse_or_fix, parse_partial
+from src.core.prompt import AliasMap, compact_article, compact_json, enforce_budget, estimate_tokens
+
+logger = logging.getLogger("Events")
+
+# Sharding Settings
+SHARD_TOKENS = 6000       # Approx. input tokens of articles per shard
+SHARD_CONCURRENCY = 4     # Shards resolved in parallel
+
+# Structured-output schemas (enforced by Gemini, see call_llm response_schema)
+EVENTS_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "event_id": {"type": "STRING"},
+            "title": {"type": "STRING"},
+            "articles": {"type": "ARRAY", "items": {"type": "STRING"}}
+        },
+        "required": ["event_id", "title", "articles"]
+    }
+}
+MERGE_SCHEMA = {"type": "ARRAY", "items": {"type": "ARRAY", "items": {"type": "STRING"}}}
+
+def resolve_events(articles, mode="llm", shard_tokens=SHARD_TOKENS, max_concurrency=SHARD_CONCURRENCY, on_event=None):
+    """
+    Groups articles into real-world events: [{event_id, title, articles: [ids]}].
+    mode="llm"   - Gemini groups the batch; batches larger than `shard_tokens` are split
+                   into shards resolved concurrently, then reconciled by a merge pass.
+                   With `on_event`, a single-shard batch is streamed and each event is passed
+                   to it as soon as it is generated (sharded results only exist after the merge).
+    mode="local" - embedding clustering; the LLM only adjudicates borderline pairs.
+    """
+    if mode == "local":
+        # Imported lazily so the LLM-only path doesn't require numpy
+        from src.clustering import cluster_articles
+        return cluster_articles(articles)
+
+    shards = shard_articles(articles, shard_tokens)
+    if len(shards) <= 1:
+        return _resolve_shard(articles, on_event=on_event)
+
+    logger.info(f"Resolving {len(articles)} articles in {len(shards)} shards (concurrency {max_concurrency})...")
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        shard_results = list(executor.map(_resolve_shard, shards))
+
+    return merge_shard_events(shard_results)
+
+def shard_articles(articles, shard_tokens=SHARD_TOKENS):
+    """Greedily splits articles into shards whose serialized size fits the token budget."""
+    shards = []
+    current, current_tokens = [], 0
+    for article in articles:
+        tokens = estimate_tokens(compact_json(compact_article(article, AliasMap("a"))))
+        if current and current_tokens + tokens > shard_tokens:
+            shards.append(current)
+            current, current_tokens = [], 0
+        current.append(article)
+        current_tokens += tokens
+    if current:
+        shards.append(current)
+    return shards
+
+def merge_shard_events(shard_results):
+    """
+    Reconciles events that were split across shards.
+    Only event titles are sent to the LLM, so the merge prompt stays small.
+    """
+    events = []
+    for n, result in enumerate(shard_results):
+        if not isinstance(result, list):
+            continue
+        for event in result:
+            if not isinstance(event, dict):
+                continue
+            # Namespace IDs so events from different shards never collide
+            event = dict(event)
+            event['event_id'] = f"s{n}_{event.get('event_id', len(events))}"
+            events.append(event)
+
+    if len(events) < 2:
+        return events
+
+    prompt = f"""
+You are a JSON API.
+
+Return ONLY valid JSON.
+No explanation. No markdown.
+
+The events below were detected independently in different batches of news.
+Some of them may describe the SAME concrete real-world occurrence
+(same organization, same specific action, same object, same timeframe).
+
+Events:
+{compact_json([{"id": e['event_id'], "title": e.get('title')} for e in events])}
+
+Return a JSON array of groups of event ids that are the SAME event.
+Only include groups with 2 or more ids:
+[["id1", "id4"], ["id2", "id7"]]
+"""
+    raw = call_llm(prompt, stage='events', response_schema=MERGE_SCHEMA)
+    groups = parse_or_fix(raw)
+    if not isinstance(groups, list):
+        logger.warning("Shard merge response invalid. Keeping shard events unmerged.")
+        return events
+
+    by_id = {e['event_id']: e for e in events}
+    merged_into = {}
+    for group in groups:
+        if not isinstance(group, list):
+            continue
+        ids = [i for i in group if i in by_id and i not in merged_into]
+        if len(ids) < 2:
+            continue
+        primary = by_id[ids[0]]
+        for other_id in ids[1:]:
+            for aid in by_id[other_id].get('articles', []):
+                if aid not in primary.setdefault('articles', []):
+                    primary['articles'].append(aid)
+            merged_into[other_id] = ids[0]
+
+    if merged_into:
+        logger.info(f"Merged {len(merged_into)} events split across shards.")
+    return [e for e in events if e['event_id'] not in merged_into]
+
+def _resolve_shard(articles, retry_missing=True, on_event=None, id_prefix=""):
+    # Compact the payload: short aliases instead of URLs, cleaned summaries, no pretty-printing
+    aliases = AliasMap("a")
+    records = [compact_article(a, aliases) for a in articles]
+    records, articles_json = enforce_budget(records)
 
-def resolve_events(articles):
     prompt = f"""
 You are a JSON API.
 
@@ -30,18 +159,49 @@ IMPORTANT SOURCE RULES:
 
 You must think in terms of: "Did these articles report the same thing actually happening?"
 
-Articles:
-{json.dumps(articles, indent=2)}
+Articles (id, t=title, d=summary):
+{articles_json}
 
 Return a JSON array in this exact format:
 [
   {{
     "event_id": "short stable identifier based on organization + action + date",
     "title": "clear factual description of what happened",
-    "articles": ["id1", "id2", "id3"]
+    "articles": ["a1", "a2", "a3"]
   }}
 ]
 """
-    raw = call_llm(prompt)
-    return parse_or_fix(raw, prompt)
+    def finalize(event, prefix=""):
+        # Map aliases back to the real article IDs (events cut off mid-way are dropped)
+        if not isinstance(event, dict) or not isinstance(event.get('articles'), list):
+            return None
+        event['articles'] = [aliases.resolve(a) for a in event['articles']]
+        if prefix:
+            event['event_id'] = f"{prefix}{event.get('event_id', '')}"
+        return event
+
+    events = []
+    if on_event is None:
+        raw = call_llm(prompt, stage='events', response_schema=EVENTS_SCHEMA)
+        parsed, complete = parse_partial(raw)
+        for event in parsed if isinstance(parsed, list) else []:
+            if finalize(event, id_prefix):
+                events.append(event)
+    else:
+        # Stream: each event goes downstream as soon as its JSON element is complete
+        parser = JsonStreamParser()
+        for chunk in stream_llm(prompt, stage='events', response_schema=EVENTS_SCHEMA):
+            for event in parser.feed(chunk):
+                if finalize(event, id_prefix):
+                    events.append(event)
+                    on_event(event)
+        raw, complete = parser.text, parser.complete
 
+    # Last resort: a truncated or unparseable response is re-prompted for the missing articles only
+    if raw and not complete and retry_missing:
+        assigned = {aid for e in events for aid in e['articles']}
+        missing = [a for a in articles if a.get('id') not in assigned]
+        if missing:
+            logger.warning(f"Event response incomplete. Re-resolving {len(missing)} unassigned articles.")
+            events += _resolve_shard(missing, retry_missing=False, on_event=on_event, id_prefix="r_")
+    return events
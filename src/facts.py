@@ -1,6 +1,119 @@
+import logging
+import hashlib
 import json
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import sessionmaker
 from src.core.llm import call_llm
 from src.core.jsonutil import parse_or_fix
+from src.core.prompt import AliasMap, compact_article, enforce_budget, truncate_field, trim_children, drop_tail, strip_html
+
+logger = logging.getLogger("Facts")
+
+# Sub-batch Settings
+SUB_BATCH_SIZE = 4        # Events per LLM call
+SUB_BATCH_CONCURRENCY = 4 # Sub-batches in flight at once
+SUB_BATCH_RETRIES = 1     # Retry rounds for events missing from a response
+
+# Structured-output schema (enforced by Gemini, see call_llm response_schema).
+# A list with explicit ids, since response schemas can't describe objects with dynamic keys.
+FACTS_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "STRING"},
+            "facts": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "fact": {"type": "STRING"},
+                        "sources": {"type": "ARRAY", "items": {"type": "STRING"}}
+                    },
+                    "required": ["fact", "sources"]
+                }
+            },
+            "confidence": {"type": "NUMBER"}
+        },
+        "required": ["id", "facts", "confidence"]
+    }
+}
+
+def fact_cache_key(articles):
+    """Content hash of an event's article set (source, title, summary), independent of order and event_id."""
+    normalized = sorted(
+        (
+            str(a.get("source", "")).strip().lower(),
+            strip_html(a.get("title", "")).lower(),
+            strip_html(a.get("summary", "")).lower()
+        )
+        for a in articles
+    )
+    return hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+
+class FactCacheStore:
+    """
+    Persistent cache of extract_facts_batch results keyed by fact_cache_key.
+    Entries expire after `ttl_hours`; beyond `max_entries` the least recently used are evicted.
+    """
+    def __init__(self, bind=None, ttl_hours=24, max_entries=2000):
+        if bind is None:
+            from src.database import engine
+            bind = engine
+        self.bind = bind
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=bind)
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_entries = max_entries
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _ensure_table(self):
+        if not self._ready:
+            from src.models import FactCache
+            FactCache.__table__.create(bind=self.bind, checkfirst=True)
+            self._ready = True
+
+    def get_many(self, keys):
+        """Returns {key: result} for fresh entries (one IN query) and refreshes their LRU timestamp."""
+        from src.models import FactCache
+        if not keys:
+            return {}
+        with self._lock:
+            self._ensure_table()
+            now = datetime.utcnow()
+            with self.Session() as db:
+                rows = db.query(FactCache).filter(
+                    FactCache.key.in_(list(keys)),
+                    FactCache.created_at >= now - self.ttl
+                ).all()
+                for row in rows:
+                    row.last_used = now
+                found = {row.key: row.result for row in rows}
+                db.commit()
+            return found
+
+    def put_many(self, entries):
+        """Stores {key: result} and evicts expired / least recently used entries."""
+        from src.models import FactCache
+        if not entries:
+            return
+        with self._lock:
+            self._ensure_table()
+            now = datetime.utcnow()
+            with self.Session() as db:
+                for key, result in entries.items():
+                    db.merge(FactCache(key=key, result=result, created_at=now, last_used=now))
+                db.flush()
+
+                # Eviction: TTL first, then size bound (LRU)
+                db.query(FactCache).filter(FactCache.created_at < now - self.ttl).delete(synchronize_session=False)
+                overflow = db.query(FactCache).count() - self.max_entries
+                if overflow > 0:
+                    stale = [row.key for row in db.query(FactCache.key).order_by(FactCache.last_used.asc()).limit(overflow)]
+                    db.query(FactCache).filter(FactCache.key.in_(stale)).delete(synchronize_session=False)
+                db.commit()
 
 def extract_facts(event, articles):
     # Wrapper for legacy single calls, redirects to batch
@@ -16,29 +129,77 @@ def extract_facts(event, articles):
     # Return result for this specific event or default
     return batch_result.get(event.get("event_id", "single_event"), {"facts": [], "confidence": 0})
 
-def extract_facts_batch(events_data):
+def extract_facts_batch(events_data, sub_batch_size=SUB_BATCH_SIZE, max_concurrency=SUB_BATCH_CONCURRENCY,
+                        max_retries=SUB_BATCH_RETRIES):
     """
     Batch processes multiple events for fact extraction.
     events_data: List of dicts, each containing:
       - event_id
       - title
       - articles (list of full article objects)
+
+    Events are split into sub-batches of `sub_batch_size` that run concurrently, so latency
+    follows the largest sub-batch rather than the total output. Results are merged by event_id,
+    and only events missing from a response (failed call / malformed JSON) are retried,
+    in smaller sub-batches each round.
     """
     if not events_data:
         return {}
 
-    # Minimize token usage by sending only necessary fields
+    results = {}
+    pending = list(events_data)
+    size = max(1, sub_batch_size or len(events_data))
+
+    for attempt in range(max_retries + 1):
+        sub_batches = [pending[i:i + size] for i in range(0, len(pending), size)]
+        if len(sub_batches) == 1:
+            outputs = [_extract_facts_call(sub_batches[0])]
+        else:
+            logger.info(f"Extracting facts in {len(sub_batches)} sub-batches (size {size}, concurrency {max_concurrency})...")
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                outputs = list(executor.map(_extract_facts_call, sub_batches))
+
+        for output in outputs:
+            results.update(output)
+
+        pending = [e for e in pending if e.get("event_id") not in results]
+        if not pending:
+            break
+        if attempt < max_retries:
+            # Adaptive: retry only the missing events, halving the sub-batch size
+            size = max(1, size // 2)
+            logger.warning(f"Fact extraction missing for {len(pending)} events. Retrying (attempt {attempt + 2}/{max_retries + 1})...")
+
+    if pending:
+        logger.warning(f"Fact extraction failed for {len(pending)} events after retries.")
+
+    return results
+
+def _extract_facts_call(events_data):
+    """Single LLM call for a list of events. Returns {event_id: {facts, confidence}} ({} on failure)."""
+
+    # Minimize token usage by sending only necessary fields (short aliases, cleaned summaries)
+    event_aliases = AliasMap("e")
     minimized_data = []
     for item in events_data:
+        article_aliases = AliasMap("a")
+        articles = []
+        for a in item.get("articles", []):
+            record = compact_article(a, article_aliases, include_source=True)
+            del record["id"]  # Article IDs are not referenced in the output
+            articles.append(record)
         minimized_data.append({
-            "id": item.get("event_id"),
+            "id": event_aliases.alias(item.get("event_id")),
             "event": item.get("title"),
-            "articles": [
-                {"s": a.get("source"), "t": a.get("title"), "d": a.get("summary", "")[:200]}
-                for a in item.get("articles", [])
-            ]
+            "articles": articles
         })
 
+    # Enforce the per-call budget: shorten summaries, then cap articles per event, then drop events
+    minimized_data, input_json = enforce_budget(minimized_data, steps=[
+        truncate_field("d", 120), truncate_field("d", 60),
+        trim_children("articles", 3), truncate_field("d", 0), trim_children("articles", 2)
+    ] + [drop_tail()] * 5)
+
     prompt = f"""
 You are a cross-source fact validation engine.
 
@@ -53,14 +214,15 @@ For each event provided in the list:
 Rules:
 - Fact Format: "clear, concise factual statement"
 - Exclude opinions and pure speculation.
-- Return a JSON object where KEYS are the 'id' of the event.
+- Return one entry per event, using the event's 'id'.
 
-Input Data:
-{json.dumps(minimized_data, indent=2)}
+Input Data (s=source, t=title, d=summary):
+{input_json}
 
 Return ONLY valid JSON in this format:
-{{
-  "event_id_1": {{
+[
+  {{
+    "id": "e1",
     "facts": [
       {{
         "fact": "Statement here",
@@ -69,16 +231,26 @@ Return ONLY valid JSON in this format:
     ],
     "confidence": 1.0
   }},
-  "event_id_2": {{
+  {{
+    "id": "e2",
     "facts": [],
     "confidence": 0.5
   }}
-}}
+]
 """
-    raw = call_llm(prompt)
-    data = parse_or_fix(raw, prompt)
+    raw = call_llm(prompt, stage='facts', response_schema=FACTS_SCHEMA)
+    data = parse_or_fix(raw)
 
+    # Schema output is a list of {id, facts, confidence}; older responses are keyed by id
+    if isinstance(data, list):
+        data = {item.get("id"): item for item in data if isinstance(item, dict) and item.get("id")}
     if not isinstance(data, dict):
         return {}
 
-    return data
+    # Map event aliases back to the real event IDs. Entries cut off by a truncated response
+    # are left out, so extract_facts_batch re-prompts for those events only.
+    results = {}
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(value.get("facts"), list) and "confidence" in value:
+            results[event_aliases.resolve(key)] = {k: v for k, v in value.items() if k != "id"}
+    return results
@@ -0,0 +1,180 @@
+import re
+import threading
+import logging
+
+logger = logging.getLogger("Grounding")
+
+# Relative tolerance when matching numbers (covers rounding like "$98k" vs 97,482)
+NUMBER_TOLERANCE = 0.01
+
+# Share of the tweet's content the extracted claims must cover before the critic may be skipped.
+# Anything the extractor can't see (Thai prose, qualitative statements) keeps the critic on.
+MIN_CLAIM_COVERAGE = 0.7
+
+_SCALES = {
+    "k": 1e3, "thousand": 1e3,
+    "m": 1e6, "mn": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+    "t": 1e12, "trillion": 1e12
+}
+
+# ASCII lookarounds instead of \b: Thai script counts as \w, so "BTCพุ่ง" has no word boundary
+_NUMBER_RE = re.compile(
+    r"(?<![A-Za-z0-9.])(?P<currency>\$)?\s?(?P<num>\d[\d,]*(?:\.\d+)?)\s?"
+    r"(?:(?P<percent>%)|(?P<scale>thousand|million|billion|trillion|bn|mn|[kmbt])(?![A-Za-z]))?",
+    re.IGNORECASE
+)
+_CASHTAG_RE = re.compile(r"\$([A-Za-z]{2,6})(?![A-Za-z0-9])")
+_HASHTAG_RE = re.compile(r"#\w+")
+_UPPER_RE = re.compile(r"(?<![A-Za-z0-9$])[A-Z][A-Z0-9]{1,5}(?![A-Za-z0-9])")
+_ENTITY_RE = re.compile(r"(?<![A-Za-z0-9$])[A-Z][a-z][a-zA-Z0-9]*(?: [A-Z][a-z][a-zA-Z0-9]*)*")
+
+# Well-known ticker names, so "BTC" in a tweet matches "Bitcoin" in the facts
+TICKER_NAMES = {
+    "BTC": "bitcoin", "ETH": "ethereum", "SOL": "solana", "XRP": "ripple", "BNB": "binance",
+    "ADA": "cardano", "DOGE": "dogecoin", "USDT": "tether", "USDC": "usd coin"
+}
+
+# Words the tweet format itself adds (sentiment labels, section headers, citation markers)
+IGNORED_WORDS = {
+    "BULLISH", "BEARISH", "NEUTRAL", "PASS", "Consensus", "Impact", "Outlook", "Verified",
+    "Source", "Sources", "Breaking", "The", "This", "That", "These", "Why", "What", "It", "Its",
+    "A", "An", "In", "On", "At", "For", "And", "But", "With", "As", "Is", "Are", "We", "Our"
+}
+
+# Connective and template words that carry no claim ("pulls in", "Verified by 2 sources")
+FILLER_WORDS = {w.lower() for w in IGNORED_WORDS} | {
+    "by", "of", "to", "from", "as", "at", "in", "on", "up", "down", "and", "or", "is", "are", "was",
+    "were", "be", "has", "have", "had", "its", "their", "a", "an", "the", "pulls", "hits", "sees",
+    "now", "new", "verified", "source", "sources", "via"
+}
+
+# Unicode word runs, so Thai text counts toward the content the claims must cover
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def _to_float(match):
+    try:
+        value = float(match.group("num").replace(",", ""))
+    except ValueError:
+        return None
+    scale = match.group("scale")
+    if scale:
+        value *= _SCALES[scale.lower()]
+    return value
+
+def extract_claims(text):
+    """
+    Pulls checkable claims out of a tweet: prices, percentages, other numbers,
+    tickers and named entities. Hashtags are ignored.
+    Returns [{"type", "text", "value"}] (value is a float for numeric claims).
+    """
+    text = _HASHTAG_RE.sub(" ", text or "")
+    claims = []
+    seen = set()
+
+    def add(kind, raw, value):
+        key = (kind, value if value is not None else raw.lower())
+        if key not in seen:
+            seen.add(key)
+            claims.append({"type": kind, "text": raw.strip(), "value": value})
+
+    for match in _NUMBER_RE.finditer(text):
+        value = _to_float(match)
+        if value is None:
+            continue
+        if match.group("percent"):
+            kind = "percent"
+        elif match.group("currency"):
+            kind = "price"
+        else:
+            kind = "number"
+        add(kind, match.group(0), value)
+
+    for match in _CASHTAG_RE.finditer(text):
+        add("ticker", match.group(1).upper(), None)
+    tickers = {c["text"] for c in claims if c["type"] == "ticker"}
+
+    for match in _UPPER_RE.finditer(text):
+        word = match.group(0)
+        if word not in IGNORED_WORDS and not word.isdigit() and word not in tickers:
+            add("ticker", word, None)
+            tickers.add(word)
+
+    for match in _ENTITY_RE.finditer(text):
+        entity = match.group(0)
+        words = [w for w in entity.split() if w not in IGNORED_WORDS]
+        if words:
+            add("entity", " ".join(words), None)
+
+    return claims
+
+def claim_coverage(text, claims):
+    """
+    Fraction of the tweet's content (word characters outside hashtags and filler words)
+    made up of the given claims. 1.0 means the claims are all there is to check.
+    """
+    covered = {token.lower() for claim in claims for token in _TOKEN_RE.findall(claim["text"])}
+    content = [t.lower() for t in _TOKEN_RE.findall(_HASHTAG_RE.sub(" ", text or "")) if t.lower() not in FILLER_WORDS]
+    total = sum(len(t) for t in content)
+    if not total:
+        return 0.0
+    return sum(len(t) for t in content if t in covered) / total
+
+def _evidence_numbers(evidence):
+    numbers = []
+    for match in _NUMBER_RE.finditer(evidence):
+        value = _to_float(match)
+        if value is not None:
+            numbers.append(value)
+    return numbers
+
+def _number_matches(value, numbers, tolerance):
+    for number in numbers:
+        if value == number or (number and abs(value - number) / abs(number) <= tolerance):
+            return True
+    return False
+
+def check_claims(text, evidence_texts, tolerance=NUMBER_TOLERANCE):
+    """
+    Matches the tweet's claims against the evidence (verified facts, market data, sources).
+    Returns (grounded, unmatched) lists of claims.
+    """
+    evidence = "\n".join(str(e) for e in evidence_texts if e)
+    evidence_lower = evidence.lower()
+    numbers = _evidence_numbers(evidence)
+
+    grounded, unmatched = [], []
+    for claim in extract_claims(text):
+        if claim["value"] is not None:
+            ok = _number_matches(claim["value"], numbers, tolerance)
+        elif claim["type"] == "ticker":
+            name = TICKER_NAMES.get(claim["text"])
+            ok = claim["text"].lower() in evidence_lower or (name is not None and name in evidence_lower)
+        else:
+            # Multi-word names match if each word appears ("BlackRock Bitcoin" vs "Bitcoin ETF from BlackRock")
+            ok = all(word.lower() in evidence_lower for word in claim["text"].split() if word not in IGNORED_WORDS)
+        (grounded if ok else unmatched).append(claim)
+    return grounded, unmatched
+
+class PreCriticStats:
+    """How often the deterministic check let a tweet skip the critic LLM call."""
+    def __init__(self):
+        self.checks = 0
+        self.skipped = 0
+        self.unmatched_claims = 0
+        self._lock = threading.Lock()
+
+    def record(self, skipped, unmatched=0):
+        with self._lock:
+            self.checks += 1
+            self.skipped += int(skipped)
+            self.unmatched_claims += unmatched
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checks": self.checks,
+                "skipped": self.skipped,
+                "skip_rate": round(self.skipped / self.checks, 3) if self.checks else 0.0,
+                "unmatched_claims": self.unmatched_claims
+            }
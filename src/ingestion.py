@@ -2,18 +2,147 @@ import feedparser
 from datetime import datetime
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import os
-import difflib
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
+from sqlalchemy.orm import sessionmaker
 from src.events import resolve_events
-from src.facts import extract_facts_batch
+from src.facts import extract_facts_batch, fact_cache_key, FactCacheStore, SUB_BATCH_SIZE, SUB_BATCH_CONCURRENCY
+from src.dedup import collapse_near_duplicates
 
 load_dotenv()
 logger = logging.getLogger("Ingestion")
 
+# Overridable via "ingestion" in config.json
+DEFAULT_INGESTION_SETTINGS = {
+    "event_resolution": "llm",  # "llm" (single prompt) or "local" (embedding clustering, see src.clustering)
+    "dedup_threshold": 0.8,     # Near-duplicate collapsing before event resolution (null disables)
+    "stream_events": True       # Stream resolved events so fact extraction overlaps event resolution
+}
+
+def load_ingestion_settings(path="config.json"):
+    """Reads the optional "ingestion" section from config.json."""
+    settings = dict(DEFAULT_INGESTION_SETTINGS)
+    try:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                settings.update(json.load(f).get("ingestion", {}))
+    except Exception as e:
+        logger.error(f"Error loading ingestion settings from {path}: {e}. Using defaults.")
+    return settings
+
+# --- Shared HTTP Transport ---
+# One pooled keep-alive session for every outbound source (RSS, Blockchain.info, CoinGecko)
+HTTP_TIMEOUT = (5, 10)    # (connect, read) seconds
+HTTP_POOL_HOSTS = 10      # Number of per-host pools kept alive
+HTTP_POOL_PER_HOST = 4    # Max concurrent connections per host (callers block when exhausted)
+HTTP_RETRIES = 2          # Retries on connection errors and 429/5xx (honours Retry-After)
+
+_HTTP_SESSION = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+def get_http_session():
+    """Returns the process-wide pooled HTTP session, creating it on first use."""
+    global _HTTP_SESSION
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is None:
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(["GET", "HEAD"]),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_HOSTS,
+                pool_maxsize=HTTP_POOL_PER_HOST,
+                pool_block=True,
+                max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Accept-Encoding": "gzip, deflate",
+                "User-Agent": "Sentix/2.1"
+            })
+            _HTTP_SESSION = session
+        return _HTTP_SESSION
+
+def http_get(url, headers=None, timeout=None):
+    """GET through the shared session with the default timeout policy."""
+    return get_http_session().get(url, headers=headers, timeout=timeout or HTTP_TIMEOUT)
+
+class FeedCacheStore:
+    """
+    Persistent per-feed validator store (ETag, Last-Modified, content hash).
+    Lives in the `feed_cache` table next to the rest of the bot state, so
+    conditional requests keep working across restarts.
+    """
+    def __init__(self, bind=None):
+        if bind is None:
+            from src.database import engine
+            bind = engine
+        self.bind = bind
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=bind)
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Lazy load so constructing IngestionModule never touches the DB
+        if self._entries is not None:
+            return
+        from src.models import FeedCache
+        FeedCache.__table__.create(bind=self.bind, checkfirst=True)
+        with self.Session() as db:
+            self._entries = {
+                row.url: {
+                    "etag": row.etag,
+                    "last_modified": row.last_modified,
+                    "content_hash": row.content_hash,
+                    "items": row.items or []
+                }
+                for row in db.query(FeedCache).all()
+            }
+
+    def get(self, url):
+        with self._lock:
+            self._load()
+            return self._entries.get(url)
+
+    def save(self, url, source_name, etag, last_modified, content_hash, items):
+        from src.models import FeedCache
+        entry = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": content_hash,
+            "items": items
+        }
+        with self._lock:
+            self._load()
+            self._entries[url] = entry
+            with self.Session() as db:
+                db.merge(FeedCache(
+                    url=url,
+                    source=source_name,
+                    etag=etag,
+                    last_modified=last_modified,
+                    content_hash=content_hash,
+                    items=items,
+                    last_fetched=datetime.utcnow()
+                ))
+                db.commit()
+
 class IngestionModule:
-    def __init__(self):
+    def __init__(self, max_workers=5, feed_timeout=10, fetch_deadline=20, feed_cache=None, fact_cache=None,
+                 settings=None):
         # Extended RSS Sources
         self.rss_feeds = {
             "WatcherGuru": "https://watcher.guru/news/feed",
@@ -23,17 +152,67 @@ class IngestionModule:
             "Decrypt": "https://decrypt.co/feed"
         }
 
-    def fetch_news(self):
+        # Concurrent Fetch Settings
+        self.max_workers = max_workers        # Max feeds fetched in parallel
+        self.feed_timeout = feed_timeout      # Seconds per feed (HTTP timeout)
+        self.fetch_deadline = fetch_deadline  # Seconds for the whole fetch step
+        self.timed_out_sources = []           # Sources that missed the deadline on the last fetch
+
+        # Conditional-GET cache (pass feed_cache=False to always download and parse)
+        self.feed_cache = FeedCacheStore() if feed_cache is None else feed_cache
+
+        # Cross-cycle fact extraction cache (pass fact_cache=False to always call the LLM)
+        self.fact_cache = FactCacheStore() if fact_cache is None else fact_cache
+
+        # Dedup threshold, event resolution mode and streaming (see DEFAULT_INGESTION_SETTINGS)
+        self.settings = settings or load_ingestion_settings()
+        self.dedup_threshold = self.settings["dedup_threshold"]
+        self.event_resolution = self.settings["event_resolution"]
+        self.stream_events = self.settings["stream_events"]
+
+    def fetch_news(self, concurrent=True):
         """
         Fetches news from RSS sources.
+        In concurrent mode, feeds are fetched in parallel and the call returns
+        whatever finished before `fetch_deadline`. Late sources are recorded in
+        `self.timed_out_sources`.
         """
         all_news = []
+        self.timed_out_sources = []
+
+        if not concurrent:
+            # Sequential Mode (one feed at a time)
+            for source_name, url in self.rss_feeds.items():
+                rss_items = self.fetch_rss_feed(source_name, url)
+                if rss_items:
+                    all_news.extend(rss_items)
 
-        # Fetch from RSS Sources
-        for source_name, url in self.rss_feeds.items():
-            rss_items = self.fetch_rss_feed(source_name, url)
-            if rss_items:
-                all_news.extend(rss_items)
+            logger.info(f"Total aggregated news items: {len(all_news)}")
+            return all_news
+
+        # Concurrent Mode (bounded thread pool + global deadline)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="rss")
+        try:
+            futures = {
+                executor.submit(self.fetch_rss_feed, source_name, url): source_name
+                for source_name, url in self.rss_feeds.items()
+            }
+            done, not_done = wait(futures, timeout=self.fetch_deadline)
+
+            # Keep results in feed order so output is stable across runs
+            for future, source_name in futures.items():
+                if future in done:
+                    rss_items = future.result()
+                    if rss_items:
+                        all_news.extend(rss_items)
+                else:
+                    self.timed_out_sources.append(source_name)
+        finally:
+            # Don't block on stragglers; they finish in the background and are discarded
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if self.timed_out_sources:
+            logger.warning(f"RSS fetch deadline ({self.fetch_deadline}s) exceeded for: {', '.join(self.timed_out_sources)}")
 
         logger.info(f"Total aggregated news items: {len(all_news)}")
         return all_news
@@ -42,7 +221,29 @@ class IngestionModule:
         """Fetches and parses a generic RSS feed."""
         logger.info(f"Fetching {source_name} RSS feed...")
         try:
-            feed = feedparser.parse(url)
+            cached = self.feed_cache.get(url) if self.feed_cache else None
+
+            # Send validators from the last fetch so unchanged feeds cost only a header round trip
+            headers = {}
+            if cached:
+                if cached.get("etag"):
+                    headers["If-None-Match"] = cached["etag"]
+                if cached.get("last_modified"):
+                    headers["If-Modified-Since"] = cached["last_modified"]
+
+            # Download with an explicit timeout (feedparser has none), then parse the body
+            r = http_get(url, headers=headers, timeout=self.feed_timeout)
+            if r.status_code == 304 and cached:
+                logger.info(f"[{source_name}] Not modified (304). Using cached items.")
+                return list(cached["items"])
+            r.raise_for_status()
+
+            content_hash = hashlib.sha256(r.content).hexdigest()
+            if cached and cached.get("content_hash") == content_hash:
+                logger.info(f"[{source_name}] Feed body unchanged. Using cached items.")
+                return list(cached["items"])
+
+            feed = feedparser.parse(r.content)
             news_items = []
             # Updated to fetch 5 items per source as requested
             for entry in feed.entries[:5]:
@@ -62,6 +263,15 @@ class IngestionModule:
                     "source": source_name,
                     "id": entry.link
                 })
+
+            if self.feed_cache:
+                self.feed_cache.save(
+                    url, source_name,
+                    etag=r.headers.get("ETag"),
+                    last_modified=r.headers.get("Last-Modified"),
+                    content_hash=content_hash,
+                    items=news_items
+                )
             return news_items
         except Exception as e:
             logger.error(f"RSS Fetch Error ({source_name}): {e}")
@@ -70,9 +280,9 @@ class IngestionModule:
     def process_pipeline(self, news_items):
         """
         Orchestrates the Verification Pipeline:
-        1. Anonymize Sources
+        1. Collapse Near-Duplicates & Anonymize Sources
         2. Resolve Events (Event Detection)
-        3. Extract Facts (Fact Validation) with Source Confidence (Batched)
+        3. Extract Facts (Fact Validation) with Source Confidence (Batched, overlapped with 2)
         """
         logger.info("Starting Event Resolution Pipeline...")
 
@@ -87,55 +297,69 @@ class IngestionModule:
 
             item_map[item_id] = item
 
+        # Only one representative per near-duplicate group is sent to the LLM
+        if self.dedup_threshold is not None:
+            groups = collapse_near_duplicates(news_items, threshold=self.dedup_threshold)
+        else:
+            groups = [[item] for item in news_items]
+
+        duplicate_map = {} # Representative ID -> all member IDs
+        for group in groups:
+            item = group[0]
+            duplicate_map[item['id']] = [member['id'] for member in group]
+
             # Create anon copy
             anon_item = item.copy()
             if 'source' in anon_item:
                 del anon_item['source']
             anonymized_items.append(anon_item)
 
-        # 2. Resolve Events
-        # Returns list of { event_id, title, articles: [id1, id2...] }
-        events = resolve_events(anonymized_items)
-        if not events:
-            logger.info("No events resolved from news items.")
-            return []
-
-        verified_events = []
-
-        # Prepare Batch Data
+        # 2. Resolve Events, overlapped with 3. Batch Fact Extraction
+        # Resolved events are streamed out as they are generated; facts for the first sub-batch
+        # are extracted while later events are still being produced. Events that weren't
+        # streamed (sharded / local resolution) are extracted once resolution returns.
         events_to_process = []
-
-        for event in events:
-            article_ids = event.get('articles', [])
-            full_articles = [item_map[aid] for aid in article_ids if aid in item_map]
-
-            if not full_articles:
-                continue
-
-            unique_sources = set(a['source'] for a in full_articles)
-
-            # Enrich Event Object early
-            event['sources'] = list(unique_sources)
-            event['source_count'] = len(unique_sources)
-            event['items'] = full_articles
-
-            events_to_process.append(event)
+        streamed = set()  # id() of events already handed over by the stream
+        batch = []
+        futures = []
+        lock = threading.Lock()
+
+        with ThreadPoolExecutor(max_workers=SUB_BATCH_CONCURRENCY) as executor:
+            def on_event(event):
+                prepared = self._prepare_event(event, item_map, duplicate_map)
+                with lock:
+                    streamed.add(id(event))
+                    if prepared is None:
+                        return
+                    events_to_process.append(prepared)
+                    batch.append(prepared)
+                    if len(batch) >= SUB_BATCH_SIZE:
+                        futures.append(executor.submit(self._extract_facts_cached, list(batch)))
+                        batch.clear()
+
+            # Returns list of { event_id, title, articles: [id1, id2...] }
+            events = resolve_events(anonymized_items, mode=self.event_resolution,
+                                    on_event=on_event if self.stream_events else None)
+
+            with lock:
+                for event in events or []:
+                    if id(event) in streamed:
+                        continue
+                    prepared = self._prepare_event(event, item_map, duplicate_map)
+                    if prepared is not None:
+                        events_to_process.append(prepared)
+                        batch.append(prepared)
+                if batch:
+                    futures.append(executor.submit(self._extract_facts_cached, list(batch)))
 
         if not events_to_process:
+            logger.info("No events resolved from news items.")
             return []
 
-        # 3. Batch Fact Extraction
-        logger.info(f"Extracting facts for {len(events_to_process)} events (Batch Processing)...")
-        # Prepare data structure for batch call
-        batch_input = []
-        for e in events_to_process:
-            batch_input.append({
-                "event_id": e.get("event_id"),
-                "title": e.get("title"),
-                "articles": e.get("items")
-            })
-
-        facts_results = extract_facts_batch(batch_input)
+        verified_events = []
+        facts_results = {}
+        for future in futures:
+            facts_results.update(future.result())
 
         # 4. Map Results Back
         for event in events_to_process:
@@ -157,6 +381,60 @@ class IngestionModule:
 
         return verified_events
 
+    def _prepare_event(self, event, item_map, duplicate_map):
+        """Re-expands an event's representatives to every collapsed copy and attaches sources/items."""
+        # Re-expand representatives to every collapsed copy (keeps original IDs and sources)
+        article_ids = []
+        for aid in event.get('articles', []):
+            for member_id in duplicate_map.get(aid, [aid]):
+                if member_id not in article_ids:
+                    article_ids.append(member_id)
+        full_articles = [item_map[aid] for aid in article_ids if aid in item_map]
+
+        if not full_articles:
+            return None
+
+        unique_sources = set(a['source'] for a in full_articles)
+
+        # Enrich Event Object early
+        event['sources'] = list(unique_sources)
+        event['source_count'] = len(unique_sources)
+        event['items'] = full_articles
+        return event
+
+    def _extract_facts_cached(self, events):
+        """Facts for prepared events. Article sets seen in an earlier cycle are served from the fact cache."""
+        facts_results = {}
+        cache_keys = {}
+        if self.fact_cache:
+            cache_keys = {e.get("event_id"): fact_cache_key(e.get("items")) for e in events}
+            cached = self.fact_cache.get_many(set(cache_keys.values()))
+            for event_id, key in cache_keys.items():
+                if key in cached:
+                    facts_results[event_id] = cached[key]
+            if facts_results:
+                logger.info(f"Fact cache hit for {len(facts_results)}/{len(events)} events.")
+
+        uncached_events = [e for e in events if e.get("event_id") not in facts_results]
+        if uncached_events:
+            logger.info(f"Extracting facts for {len(uncached_events)} events (Batch Processing)...")
+            # Prepare data structure for batch call
+            batch_input = [{
+                "event_id": e.get("event_id"),
+                "title": e.get("title"),
+                "articles": e.get("items")
+            } for e in uncached_events]
+
+            new_results = extract_facts_batch(batch_input)
+            facts_results.update(new_results)
+
+            if self.fact_cache:
+                self.fact_cache.put_many({
+                    cache_keys[e.get("event_id")]: new_results[e.get("event_id")]
+                    for e in uncached_events if e.get("event_id") in new_results
+                })
+        return facts_results
+
 class WhaleMonitor:
     def __init__(self):
         pass
@@ -169,7 +447,7 @@ class WhaleMonitor:
         try:
             # Fetch unconfirmed transactions
             url = "https://blockchain.info/unconfirmed-transactions?format=json"
-            r = requests.get(url, timeout=10)
+            r = http_get(url)
             data = r.json()
             
             large_txs = []
@@ -201,7 +479,7 @@ class MarketData:
             cg_id = ids.get(symbol, "bitcoin")
             
             url = f"https://api.coingecko.com/api/v3/simple/price?ids={cg_id}&vs_currencies=usd&include_24hr_change=true"
-            r = requests.get(url, timeout=10)
+            r = http_get(url)
             data = r.json()
             
             price = data[cg_id]['usd']
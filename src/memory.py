@@ -1,46 +1,263 @@
-import chromadb
-from chromadb.config import Settings
+import os
+import time
 import hashlib
 import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from src.core.embeddings import get_embedding_service
+from src.vector_store import make_store
+
+logger = logging.getLogger("Memory")
+
+# Overridable via "memory" in config.json
+DEFAULT_MEMORY_SETTINGS = {
+    "backend": "chroma",              # Storage backend: "chroma" or "numpy" (see src.vector_store)
+    "query_cache_size": 256,          # retrieve_context results kept in process (LRU)
+    "query_cache_ttl_seconds": 21600, # Matches a few scheduler cycles
+    "retention_days": 180,            # Older events are pruned by compaction
+    "max_documents": 5000,            # Beyond this, the oldest events are pruned
+    "decay_half_life_days": 30,       # Relevance halves every N days of age (0 disables decay)
+    "query_max_age_days": None,       # Default window for retrieval (None: all history)
+    "candidate_multiplier": 3,        # Neighbours fetched per result, re-ranked with decay
+    "compaction_interval_hours": 24
+}
+
+DAY_SECONDS = 86400
+
+def load_memory_settings(path="config.json"):
+    """Reads the optional "memory" section from config.json."""
+    settings = dict(DEFAULT_MEMORY_SETTINGS)
+    try:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                settings.update(json.load(f).get("memory", {}))
+    except Exception as e:
+        logger.error(f"Error loading memory settings from {path}: {e}. Using defaults.")
+    return settings
+
+def event_time(metadata):
+    """Epoch seconds of a stored event (numeric "ts", else the ISO "timestamp"), or None if unknown."""
+    if not metadata:
+        return None
+    ts = metadata.get("ts")
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        return float(ts)
+    try:
+        dt = datetime.fromisoformat(str(metadata.get("timestamp")))
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def decayed_score(distance, age_days, half_life_days):
+    """Similarity (from the vector distance) halved for every `half_life_days` of age."""
+    score = 1.0 / (1.0 + max(distance, 0.0))
+    if half_life_days and age_days is not None and age_days > 0:
+        score *= 0.5 ** (age_days / half_life_days)
+    return score
+
+def normalize_query(text):
+    return " ".join((text or "").lower().split())
+
+class QueryCache:
+    """
+    LRU + TTL cache of retrieval results keyed by (normalized query, n_results).
+    Every write to the collection bumps `generation`; entries from an older generation
+    are treated as misses, and results computed across a write are never stored.
+    """
+    def __init__(self, max_entries=256, ttl_seconds=21600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (generation, stored_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == self.generation and now - entry[1] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, generation):
+        with self._lock:
+            if generation != self.generation or self.max_entries <= 0:
+                return  # A write landed while this result was computed
+            self._entries[key] = (generation, time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": len(self._entries),
+                "generation": self.generation
+            }
 
 class MemoryModule:
-    def __init__(self, db_path="chroma_db"):
-        self.client = chromadb.PersistentClient(path=db_path)
-        self.collection = self.client.get_or_create_collection(name="crypto_news_history")
+    def __init__(self, db_path=None, embedder=None, settings=None, store=None):
+        self.settings = settings or load_memory_settings()
+        # db_path defaults to the backend's own location ("chroma_db" for Chroma)
+        self.store = store or make_store(self.settings["backend"], db_path)
+        # Vectors come from the shared embedding service (cached on disk), never from the store
+        self.embedder = embedder or get_embedding_service()
+
+        self.query_cache = QueryCache(
+            max_entries=self.settings["query_cache_size"],
+            ttl_seconds=self.settings["query_cache_ttl_seconds"]
+        )
 
     def _generate_id(self, content):
         return hashlib.md5(content.encode()).hexdigest()
 
     def store_news_event(self, text, metadata):
         """Stores a news event with its metadata (source, sentiment, timestamp)."""
-        doc_id = self._generate_id(text)
-        
-        # Check if already exists to avoid dupes (basic check)
-        existing = self.collection.get(ids=[doc_id])
-        if existing['ids']:
-            return False # Already exists
-
-        self.collection.add(
-            documents=[text],
-            metadatas=[metadata],
-            ids=[doc_id]
-        )
-        return True
+        return self.store_many([(text, metadata)]) > 0
+
+    def store_many(self, events):
+        """
+        Upserts a list of (text, metadata) news events in a single call.
+        Re-storing the same text refreshes its metadata instead of adding a duplicate.
+        Returns the number of documents written.
+        """
+        documents, metadatas, ids = [], [], []
+        seen = set()
+        for text, metadata in events:
+            if not text:
+                continue
+            doc_id = self._generate_id(text)
+            if doc_id in seen:
+                continue  # Same text twice in one batch: keep the first
+            seen.add(doc_id)
+            metadata = dict(metadata or {})
+            ts = event_time(metadata)
+            if ts is not None:
+                metadata["ts"] = ts  # Numeric copy of the timestamp, so queries can filter by age
+            documents.append(text)
+            metadatas.append(metadata)
+            ids.append(doc_id)
 
-    def retrieve_context(self, query_text, n_results=3):
+        if not ids:
+            return 0
+        self.store.upsert(ids, documents, self.embedder.embed(documents), metadatas)
+        self.query_cache.invalidate()
+        logger.debug(f"Stored {len(ids)} news events")
+        return len(ids)
+
+    def retrieve_context(self, query_text, n_results=3, max_age_days=None):
         """Retrieves similar past news events to provide context."""
-        results = self.collection.query(
-            query_texts=[query_text],
-            n_results=n_results
+        return self.retrieve_many([query_text], n_results, max_age_days)[0]
+
+    def retrieve_many(self, query_texts, n_results=3, max_age_days=None):
+        """
+        Retrieves similar past news events for several topics in one query.
+        Neighbours are re-ranked by similarity decayed with age, optionally limited to the
+        last `max_age_days` (None uses the configured "query_max_age_days").
+        Returns one context string per query text, in order ("" when nothing matched).
+        Results are served from the query cache until the next write.
+        """
+        if not query_texts:
+            return []
+        if max_age_days is None:
+            max_age_days = self.settings["query_max_age_days"]
+
+        keys = [(normalize_query(q), n_results, max_age_days) for q in query_texts]
+        contexts = [self.query_cache.get(key) for key in keys]
+        # Distinct uncached queries, in order
+        missing = list(dict.fromkeys(key for key, context in zip(keys, contexts) if context is None))
+        if not missing:
+            return contexts
+
+        now = time.time()
+        generation = self.query_cache.generation
+        results = self.store.query(
+            self.embedder.embed([key[0] for key in missing]),
+            n_results * max(1, self.settings["candidate_multiplier"]),
+            min_ts=now - max_age_days * DAY_SECONDS if max_age_days is not None else None
         )
-        
-        context_items = []
-        if results['documents']:
-            for i, doc in enumerate(results['documents'][0]):
-                meta = results['metadatas'][0][i]
-                context_items.append(f"Date: {meta.get('timestamp', 'N/A')}, Event: {doc}, Source: {meta.get('source', 'Unknown')}")
-        
-        return "\n".join(context_items)
+
+        half_life = self.settings["decay_half_life_days"]
+        fetched = {}
+        for key, neighbours in zip(missing, results):
+            candidates = []
+            for doc, meta, distance in neighbours:
+                ts = event_time(meta)
+                age_days = (now - ts) / DAY_SECONDS if ts is not None else None
+                candidates.append((decayed_score(distance, age_days, half_life), doc, meta))
+            candidates.sort(key=lambda c: c[0], reverse=True)
+
+            context_items = [
+                f"Date: {meta.get('timestamp', 'N/A')}, Event: {doc}, Source: {meta.get('source', 'Unknown')}"
+                for _, doc, meta in candidates[:n_results]
+            ]
+            fetched[key] = "\n".join(context_items)
+            self.query_cache.put(key, fetched[key], generation)
+
+        return [fetched[key] if context is None else context for key, context in zip(keys, contexts)]
+
+    def compact(self, retention_days=None, max_documents=None):
+        """
+        Retention pass: deletes events older than `retention_days`, then the oldest events
+        beyond `max_documents`, and backfills the numeric "ts" on entries stored without it.
+        Events with an unknown date are kept by the age rule but pruned first by the count rule.
+        Returns {"deleted", "backfilled", "remaining"}.
+        """
+        retention_days = self.settings["retention_days"] if retention_days is None else retention_days
+        max_documents = self.settings["max_documents"] if max_documents is None else max_documents
+
+        now = time.time()
+        dated = []
+        expired, backfill_ids, backfill_metas = [], [], []
+        for doc_id, _, meta in self.store.items():
+            meta = meta or {}
+            ts = event_time(meta)
+            if ts is not None and retention_days and now - ts > retention_days * DAY_SECONDS:
+                expired.append(doc_id)
+                continue
+            if ts is not None and "ts" not in meta:
+                backfill_ids.append(doc_id)
+                backfill_metas.append(dict(meta, ts=ts))
+            dated.append((ts if ts is not None else float("-inf"), doc_id))
+
+        overflow = []
+        if max_documents and len(dated) > max_documents:
+            dated.sort()
+            overflow = [doc_id for _, doc_id in dated[:len(dated) - max_documents]]
+
+        deleted = expired + overflow
+        if deleted:
+            self.store.delete(deleted)
+        dropped = set(overflow)
+        keep = [(i, m) for i, m in zip(backfill_ids, backfill_metas) if i not in dropped]
+        if keep:
+            self.store.update_metadatas([i for i, _ in keep], [m for _, m in keep])
+        if deleted or keep:
+            self.query_cache.invalidate()
+
+        result = {"deleted": len(deleted), "backfilled": len(keep), "remaining": len(dated) - len(overflow)}
+        logger.info(f"Memory compaction: {result}")
+        return result
 
 if __name__ == "__main__":
     # Test memory module
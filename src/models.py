@@ -12,6 +12,39 @@ class ProcessedNews(Base):
     sentiment = Column(String) # BULLISH, BEARISH, NEUTRAL
     processed_at = Column(DateTime, default=datetime.utcnow)
 
+class FeedCache(Base):
+    __tablename__ = "feed_cache"
+
+    url = Column(String, primary_key=True) # Feed URL
+    source = Column(String)
+    etag = Column(String, nullable=True) # ETag header from last 200 response
+    last_modified = Column(String, nullable=True) # Last-Modified header from last 200 response
+    content_hash = Column(String, nullable=True) # SHA-256 of last downloaded body
+    items = Column(JSON, nullable=True) # Parsed items from last body (served on 304 / unchanged)
+    last_fetched = Column(DateTime, default=datetime.utcnow)
+
+class FactCache(Base):
+    __tablename__ = "fact_cache"
+
+    key = Column(String, primary_key=True) # SHA-256 of the event's normalized article set
+    result = Column(JSON) # {"facts": [...], "confidence": float}
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used = Column(DateTime, default=datetime.utcnow)
+
+class PendingAnalysis(Base):
+    __tablename__ = "pending_analysis"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String)
+    topic = Column(String) # Event title
+    symbol = Column(String) # Chart symbol (BTC / ETH)
+    source_count = Column(Integer)
+    sources = Column(JSON) # List of source names
+    items = Column(JSON) # [{"id", "title", "source"}] of the event's articles
+    analysis = Column(JSON) # {"sentiment", "reasoning", "tweet", "knowledge_base_entry", "hallucination_check"}
+    created_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(String, default="PENDING") # PENDING, PUBLISHED, EXPIRED
+
 class BotLog(Base):
     __tablename__ = "bot_logs"
 
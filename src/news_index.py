@@ -0,0 +1,78 @@
+import threading
+import logging
+from collections import OrderedDict
+from src.models import ProcessedNews
+
+logger = logging.getLogger("NewsIndex")
+
+class ProcessedNewsIndex:
+    """
+    In-memory index of processed news IDs.
+    Loaded once from `processed_news` and kept in sync on insert, so the
+    per-cycle "is this new?" check needs no per-item DB round trips.
+    """
+    def __init__(self, recent_size=5000):
+        self._seen = None                # All processed IDs (loaded lazily)
+        self._recent_new = OrderedDict() # Bounded window of IDs confirmed NOT in the DB
+        self.recent_size = recent_size
+        self._lock = threading.Lock()
+
+    def load(self, db):
+        """(Re)loads all processed IDs from the DB."""
+        ids = {row[0] for row in db.query(ProcessedNews.id).all()}
+        with self._lock:
+            self._seen = ids
+            self._recent_new.clear()
+        logger.info(f"Loaded {len(ids)} processed news IDs into index.")
+
+    def _ensure_loaded(self, db):
+        if self._seen is None:
+            self.load(db)
+
+    def contains(self, item_id):
+        with self._lock:
+            return self._seen is not None and item_id in self._seen
+
+    def filter_new(self, db, items, verify=True):
+        """
+        Returns the items whose ID has not been processed yet.
+        With `verify`, IDs not seen recently are confirmed against the DB in one IN (...) query
+        (catches rows written by another process since the index was loaded).
+        """
+        self._ensure_loaded(db)
+
+        with self._lock:
+            candidates = {
+                item.get('id', item.get('link')) for item in items
+            } - self._seen
+            unknown = [i for i in candidates if i not in self._recent_new]
+
+        if verify and unknown:
+            found = {
+                row[0] for row in db.query(ProcessedNews.id).filter(ProcessedNews.id.in_(unknown)).all()
+            }
+            with self._lock:
+                self._seen.update(found)
+                for item_id in unknown:
+                    if item_id not in found:
+                        self._remember_new(item_id)
+
+        with self._lock:
+            return [item for item in items if item.get('id', item.get('link')) not in self._seen]
+
+    def _remember_new(self, item_id):
+        # Caller holds the lock
+        self._recent_new[item_id] = True
+        self._recent_new.move_to_end(item_id)
+        while len(self._recent_new) > self.recent_size:
+            self._recent_new.popitem(last=False)
+
+    def add_many(self, item_ids):
+        """Marks IDs as processed. Call after the corresponding rows are committed."""
+        with self._lock:
+            if self._seen is None:
+                # Not loaded yet; the next load() will pick the rows up from the DB
+                return
+            for item_id in item_ids:
+                self._seen.add(item_id)
+                self._recent_new.pop(item_id, None)
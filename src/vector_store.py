@@ -0,0 +1,254 @@
+import os
+import abc
+import json
+import threading
+import logging
+import numpy as np
+
+logger = logging.getLogger("VectorStore")
+
+COLLECTION_NAME = "crypto_news_history"
+
+# Where each backend keeps its files unless a path is given
+DEFAULT_STORE_PATHS = {"chroma": "chroma_db", "numpy": "vector_store"}
+
+class VectorStore(abc.ABC):
+    """
+    Storage backend for MemoryModule: documents with metadata and a caller-supplied embedding.
+    Queries can be limited to entries whose numeric "ts" metadata is at least `min_ts`
+    (entries without "ts" are then excluded).
+    """
+
+    @abc.abstractmethod
+    def count(self):
+        pass
+
+    @abc.abstractmethod
+    def upsert(self, ids, documents, embeddings, metadatas):
+        pass
+
+    @abc.abstractmethod
+    def query(self, embeddings, n_results, min_ts=None):
+        """Returns, per query embedding, up to n_results [(document, metadata, distance)] nearest first."""
+        pass
+
+    @abc.abstractmethod
+    def items(self):
+        """Returns every entry as [(id, document, metadata)]."""
+        pass
+
+    @abc.abstractmethod
+    def delete(self, ids):
+        pass
+
+    @abc.abstractmethod
+    def update_metadatas(self, ids, metadatas):
+        pass
+
+class ChromaStore(VectorStore):
+    """Chroma PersistentClient collection (squared L2 distance)."""
+    def __init__(self, path=DEFAULT_STORE_PATHS["chroma"], collection=COLLECTION_NAME):
+        # Imported here so the numpy backend never pays for chromadb's import
+        import chromadb
+        self.client = chromadb.PersistentClient(path=path)
+        self.collection = self.client.get_or_create_collection(name=collection)
+
+    def count(self):
+        return self.collection.count()
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        self.collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+    def query(self, embeddings, n_results, min_ts=None):
+        query = {"where": {"ts": {"$gte": min_ts}}} if min_ts is not None else {}
+        results = self.collection.query(query_embeddings=embeddings, n_results=n_results, **query)
+        documents = results['documents'] or []
+        return [
+            [(doc, results['metadatas'][q][i] or {}, results['distances'][q][i]) for i, doc in enumerate(documents[q])]
+            if q < len(documents) else []
+            for q in range(len(embeddings))
+        ]
+
+    def items(self):
+        records = self.collection.get(include=["documents", "metadatas"])
+        return [(doc_id, doc, meta or {}) for doc_id, doc, meta in zip(records['ids'], records['documents'], records['metadatas'])]
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def update_metadatas(self, ids, metadatas):
+        if ids:
+            self.collection.update(ids=list(ids), metadatas=list(metadatas))
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _ts_value(metadata):
+    ts = (metadata or {}).get("ts")
+    return float(ts) if isinstance(ts, (int, float)) and not isinstance(ts, bool) else np.nan
+
+class NumpyStore(VectorStore):
+    """
+    In-process store: unit-normalized float32 embeddings in a memory-mapped file
+    (vectors.f32) plus a JSON sidecar (index.json) with ids, documents and metadata.
+    Queries are a brute-force matrix product; distances are squared L2 between unit
+    vectors (2 - 2 * cosine), the same scale Chroma reports for normalized embeddings.
+    """
+    VECTORS_FILE = "vectors.f32"
+    INDEX_FILE = "index.json"
+    MIN_CAPACITY = 64
+
+    def __init__(self, path=DEFAULT_STORE_PATHS["numpy"]):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self.dim = None
+        self.capacity = 0
+        self._vectors = None
+        self._ids, self._documents, self._metadatas = [], [], []
+        self._rows = {}
+        self._ts = np.zeros(0, dtype=np.float64)
+        self._load()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        index_path = self._file(self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.dim, self.capacity = index["dim"], index["capacity"]
+        self._ids, self._documents, self._metadatas = index["ids"], index["documents"], index["metadatas"]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._ts = np.array([_ts_value(m) for m in self._metadatas], dtype=np.float64)
+        if self.dim:
+            self._vectors = np.memmap(self._file(self.VECTORS_FILE), dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+    def _save(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+        index = {
+            "dim": self.dim, "capacity": self.capacity,
+            "ids": self._ids, "documents": self._documents, "metadatas": self._metadatas
+        }
+        tmp = self._file(self.INDEX_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, self._file(self.INDEX_FILE))  # Atomic: readers never see a half-written sidecar
+
+    def _reserve(self, rows):
+        """Grows the memory-mapped file (doubling) so it holds at least `rows` vectors."""
+        if rows <= self.capacity:
+            return
+        capacity = max(self.MIN_CAPACITY, self.capacity * 2, rows)
+        tmp = self._file(self.VECTORS_FILE + ".tmp")
+        grown = np.memmap(tmp, dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+        if self._vectors is not None:
+            grown[:len(self._ids)] = self._vectors[:len(self._ids)]
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(tmp, self._file(self.VECTORS_FILE))
+        self.capacity = capacity
+        self._vectors = np.memmap(self._file(self.VECTORS_FILE), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def count(self):
+        with self._lock:
+            return len(self._ids)
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        vectors = _normalize(embeddings)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store ({self.dim})")
+
+            new_ids = [doc_id for doc_id in dict.fromkeys(ids) if doc_id not in self._rows]
+            self._reserve(len(self._ids) + len(new_ids))
+            for doc_id in new_ids:
+                self._rows[doc_id] = len(self._ids)
+                self._ids.append(doc_id)
+                self._documents.append(None)
+                self._metadatas.append(None)
+            self._ts = np.resize(self._ts, len(self._ids))
+
+            for doc_id, document, vector, metadata in zip(ids, documents, vectors, metadatas):
+                row = self._rows[doc_id]
+                self._vectors[row] = vector
+                self._documents[row] = document
+                self._metadatas[row] = metadata or {}
+                self._ts[row] = _ts_value(metadata)
+            self._save()
+
+    def query(self, embeddings, n_results, min_ts=None):
+        queries = _normalize(embeddings)
+        with self._lock:
+            count = len(self._ids)
+            if count == 0 or n_results <= 0:
+                return [[] for _ in range(len(queries))]
+
+            sims = queries @ self._vectors[:count].T
+            if min_ts is not None:
+                allowed = self._ts >= min_ts  # NaN (no "ts") compares False
+                sims[:, ~allowed] = -np.inf
+                available = int(allowed.sum())
+            else:
+                available = count
+
+            k = min(n_results, available)
+            results = []
+            for row_sims in sims:
+                if k == 0:
+                    results.append([])
+                    continue
+                top = np.argpartition(-row_sims, k - 1)[:k]
+                top = top[np.argsort(-row_sims[top], kind="stable")]
+                results.append([
+                    (self._documents[i], self._metadatas[i], float(max(0.0, 2.0 - 2.0 * row_sims[i])))
+                    for i in top
+                ])
+            return results
+
+    def items(self):
+        with self._lock:
+            return list(zip(self._ids, self._documents, self._metadatas))
+
+    def delete(self, ids):
+        with self._lock:
+            drop = {self._rows[doc_id] for doc_id in ids if doc_id in self._rows}
+            if not drop:
+                return
+            keep = [row for row in range(len(self._ids)) if row not in drop]
+            self._vectors[:len(keep)] = self._vectors[keep]
+            self._ids = [self._ids[row] for row in keep]
+            self._documents = [self._documents[row] for row in keep]
+            self._metadatas = [self._metadatas[row] for row in keep]
+            self._ts = self._ts[keep]
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._save()
+
+    def update_metadatas(self, ids, metadatas):
+        with self._lock:
+            for doc_id, metadata in zip(ids, metadatas):
+                row = self._rows.get(doc_id)
+                if row is not None:
+                    self._metadatas[row] = metadata or {}
+                    self._ts[row] = _ts_value(metadata)
+            self._save()
+
+STORES = {"chroma": ChromaStore, "numpy": NumpyStore}
+
+def make_store(backend="chroma", path=None):
+    """Opens the named storage backend ("chroma" or "numpy") at `path` (or its default location)."""
+    if backend not in STORES:
+        raise ValueError(f"Unknown memory backend '{backend}'. Expected one of: {', '.join(STORES)}")
+    return STORES[backend](path or DEFAULT_STORE_PATHS[backend])
@@ -5,6 +5,7 @@ from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
+from typing import Optional
 import logging
 import threading
 import time
@@ -18,10 +19,14 @@ from src.models import ProcessedNews, BotLog, TweetEngagement, DecisionTrace
 # Import the main bot logic (We will refactor main.py to be importable or import classes directly)
 from src.ingestion import IngestionModule, WhaleMonitor, MarketData
 from src.memory import MemoryModule
+from src.news_index import ProcessedNewsIndex
+from src.analysis_backlog import AnalysisBacklog
 from src.agent import AnalysisAgent
 from src.visualizer import Visualizer
 from src.publisher import TwitterPublisher
 from src.logging_handlers import DBHandler # Import custom handler
+from src.core import llm
+from src.core.jsonutil import parse_or_fix
 from datetime import datetime
 
 # Initialize DB
@@ -67,160 +72,222 @@ class BotController:
         self.visualizer = Visualizer()
         self.publisher = TwitterPublisher()
 
+        # In-memory index of processed news IDs (loaded from DB on first cycle)
+        self.news_index = ProcessedNewsIndex()
+
+        # Batch analyses waiting for a publishing slot (filled by one agent call per cycle)
+        self.analysis_backlog = AnalysisBacklog(max_age_hours=self.agent.batch_max_age_hours)
+
     def run_cycle(self, db: Session):
         self.last_run_status = "Running..."
         logger.info("Manual/Scheduled Run Started")
 
         try:
-            # 1. Fetch
-            items = self.ingestion.fetch_news()
-            if not items:
-                logger.info("No news items found.")
-                self.last_run_status = "Finished (No News)"
-                return
-
-            # Check DB for processed items to avoid reprocessing old news
-            # For cross-verification, we want to look at NEW items (candidates)
-            new_items = []
-            for item in items:
-                item_id = item.get('id', item.get('link'))
-                if not db.query(ProcessedNews).filter(ProcessedNews.id == item_id).first():
-                    new_items.append(item)
-
-            if not new_items:
-                logger.info("No new unprocessed items.")
-                self.last_run_status = "Finished (No New Items)"
+            # 1-3. Fetch, verify and batch-analyze new events into the backlog, once it has run dry
+            if self.analysis_backlog.pending_count(db):
+                logger.info("Queued analyses pending. Skipping fetch and analysis this cycle.")
+                verified_events = None
+            else:
+                verified_events = self._refill_backlog(db)
+
+            # 4. Publish the best queued analysis (from this cycle or an earlier batch)
+            entry = self.analysis_backlog.next(db)
+            if entry is None:
+                if verified_events == []:
+                    # Record trace
+                    trace = DecisionTrace(
+                        clusters_found=json.dumps([]),
+                        topic="None Selected",
+                        verification_score=0,
+                        sources_list=json.dumps([]),
+                        verification_status="SKIPPED",
+                        ai_reasoning="No events passed verification pipeline.",
+                        generated_tweet=""
+                    )
+                    db.add(trace)
+                elif verified_events:
+                    logger.warning("No analysis produced for this cycle's events.")
+                    self.last_run_status = "Finished (No Analysis)"
+                db.commit()
                 return
 
-            # 2. Verify (PIPELINE)
-            # Replaced cluster_news with process_pipeline
-            logger.info(f"Processing Pipeline for {len(new_items)} new items...")
-            verified_events = self.ingestion.process_pipeline(new_items)
-
-            # Updated Logic: Allow single-source events (verified_events will contain them now)
-            if not verified_events:
-                logger.info("No events found in pipeline.")
-
-                # Record trace
-                trace = DecisionTrace(
-                    clusters_found=json.dumps([]),
-                    topic="None Selected",
-                    verification_score=0,
-                    sources_list=json.dumps([]),
-                    verification_status="SKIPPED",
-                    ai_reasoning="No events passed verification pipeline.",
-                    generated_tweet=""
-                )
-                db.add(trace)
-                db.commit()
+            self._publish(db, entry, verified_events or [])
 
-                self.last_run_status = "Finished (Skipped - No Events)"
-                return
+        except Exception as e:
+            logger.error(f"Cycle Error: {e}")
+            self.last_run_status = "Failed (Exception)"
 
-            # Select the top verified event
-            # process_pipeline already sorts by confidence
-            selected_event = verified_events[0]
-
-            logger.info(f"Selected Event: {selected_event['title']} (Score: {selected_event['source_count']})")
-
-            # 3. Analyze
-            # Gather auxiliary data
-            topic_title = selected_event['title']
-            symbol = "BTC" if "BTC" in topic_title or "Bitcoin" in topic_title else "ETH"
-            whale_data = self.whale_monitor.get_whale_movements(symbol)
-            market_info = self.market_data.get_market_status(symbol)
-            history = self.memory.retrieve_context(topic_title)
-
-            verification_context = f"Whale: {whale_data}\nPrice: {market_info['price']}"
-
-            # Pass the Verified Event object to Agent
-            analysis_json = self.agent.analyze_situation(selected_event, verification_context, history)
-
-            try:
-                clean_json = analysis_json.replace("```json", "").replace("```", "").strip()
-                result = json.loads(clean_json)
-
-                tweet_text = result.get('tweet')
-                sentiment = result.get('sentiment')
-                knowledge_base_entry = result.get('knowledge_base_entry')
-                reasoning = result.get('reasoning')
-
-                # 4. Visualize
-                chart_path = self.visualizer.capture_chart(symbol)
-
-                # 5. Publish
-                tweet_id = self.publisher.post_tweet(tweet_text, chart_path)
-
-                # 6. Save Trace (Audit Log)
-                trace = DecisionTrace(
-                    # Store summary of all verified events found this cycle
-                    clusters_found=json.dumps([{
-                        'topic': e['title'],
-                        'score': e['source_count'],
-                        'sources': e['sources']
-                    } for e in verified_events]),
-
-                    topic=topic_title,
-                    verification_score=selected_event['source_count'],
-                    sources_list=json.dumps(selected_event['sources']),
-                    verification_status="VERIFIED",
-                    ai_reasoning=reasoning,
-                    generated_tweet=tweet_text
-                )
-                db.add(trace)
-
-                if tweet_id:
-                    # Save items to DB
-                    # The event has 'items' which are the full article objects
-                    for item in selected_event['items']:
-                        item_id = item.get('id', item.get('link'))
-                        if not db.query(ProcessedNews).filter(ProcessedNews.id == item_id).first():
-                             news_entry = ProcessedNews(
-                                id=item_id,
-                                title=item.get('title'),
-                                source=item.get('source', 'Unknown'),
-                                sentiment=sentiment
-                            )
-                             db.add(news_entry)
-
-                    # Track Engagement
-                    if selected_event['items']:
-                        primary_item = selected_event['items'][0]
-                        primary_id = primary_item.get('id', primary_item.get('link'))
-                        engagement = TweetEngagement(
-                            tweet_id=str(tweet_id),
-                            news_id=primary_id,
-                            posted_at=datetime.utcnow()
-                        )
-                        db.add(engagement)
-
-                    # Save RAG Memory
-                    if knowledge_base_entry:
-                        self.memory.store_news_event(
-                            text=knowledge_base_entry,
-                            metadata={
-                                "source": "Aggregated",
-                                "timestamp": datetime.utcnow().isoformat(),
-                                "sentiment": sentiment,
-                                "raw_title": topic_title
-                            }
-                        )
-
-                    logger.info(f"Published tweet {tweet_id}", extra={"context": {"sentiment": sentiment, "tweet_id": tweet_id}})
-                    self.last_run_status = "Success"
-                else:
-                    logger.error("Failed to publish tweet")
-                    self.last_run_status = "Failed (Publish Error)"
+    def _refill_backlog(self, db: Session):
+        """
+        Runs the pipeline on new items and analyzes the top N verified events in one agent call.
+        Analyses are queued for this and later publishing slots, which publish without fetching
+        or analyzing until the backlog is empty. Returns the verified events
+        (None if there was nothing new to process).
+        """
+        # 1. Fetch
+        items = self.ingestion.fetch_news()
+        if not items:
+            logger.info("No news items found.")
+            self.last_run_status = "Finished (No News)"
+            return None
+
+        # Check DB for processed items to avoid reprocessing old news
+        # For cross-verification, we want to look at NEW items (candidates)
+        new_items = self.news_index.filter_new(db, items)
+
+        if not new_items:
+            logger.info("No new unprocessed items.")
+            self.last_run_status = "Finished (No New Items)"
+            return None
+
+        # 2. Verify (PIPELINE)
+        logger.info(f"Processing Pipeline for {len(new_items)} new items...")
+        verified_events = self.ingestion.process_pipeline(new_items)
+
+        # Updated Logic: Allow single-source events (verified_events will contain them now)
+        if not verified_events:
+            logger.info("No events found in pipeline.")
+            self.last_run_status = "Finished (Skipped - No Events)"
+            return []
+
+        # 3. Analyze the top N events (process_pipeline already sorts by source count)
+        top_events = verified_events[:self.agent.batch_size]
+        symbols = {event['event_id']: self._symbol_for(event['title']) for event in top_events}
+
+        # Gather auxiliary data (once per symbol)
+        whale_data = self.whale_monitor.get_whale_movements("BTC")
+        markets = {symbol: self.market_data.get_market_status(symbol) for symbol in sorted(set(symbols.values()))}
+        verification_context = f"Whale: {whale_data}\n" + "\n".join(
+            f"{symbol} Price: {m['price']}\n{symbol} 24h Change: {m['change_24h']}%" for symbol, m in markets.items()
+        )
+        contexts = self.memory.retrieve_many([event['title'] for event in top_events])
+        history = {event['event_id']: context for event, context in zip(top_events, contexts)}
+
+        analyses = self.agent.analyze_batch(top_events, verification_context, history)
+
+        # If the batch missed the top event, retry it with a single call
+        top = top_events[0]
+        if top['event_id'] not in analyses:
+            single = parse_or_fix(self.agent.analyze_situation(top, verification_context, history[top['event_id']]))
+            if isinstance(single, dict) and single.get('tweet') and not single.get('fallback'):
+                analyses[top['event_id']] = single
+            else:
+                # Never queue the agent's generic fallback tweet; the items stay new for the next cycle
+                logger.warning(f"No analysis for top event '{top['title']}'. Retrying next cycle.")
+
+        entries = []
+        for event in top_events:
+            analysis = analyses.get(event['event_id'])
+            if not analysis:
+                continue
+            entries.append({
+                "event_id": event['event_id'],
+                "topic": event['title'],
+                "symbol": symbols[event['event_id']],
+                "source_count": event['source_count'],
+                "sources": event['sources'],
+                "items": [{"id": item.get('id', item.get('link')), "title": item.get('title'),
+                           "source": item.get('source', 'Unknown')} for item in event['items']],
+                "analysis": analysis
+            })
+
+        self.analysis_backlog.push_many(db, entries)
+        db.commit()
+        return verified_events
+
+    @staticmethod
+    def _symbol_for(title):
+        return "BTC" if "BTC" in title or "Bitcoin" in title else "ETH"
+
+    def _publish(self, db: Session, entry, verified_events):
+        """Publishes a queued analysis: chart, tweet, audit trace, engagement row and RAG memory."""
+        analysis = entry.analysis or {}
+        if "critic_context" in analysis:
+            # Batch analyses are fact-checked only once their slot comes up
+            analysis = self.agent.review_analysis(analysis)
+            entry.analysis = analysis  # Reviewed once, even if posting fails below
+        tweet_text = analysis.get('tweet')
+        sentiment = analysis.get('sentiment')
+        knowledge_base_entry = analysis.get('knowledge_base_entry')
+        reasoning = analysis.get('reasoning')
+
+        logger.info(f"Selected Event: {entry.topic} (Score: {entry.source_count})")
 
-                db.commit()
+        try:
+            # 4. Visualize
+            chart_path = self.visualizer.capture_chart(entry.symbol)
+
+            # 5. Publish
+            tweet_id = self.publisher.post_tweet(tweet_text, chart_path)
+
+            # 6. Save Trace (Audit Log)
+            trace = DecisionTrace(
+                # Store summary of all verified events found this cycle
+                clusters_found=json.dumps([{
+                    'topic': e['title'],
+                    'score': e['source_count'],
+                    'sources': e['sources']
+                } for e in verified_events]),
+
+                topic=entry.topic,
+                verification_score=entry.source_count,
+                sources_list=json.dumps(entry.sources),
+                verification_status="VERIFIED",
+                ai_reasoning=reasoning,
+                generated_tweet=tweet_text
+            )
+            db.add(trace)
+
+            saved_ids = []
+            if tweet_id:
+                self.analysis_backlog.mark_published(entry)
+
+                # Published items won't go through the pipeline again
+                for item in entry.items or []:
+                    if not self.news_index.contains(item['id']) and item['id'] not in saved_ids:
+                        db.add(ProcessedNews(
+                            id=item['id'],
+                            title=item.get('title'),
+                            source=item.get('source', 'Unknown'),
+                            sentiment=sentiment
+                        ))
+                        saved_ids.append(item['id'])
+
+                # Track Engagement
+                if entry.items:
+                    engagement = TweetEngagement(
+                        tweet_id=str(tweet_id),
+                        news_id=entry.items[0]['id'],
+                        posted_at=datetime.utcnow()
+                    )
+                    db.add(engagement)
+
+                # Save RAG Memory
+                if knowledge_base_entry:
+                    self.memory.store_news_event(
+                        text=knowledge_base_entry,
+                        metadata={
+                            "source": "Aggregated",
+                            "timestamp": datetime.utcnow().isoformat(),
+                            "sentiment": sentiment,
+                            "raw_title": entry.topic
+                        }
+                    )
+
+                logger.info(f"Published tweet {tweet_id}", extra={"context": {"sentiment": sentiment, "tweet_id": tweet_id}})
+                self.last_run_status = "Success"
+            else:
+                # Stays queued for the next slot
+                logger.error("Failed to publish tweet")
+                self.last_run_status = "Failed (Publish Error)"
 
-            except Exception as e:
-                logger.error(f"Analysis/Publishing Error: {e}")
-                self.last_run_status = "Failed (Error)"
+            db.commit()
+            # Keep the in-memory index in sync only once the rows are durable
+            self.news_index.add_many(saved_ids)
 
         except Exception as e:
-            logger.error(f"Cycle Error: {e}")
-            self.last_run_status = "Failed (Exception)"
+            logger.error(f"Analysis/Publishing Error: {e}")
+            self.last_run_status = "Failed (Error)"
 
     def update_metrics(self, db: Session):
         """Fetch latest metrics for recent tweets"""
@@ -264,6 +331,56 @@ def run_bot(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     background_tasks.add_task(bot_controller.run_cycle, db)
     return {"message": "Bot cycle started in background"}
 
+@app.get("/api/llm/cache")
+def get_llm_cache():
+    return llm.get_llm_cache_stats()
+
+@app.get("/api/memory/cache")
+def get_memory_cache():
+    return bot_controller.memory.query_cache.stats()
+
+@app.post("/api/memory/compact")
+def compact_memory():
+    return bot_controller.memory.compact()
+
+@app.get("/api/memory/embeddings")
+def get_embedding_stats():
+    return bot_controller.memory.embedder.stats()
+
+@app.get("/api/llm/ratelimit")
+def get_llm_rate_limits():
+    return llm.RATE_LIMITER.stats()
+
+@app.get("/api/llm/breakers")
+def get_llm_breakers():
+    # Live circuit state per model (OPEN on the primary means the fallback is in use)
+    return llm.BREAKERS.snapshot()
+
+@app.get("/api/llm/hedging")
+def get_llm_hedging():
+    return {"settings": llm.HEDGE_SETTINGS, "stages": llm.HEDGE_STATS.snapshot()}
+
+class RouteUpdate(BaseModel):
+    model: Optional[str] = None
+    fallback_model: Optional[str] = None
+    max_output_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+@app.get("/api/llm/routes")
+def get_llm_routes():
+    return llm.ROUTER.snapshot()
+
+@app.put("/api/llm/routes/{stage}")
+def update_llm_route(stage: str, update: RouteUpdate):
+    if stage not in ("default",) + llm.ROUTING_STAGES:
+        raise HTTPException(status_code=404, detail=f"Unknown stage '{stage}'")
+    values = {k: v for k, v in update.dict().items() if v is not None}
+    return llm.ROUTER.update(stage, values)
+
+@app.get("/api/analysis/backlog")
+def get_analysis_backlog(db: Session = Depends(get_db)):
+    return {"pending": bot_controller.analysis_backlog.pending_count(db)}
+
 @app.get("/api/logs")
 def get_logs(limit: int = 20, db: Session = Depends(get_db)):
     logs = db.query(BotLog).order_by(BotLog.timestamp.desc()).limit(limit).all()
@@ -332,7 +449,14 @@ def startup_event():
             # Run cycle
             bot_controller.run_cycle(db)
 
-    schedule.every(4).hours.do(job)
+    schedule.every(bot_controller.agent.cycle_interval_hours).hours.do(job)
+
+    # Keep the RAG collection bounded (age/count retention)
+    memory = bot_controller.memory
+    schedule.every(memory.settings["compaction_interval_hours"]).hours.do(memory.compact)
+
+    # Load the embedding model now rather than mid-cycle on the first RAG lookup
+    threading.Thread(target=bot_controller.memory.embedder.warm, daemon=True).start()
 
     # Run scheduler in thread
     t = threading.Thread(target=scheduler_loop, daemon=True)
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Tests must never write to the real sentix.db (importing src.web.app creates tables and logs to it)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="sentix_test_"), "test.db"))
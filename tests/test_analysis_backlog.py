@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import mock_open, patch
+import json
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.database import Base
+from src.models import PendingAnalysis
+from src.analysis_backlog import AnalysisBacklog
+from src.agent import AnalysisAgent
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+def make_event(i, sources=1):
+    return {
+        "event_id": f"ev{i}",
+        "title": f"Event {i}",
+        "source_count": sources,
+        "sources": [f"S{n}" for n in range(sources)],
+        "facts": [{"fact": f"Fact {i}", "sources": ["S0"]}],
+        "items": []
+    }
+
+class TestAnalysisBacklog(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine, tables=[PendingAnalysis.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.backlog = AnalysisBacklog(max_age_hours=6)
+
+    def tearDown(self):
+        self.db.close()
+
+    def entry(self, event_id, source_count):
+        return {"event_id": event_id, "topic": event_id, "symbol": "BTC", "source_count": source_count,
+                "sources": [], "items": [{"id": f"{event_id}-a"}], "analysis": {"tweet": f"tweet {event_id}"}}
+
+    def test_publishing_drains_best_first(self):
+        self.backlog.push_many(self.db, [self.entry("ev1", 1), self.entry("ev2", 3), self.entry("ev3", 2)])
+        self.db.commit()
+
+        published = []
+        while (entry := self.backlog.next(self.db)) is not None:
+            published.append(entry.event_id)
+            self.backlog.mark_published(entry)
+            self.db.commit()
+
+        self.assertEqual(published, ["ev2", "ev3", "ev1"])
+        self.assertEqual(self.backlog.pending_count(self.db), 0)
+
+    def test_stale_entries_expire(self):
+        self.backlog.push_many(self.db, [self.entry("old", 5), self.entry("new", 1)])
+        self.db.commit()
+        self.db.query(PendingAnalysis).filter(PendingAnalysis.event_id == "old").update(
+            {"created_at": datetime.utcnow() - timedelta(hours=7)})
+
+        self.assertEqual(self.backlog.next(self.db).event_id, "new")
+        self.assertEqual(self.backlog.pending_count(self.db), 1)
+
+class TestBatchConfig(unittest.TestCase):
+    def load(self, batch):
+        config = json.dumps({"analysis_batch": batch})
+        with patch('src.agent.os.path.exists', return_value=True), \
+                patch('builtins.open', mock_open(read_data=config)):
+            return AnalysisAgent()
+
+    def test_max_age_covers_every_slot_of_a_batch(self):
+        agent = self.load({"size": 3, "cycle_interval_hours": 4, "max_age_hours": 6})
+        self.assertEqual(agent.batch_max_age_hours, 12)
+
+        agent = self.load({"size": 2, "cycle_interval_hours": 6, "max_age_hours": 24})
+        self.assertEqual(agent.batch_max_age_hours, 24)
+
+class TestBatchAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.agent = AnalysisAgent()
+        self.agent.api_key = "fake_key"
+        self.agent.critic_enabled = False
+
+    def test_one_call_for_all_events(self):
+        events = [make_event(i) for i in range(3)]
+
+        def fake_llm(prompt, **kwargs):
+            return json.dumps([
+                {"id": f"e{n}", "sentiment": "BULLISH", "reasoning": "r", "tweet": f"tweet {n}",
+                 "knowledge_base_entry": "kb", "hallucination_check": []}
+                for n in (1, 3)  # The model skipped the second event
+            ])
+
+        with patch('src.agent.call_llm', side_effect=fake_llm) as mock_llm:
+            results = self.agent.analyze_batch(events, "Whale: quiet", {"ev0": "history"})
+
+        mock_llm.assert_called_once()
+        prompt = mock_llm.call_args.args[0]
+        self.assertIn("[EVENT id=e1]", prompt)
+        self.assertIn("Fact 2", prompt)
+        self.assertEqual(mock_llm.call_args.kwargs["stage"], "analysis")
+        self.assertEqual(sorted(results), ["ev0", "ev2"])
+        self.assertEqual(results["ev2"]["tweet"], "tweet 3")
+        self.assertNotIn("id", results["ev0"])
+
+    def test_critic_is_deferred_to_review(self):
+        self.agent.critic_enabled = True
+        batch = json.dumps([{"id": f"e{n}", "sentiment": "BULLISH", "reasoning": "r",
+                             "tweet": f"Big week for event {n} holders", "knowledge_base_entry": "kb",
+                             "hallucination_check": []} for n in (1, 2)])
+
+        with patch('src.agent.call_llm', return_value=batch) as mock_llm:
+            results = self.agent.analyze_batch([make_event(0), make_event(1)], "Whale: quiet", {})
+        mock_llm.assert_called_once()  # No critic call per event
+        self.assertIn("Fact 0", results["ev0"]["critic_context"]["facts"])
+
+        with patch('src.agent.call_llm', return_value="Event 0 recap") as mock_llm:
+            reviewed = self.agent.review_analysis(results["ev0"])
+        self.assertEqual(mock_llm.call_args.kwargs["stage"], "critic")
+        self.assertEqual(reviewed["tweet"], "Event 0 recap")
+        self.assertNotIn("critic_context", reviewed)
+
+    def test_failed_call_returns_nothing(self):
+        with patch('src.agent.call_llm', return_value=None):
+            self.assertEqual(self.agent.analyze_batch([make_event(0)], "", {}), {})
+
+if __name__ == '__main__':
+    unittest.main()
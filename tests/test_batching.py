@@ -2,7 +2,9 @@
 import unittest
 from unittest.mock import MagicMock, patch
 from src.ingestion import IngestionModule
-from src.facts import extract_facts_batch
+from src.facts import extract_facts_batch, FactCacheStore
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
 
 class TestFactExtraction(unittest.TestCase):
     def test_extract_facts_batch_structure(self):
@@ -24,11 +26,34 @@ class TestFactExtraction(unittest.TestCase):
              self.assertIn("event_1", result)
              self.assertEqual(result["event_1"]["confidence"], 0.5)
 
+    def test_sub_batches_merge_and_retry_only_failures(self):
+        """Events are split into concurrent sub-batches; only the failed one is retried."""
+        import json
+        calls = []
+
+        def fake_llm(prompt, **kwargs):
+            data = json.loads(prompt.split("d=summary):\n")[1].split("\n")[0])
+            titles = [e["event"] for e in data]
+            calls.append(titles)
+            # The sub-batch containing "Event 2" returns malformed JSON the first time
+            if "Event 2" in titles and len(calls) <= 2:
+                return '{"e1": {"facts": [}'
+            return json.dumps({e["id"]: {"facts": [], "confidence": 1.0} for e in data})
+
+        events = [{"event_id": f"ev{i}", "title": f"Event {i}", "articles": []} for i in range(4)]
+        with patch('src.facts.call_llm', side_effect=fake_llm):
+            result = extract_facts_batch(events, sub_batch_size=2, max_concurrency=2)
+
+        self.assertEqual(sorted(result), ["ev0", "ev1", "ev2", "ev3"])
+        # 2 sub-batches + retries for the 2 events of the failed sub-batch only
+        retried = sorted(t for c in calls[2:] for t in c)
+        self.assertEqual(retried, ["Event 2", "Event 3"])
+
 class TestIngestionBatching(unittest.TestCase):
     def test_process_pipeline_batching(self):
         """Test that process_pipeline calls extract_facts_batch and processes results."""
 
-        ingestion = IngestionModule()
+        ingestion = IngestionModule(fact_cache=False)
 
         # Mock resolve_events to return 2 events
         mock_events = [
@@ -57,5 +82,66 @@ class TestIngestionBatching(unittest.TestCase):
             self.assertEqual(results[0]['event_id'], "e1")
             self.assertEqual(results[0]['confidence'], 1.0)
 
+    def test_cached_events_skip_llm(self):
+        """Events seen in an earlier cycle (same article set, new event_id) are served from the fact cache."""
+        # Facts are extracted on worker threads: share one in-memory connection
+        store = FactCacheStore(bind=create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool))
+        ingestion = IngestionModule(fact_cache=store)
+        items = [{"id": "a1", "title": "News 1", "summary": "S", "source": "SourceA", "link": "l1"}]
+
+        with patch('src.ingestion.resolve_events', return_value=[{"event_id": "e1", "title": "Event 1", "articles": ["a1"]}]), \
+             patch('src.ingestion.extract_facts_batch', return_value={"e1": {"facts": [{"fact": "F1", "sources": ["SourceA"]}], "confidence": 1.0}}) as mock_extract:
+            ingestion.process_pipeline([dict(i) for i in items])
+
+        with patch('src.ingestion.resolve_events', return_value=[{"event_id": "e1_v2", "title": "Event 1", "articles": ["a1"]}]), \
+             patch('src.ingestion.extract_facts_batch') as mock_extract_again:
+            results = ingestion.process_pipeline([dict(i) for i in items])
+
+        mock_extract.assert_called_once()
+        mock_extract_again.assert_not_called()
+        self.assertEqual(results[0]['facts'][0]['fact'], "F1")
+
+    def test_fact_extraction_overlaps_streamed_resolution(self):
+        """Facts for the first streamed events are extracted before event resolution finishes."""
+        import threading
+        items = [{"id": f"a{i}", "title": f"News {i}", "source": f"S{i}", "link": f"l{i}"} for i in range(5)]
+        events = [{"event_id": f"e{i}", "title": f"Event {i}", "articles": [f"a{i}"]} for i in range(5)]
+        first_batch_started = threading.Event()
+
+        def fake_resolve(articles, mode="llm", on_event=None):
+            for event in events[:4]:
+                on_event(event)
+            # The last event is only "generated" once facts for the first sub-batch are underway
+            self.assertTrue(first_batch_started.wait(timeout=5))
+            return events
+
+        def fake_extract(batch):
+            first_batch_started.set()
+            return {e["event_id"]: {"facts": [], "confidence": 1.0} for e in batch}
+
+        ingestion = IngestionModule(fact_cache=False)
+        with patch('src.ingestion.resolve_events', side_effect=fake_resolve), \
+             patch('src.ingestion.extract_facts_batch', side_effect=fake_extract) as mock_extract:
+            results = ingestion.process_pipeline(items)
+
+        self.assertEqual(sorted(r['event_id'] for r in results), ["e0", "e1", "e2", "e3", "e4"])
+        # One streamed sub-batch of 4, then the leftover event
+        self.assertEqual([len(c.args[0]) for c in mock_extract.call_args_list], [4, 1])
+
+class TestFactCacheStore(unittest.TestCase):
+    def test_size_bound_evicts_least_recently_used(self):
+        store = FactCacheStore(bind=create_engine("sqlite://"), max_entries=2)
+        store.put_many({"k1": {"facts": []}})
+        store.put_many({"k2": {"facts": []}})
+        store.get_many({"k1"})  # k1 becomes most recently used
+        store.put_many({"k3": {"facts": []}})
+
+        self.assertEqual(sorted(store.get_many({"k1", "k2", "k3"})), ["k1", "k3"])
+
+    def test_expired_entries_are_ignored(self):
+        store = FactCacheStore(bind=create_engine("sqlite://"), ttl_hours=0)
+        store.put_many({"k1": {"facts": []}})
+        self.assertEqual(store.get_many({"k1"}), {})
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import patch
+import logging
+from src.core.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_trips_on_consecutive_rate_limits(self):
+        breaker = CircuitBreaker("m", consecutive_threshold=3)
+        for _ in range(3):
+            self.assertTrue(breaker.allow_request())
+            breaker.record_failure(rate_limited=True)
+
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow_request())
+
+    def test_trips_on_error_rate(self):
+        breaker = CircuitBreaker("m", window_size=10, min_calls=10, error_rate_threshold=0.5)
+        for i in range(10):
+            if i % 2:
+                breaker.record_failure()
+            else:
+                breaker.record_success(1.0)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.snapshot()["last_trip_reason"], "error rate 50%")
+
+    def test_trips_on_slow_calls(self):
+        breaker = CircuitBreaker("m", min_calls=4, slow_call_seconds=30, slow_rate_threshold=0.5)
+        for latency in (1, 45, 50, 2):
+            breaker.record_success(latency)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_half_open_allows_single_probe(self):
+        breaker = CircuitBreaker("m", consecutive_threshold=1, cooldown_seconds=10)
+        breaker.record_failure(rate_limited=True)
+
+        with patch('src.core.breaker.time.time', return_value=breaker.opened_until + 1):
+            self.assertTrue(breaker.allow_request())
+            self.assertEqual(breaker.state, HALF_OPEN)
+            self.assertFalse(breaker.allow_request())  # Probe already in flight
+
+            breaker.record_success(0.5)
+            self.assertEqual(breaker.state, CLOSED)
+            self.assertTrue(breaker.allow_request())
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker("m", consecutive_threshold=1, cooldown_seconds=10)
+        breaker.record_failure(rate_limited=True)
+
+        with patch('src.core.breaker.time.time', return_value=breaker.opened_until + 1):
+            breaker.allow_request()
+            breaker.record_failure()
+            self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.snapshot()["trips"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
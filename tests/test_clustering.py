@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+import logging
+from src.clustering import cluster_articles
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+# Hand-made "embeddings" keyed by title
+VECTORS = {
+    "ETF approved": [1.0, 0.0, 0.0],
+    "SEC greenlights ETF": [0.95, 0.1, 0.0],   # ~0.99 to "ETF approved"
+    "ETF flows analysis": [0.7, 0.7, 0.0],     # ~0.70 borderline
+    "Exchange hacked": [0.0, 0.0, 1.0],
+}
+
+def fake_embed(texts):
+    return [VECTORS[t.split(".")[0]] for t in texts]
+
+def article(aid, title, published="Wed, 10 Jan 2024 21:00:00 GMT"):
+    return {"id": aid, "title": title, "summary": "", "published": published}
+
+class TestLocalClustering(unittest.TestCase):
+    def test_groups_similar_and_keeps_structure(self):
+        articles = [
+            article("a1", "ETF approved"),
+            article("a2", "Exchange hacked"),
+            article("a3", "SEC greenlights ETF"),
+        ]
+
+        events = cluster_articles(articles, embed_fn=fake_embed, adjudicate=False)
+
+        self.assertEqual([e['articles'] for e in events], [["a1", "a3"], ["a2"]])
+        self.assertEqual(events[0]['title'], "ETF approved")
+        self.assertTrue(all(set(e) == {"event_id", "title", "articles"} for e in events))
+
+    def test_time_window_prevents_grouping(self):
+        articles = [
+            article("a1", "ETF approved", "Wed, 10 Jan 2024 21:00:00 GMT"),
+            article("a2", "SEC greenlights ETF", "Sat, 13 Jan 2024 21:00:00 GMT"),
+        ]
+        events = cluster_articles(articles, embed_fn=fake_embed, adjudicate=False)
+        self.assertEqual(len(events), 2)
+
+    def test_only_borderline_pairs_go_to_llm(self):
+        articles = [
+            article("a1", "ETF approved"),
+            article("a2", "SEC greenlights ETF"),
+            article("a3", "ETF flows analysis"),
+            article("a4", "Exchange hacked"),
+        ]
+
+        with patch('src.clustering.call_llm', return_value="[false, false]") as mock_llm:
+            events = cluster_articles(articles, embed_fn=fake_embed)
+
+        mock_llm.assert_called_once()
+        self.assertEqual([e['articles'] for e in events], [["a1", "a2"], ["a3"], ["a4"]])
+
+if __name__ == '__main__':
+    unittest.main()
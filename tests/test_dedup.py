@@ -0,0 +1,49 @@
+import unittest
+from unittest.mock import patch
+import logging
+from src.dedup import collapse_near_duplicates
+from src.ingestion import IngestionModule
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+SUMMARY = "The U.S. Securities and Exchange Commission approved spot Bitcoin ETF applications from BlackRock and Fidelity on Wednesday."
+
+class TestNearDuplicateCollapse(unittest.TestCase):
+    def test_syndicated_copies_are_collapsed(self):
+        items = [
+            {"id": "a1", "title": "SEC approves spot Bitcoin ETFs", "summary": SUMMARY, "source": "CoinDesk"},
+            {"id": "a2", "title": "Ethereum gas fees drop to yearly low", "summary": "Network activity cooled.", "source": "TheBlock"},
+            {"id": "a3", "title": "SEC Approves Spot Bitcoin ETFs!", "summary": f"<p>{SUMMARY}</p>", "source": "Decrypt"},
+        ]
+
+        groups = collapse_near_duplicates(items)
+
+        self.assertEqual([[i['id'] for i in g] for g in groups], [["a1", "a3"], ["a2"]])
+
+    def test_distinct_articles_are_kept(self):
+        items = [
+            {"id": "a1", "title": "News 1"},
+            {"id": "a2", "title": "News 2"},
+        ]
+        self.assertEqual(len(collapse_near_duplicates(items)), 2)
+
+    def test_pipeline_sends_representatives_and_reexpands(self):
+        ingestion = IngestionModule(feed_cache=False, fact_cache=False)
+        items = [
+            {"id": "a1", "title": "SEC approves spot Bitcoin ETFs", "summary": SUMMARY, "source": "CoinDesk"},
+            {"id": "a2", "title": "SEC approves spot Bitcoin ETFs", "summary": SUMMARY, "source": "Decrypt"},
+        ]
+
+        with patch('src.ingestion.resolve_events', return_value=[{"event_id": "e1", "title": "ETF", "articles": ["a1"]}]) as mock_resolve, \
+             patch('src.ingestion.extract_facts_batch', return_value={}):
+            events = ingestion.process_pipeline(items)
+
+        sent = mock_resolve.call_args.args[0]
+        self.assertEqual([a['id'] for a in sent], ["a1"])
+        self.assertNotIn('source', sent[0])
+        self.assertEqual([i['id'] for i in events[0]['items']], ["a1", "a2"])
+        self.assertEqual(sorted(events[0]['sources']), ["CoinDesk", "Decrypt"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+import logging
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+from src.core.embeddings import EmbeddingCache, EmbeddingService, OnnxMiniLM
+from src.clustering import cluster_articles
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+class LookupSession:
+    """Stands in for the ONNX graph: each token id maps to a fixed hidden state."""
+    def __init__(self, vocab_size, dim=4):
+        self.table = np.random.default_rng(0).normal(size=(vocab_size, dim)).astype(np.float32)
+
+    def run(self, outputs, feeds):
+        return [self.table[feeds["input_ids"]]]
+
+def word_tokenizer(words):
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    vocab = {"[PAD]": 0, "[UNK]": 1, **{w: i + 2 for i, w in enumerate(words)}}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.enable_padding(pad_id=0, pad_token="[PAD]", length=OnnxMiniLM.MAX_TOKENS)
+    tokenizer.enable_truncation(max_length=OnnxMiniLM.MAX_TOKENS)
+    return tokenizer, len(vocab)
+
+class TestOnnxMiniLM(unittest.TestCase):
+    def test_mean_pools_real_tokens_to_unit_vectors(self):
+        tokenizer, vocab_size = word_tokenizer(["sec", "approves", "bitcoin", "etf"])
+        session = LookupSession(vocab_size)
+        model = OnnxMiniLM(tokenizer=tokenizer, session=session)
+
+        vectors = model(["sec approves bitcoin etf", "bitcoin"])
+
+        expected = session.table[[2, 3, 4, 5]].mean(axis=0)
+        np.testing.assert_allclose(vectors[0], expected / np.linalg.norm(expected), rtol=1e-5)
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[1])), 1.0, places=5)  # Padding ignored
+        self.assertEqual(vectors[0].dtype, np.float32)
+
+    def test_numpy_backend_never_imports_chromadb(self):
+        # Loads the default model through EmbeddingService; only the forward pass is faked
+        code = ("import sys, tempfile\n"
+                "import numpy as np\n"
+                "from src.memory import DEFAULT_MEMORY_SETTINGS, MemoryModule\n"
+                "from src.core.embeddings import EmbeddingService, OnnxMiniLM\n"
+                "OnnxMiniLM.__call__ = lambda self, texts: [np.ones(4, dtype=np.float32) for _ in texts]\n"
+                "memory = MemoryModule(db_path=tempfile.mkdtemp(), embedder=EmbeddingService(),\n"
+                "                      settings=dict(DEFAULT_MEMORY_SETTINGS, backend='numpy'))\n"
+                "memory.store_news_event('ETF inflows', {'source': 'A', 'timestamp': '2023-01-01'})\n"
+                "memory.retrieve_context('ETF')\n"
+                "print('chromadb' in sys.modules)")
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip().splitlines()[-1], "False")
+
+class TestEmbeddingService(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "embeddings.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_each_text_is_embedded_once(self):
+        model = CountingModel()
+        service = EmbeddingService(model=model, cache=EmbeddingCache(self.path))
+
+        first = service.embed(["btc etf", "eth", "btc etf"])
+        second = service.embed(["eth", "sol"])
+
+        self.assertEqual(model.calls, [["btc etf", "eth"], ["sol"]])
+        self.assertEqual(first.shape, (3, 3))
+        self.assertEqual(first.dtype, np.float32)
+        np.testing.assert_array_equal(first[1], second[0])
+        self.assertEqual(service.stats()["misses"], 3)
+        self.assertEqual(service.stats()["cached"], 3)
+
+    def test_cache_survives_restart(self):
+        EmbeddingService(model=CountingModel(), cache=EmbeddingCache(self.path)).embed(["btc etf"])
+
+        model = CountingModel()
+        service = EmbeddingService(model=model, cache=EmbeddingCache(self.path))
+        service.embed(["btc etf"])
+
+        self.assertEqual(model.calls, [])
+        self.assertEqual(service.stats()["hit_rate"], 1.0)
+
+    def test_misses_are_batched(self):
+        model = CountingModel()
+        service = EmbeddingService(model=model, batch_size=2)
+        service.embed(["a", "bb", "ccc", "dddd", "eeeee"])
+        self.assertEqual([len(batch) for batch in model.calls], [2, 2, 1])
+
+    def test_lru_eviction(self):
+        cache = EmbeddingCache(self.path, max_entries=2)
+        service = EmbeddingService(model=CountingModel(), cache=cache)
+        for text in ["a", "b", "c"]:
+            service.embed([text])
+        self.assertEqual(cache.count(), 2)
+
+    def test_clustering_accepts_the_service(self):
+        model = CountingModel()
+        service = EmbeddingService(model=model, cache=EmbeddingCache(self.path))
+        articles = [{"id": "a1", "title": "Same", "summary": ""}, {"id": "a2", "title": "Same", "summary": ""}]
+
+        events = cluster_articles(articles, embed_fn=service, adjudicate=False)
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(len(model.calls[0]), 1)  # Identical texts share one embedding
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import patch
+import json
+import logging
+from src.events import resolve_events, shard_articles
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+def make_articles(n):
+    return [{"id": f"a{i}", "title": f"Headline number {i}", "summary": "x" * 200} for i in range(n)]
+
+class TestShardedResolve(unittest.TestCase):
+    def test_small_batch_uses_single_prompt(self):
+        with patch('src.events.call_llm', return_value='[{"event_id": "e1", "title": "T", "articles": ["a0"]}]') as mock_llm:
+            events = resolve_events(make_articles(2))
+
+        mock_llm.assert_called_once()
+        self.assertEqual(events[0]['event_id'], "e1")
+
+    def test_shards_respect_token_budget(self):
+        shards = shard_articles(make_articles(10), shard_tokens=150)
+        self.assertGreater(len(shards), 1)
+        self.assertEqual(sum(len(s) for s in shards), 10)
+
+    def test_events_split_across_shards_are_merged(self):
+        def fake_llm(prompt, **kwargs):
+            if "different batches" in prompt:
+                return '[["s0_etf", "s1_etf"]]'
+            records = json.loads(prompt.split("d=summary):\n")[1].split("\n")[0])
+            return json.dumps([{"event_id": "etf", "title": "ETF approved", "articles": [r["id"] for r in records]}])
+
+        with patch('src.events.call_llm', side_effect=fake_llm) as mock_llm:
+            events = resolve_events(make_articles(4), shard_tokens=150, max_concurrency=2)
+
+        # 2 shards + 1 merge pass
+        self.assertEqual(mock_llm.call_count, 3)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(sorted(events[0]['articles']), ["a0", "a1", "a2", "a3"])
+
+    def test_truncated_response_reprompts_only_missing_articles(self):
+        prompts = []
+
+        def fake_llm(prompt, **kwargs):
+            prompts.append(json.loads(prompt.split("d=summary):\n")[1].split("\n")[0]))
+            if len(prompts) == 1:
+                # Cut off mid-way through the second event
+                return '[{"event_id": "e1", "title": "T1", "articles": ["a1", "a2"]}, {"event_id": "e2", "title": "T2", "arti'
+            return json.dumps([{"event_id": "e2", "title": "T2", "articles": [r["id"] for r in prompts[-1]]}])
+
+        with patch('src.events.call_llm', side_effect=fake_llm):
+            events = resolve_events(make_articles(3))
+
+        self.assertEqual(len(prompts), 2)
+        self.assertEqual([r["id"] for r in prompts[1]], ["a1"])
+        self.assertEqual(events[0]['articles'], ["a0", "a1"])
+        self.assertEqual(events[1]['event_id'], "r_e2")
+        self.assertEqual(events[1]['articles'], ["a2"])
+
+    def test_streamed_events_are_handed_over_as_generated(self):
+        seen = []
+        chunks = ['[{"event_id": "e1", "title": "T1", "articles": ["a1"]}', ', {"event_id": "e2", "ti', 'tle": "T2", "articles": ["a2"]}]']
+
+        def fake_stream(prompt, **kwargs):
+            for i, chunk in enumerate(chunks):
+                seen.append(("chunk", i))
+                yield chunk
+
+        with patch('src.events.stream_llm', side_effect=fake_stream), patch('src.events.call_llm') as mock_llm:
+            events = resolve_events(make_articles(2), on_event=lambda e: seen.append(("event", e['event_id'], e['articles'])))
+
+        mock_llm.assert_not_called()
+        # e1 is delivered before the rest of the response has been generated
+        self.assertEqual(seen, [("chunk", 0), ("event", "e1", ["a0"]), ("chunk", 1), ("chunk", 2), ("event", "e2", ["a1"])])
+        self.assertEqual([e['event_id'] for e in events], ["e1", "e2"])
+
+class TestPromptCompaction(unittest.TestCase):
+    def test_resolve_prompt_uses_aliases_and_maps_back(self):
+        articles = [{"id": "https://example.com/very/long/url", "link": "https://example.com/very/long/url",
+                     "title": "ETF approved", "summary": "<p>The SEC&nbsp;approved it.</p>", "published": "now"}]
+
+        with patch('src.events.call_llm', return_value='[{"event_id": "e1", "title": "T", "articles": ["a1"]}]') as mock_llm:
+            events = resolve_events(articles)
+
+        prompt = mock_llm.call_args.args[0]
+        self.assertNotIn("https://", prompt)
+        self.assertNotIn("<p>", prompt)
+        self.assertIn('{"id":"a1","t":"ETF approved","d":"The SEC approved it."}', prompt)
+        self.assertEqual(events[0]['articles'], ["https://example.com/very/long/url"])
+
+    def test_budget_truncates_before_dropping(self):
+        from src.core.prompt import enforce_budget
+        records = [{"id": f"a{i}", "t": "Title", "d": "x" * 200} for i in range(20)]
+
+        trimmed, text = enforce_budget(records, budget=400)
+
+        self.assertEqual(len(trimmed), 20)
+        self.assertTrue(all(len(r.get("d", "")) <= 60 for r in trimmed))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,25 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, AsyncMock, patch
+import asyncio
 import logging
-from src.core.llm import call_llm
+import src.core.llm as llm
+from src.core.llm import call_llm, call_llm_async, stream_llm, reset_client
+from src.core.ratelimit import ModelRateLimiter
+from src.core.breaker import BreakerRegistry
 
 # Disable logging during tests
 logging.disable(logging.CRITICAL)
 
 class TestLLMFallback(unittest.TestCase):
+    def setUp(self):
+        # The Gemini client is pooled process-wide; make each test build its own mock
+        reset_client()
+        llm.RATE_LIMITER = ModelRateLimiter()
+        llm.BREAKERS = BreakerRegistry(consecutive_threshold=4, cooldown_seconds=600)
+
     @patch('src.core.llm.genai.Client')
     @patch('src.core.llm.os.getenv')
-    @patch('src.core.llm.time.sleep') # Skip sleep delay
+    @patch('src.core.llm.asyncio.sleep', new_callable=AsyncMock) # Skip sleep delay
     def test_fallback_logic(self, mock_sleep, mock_getenv, mock_client_cls):
         # Setup Environment
         mock_getenv.return_value = "fake_key"
@@ -47,7 +57,7 @@ class TestLLMFallback(unittest.TestCase):
 
             return MagicMock(text="Should not reach here")
 
-        mock_client_instance.models.generate_content.side_effect = side_effect
+        mock_client_instance.aio.models.generate_content = AsyncMock(side_effect=side_effect)
 
         # Run Function
         result = call_llm("test prompt", model='gemini-3-flash-preview', fallback_model='gemini-2.5-flash')
@@ -58,21 +68,109 @@ class TestLLMFallback(unittest.TestCase):
 
     @patch('src.core.llm.genai.Client')
     @patch('src.core.llm.os.getenv')
-    @patch('src.core.llm.time.sleep')
+    @patch('src.core.llm.asyncio.sleep', new_callable=AsyncMock)
     def test_primary_succeeds(self, mock_sleep, mock_getenv, mock_client_cls):
         mock_getenv.return_value = "fake_key"
         mock_client_instance = MagicMock()
         mock_client_cls.return_value = mock_client_instance
 
-        mock_client_instance.models.generate_content.return_value = MagicMock(text="Primary Success")
+        mock_client_instance.aio.models.generate_content = AsyncMock(return_value=MagicMock(text="Primary Success"))
 
         result = call_llm("test prompt")
 
         self.assertEqual(result, "Primary Success")
         # Should only be called once
-        mock_client_instance.models.generate_content.assert_called_once()
-        args, kwargs = mock_client_instance.models.generate_content.call_args
+        mock_client_instance.aio.models.generate_content.assert_called_once()
+        args, kwargs = mock_client_instance.aio.models.generate_content.call_args
         self.assertEqual(kwargs['model'], 'gemini-3-flash-preview')
 
+    @patch('src.core.llm.genai.Client')
+    @patch('src.core.llm.os.getenv')
+    def test_client_reused_and_async_calls_overlap(self, mock_getenv, mock_client_cls):
+        mock_getenv.return_value = "fake_key"
+        in_flight = 0
+        peak = 0
+
+        async def slow_generate(model, contents):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return MagicMock(text=contents)
+
+        mock_client_cls.return_value.aio.models.generate_content = AsyncMock(side_effect=slow_generate)
+
+        async def run_all():
+            return await asyncio.gather(*(call_llm_async(f"prompt {i}") for i in range(3)))
+
+        results = asyncio.run(run_all())
+        call_llm("prompt 3")
+
+        self.assertEqual(results, ["prompt 0", "prompt 1", "prompt 2"])
+        self.assertEqual(peak, 3)
+        mock_client_cls.assert_called_once()
+
+    @patch('src.core.llm.genai.Client')
+    @patch('src.core.llm.os.getenv')
+    def test_open_breaker_skips_primary(self, mock_getenv, mock_client_cls):
+        mock_getenv.return_value = "fake_key"
+        mock_client_cls.return_value.aio.models.generate_content = AsyncMock(return_value=MagicMock(text="Fallback"))
+        breaker = llm.BREAKERS.get('gemini-3-flash-preview')
+        for _ in range(4):
+            breaker.record_failure(rate_limited=True)
+
+        result = call_llm("test prompt")
+
+        self.assertEqual(result, "Fallback")
+        kwargs = mock_client_cls.return_value.aio.models.generate_content.call_args.kwargs
+        self.assertEqual(kwargs['model'], 'gemini-2.5-flash')
+
+class TestLLMStreaming(unittest.TestCase):
+    def setUp(self):
+        reset_client()
+        llm.RATE_LIMITER = ModelRateLimiter()
+        llm.BREAKERS = BreakerRegistry(consecutive_threshold=4, cooldown_seconds=600)
+
+    @staticmethod
+    def fake_stream(texts, fail_after=None):
+        async def stream():
+            for i, text in enumerate(texts):
+                if i == fail_after:
+                    raise Exception("500 INTERNAL")
+                yield MagicMock(text=text)
+        return stream()
+
+    @patch('src.core.llm.genai.Client')
+    @patch('src.core.llm.os.getenv', return_value="fake_key")
+    @patch('src.core.llm.asyncio.sleep', new_callable=AsyncMock)
+    def test_rate_limit_before_first_chunk_is_retried(self, mock_sleep, mock_getenv, mock_client_cls):
+        calls = []
+
+        async def generate_stream(model, contents, **kwargs):
+            calls.append(model)
+            if len(calls) == 1:
+                raise Exception("429 RESOURCE_EXHAUSTED")
+            return self.fake_stream(['[{"id": 1}', ', {"id": 2}]'])
+
+        mock_client_cls.return_value.aio.models.generate_content_stream = AsyncMock(side_effect=generate_stream)
+
+        chunks = list(stream_llm("test prompt"))
+
+        self.assertEqual(chunks, ['[{"id": 1}', ', {"id": 2}]'])
+        self.assertEqual(calls, ['gemini-3-flash-preview', 'gemini-3-flash-preview'])
+
+    @patch('src.core.llm.genai.Client')
+    @patch('src.core.llm.os.getenv', return_value="fake_key")
+    @patch('src.core.llm.asyncio.sleep', new_callable=AsyncMock)
+    def test_mid_stream_failure_ends_stream_without_duplicates(self, mock_sleep, mock_getenv, mock_client_cls):
+        generate_stream = AsyncMock(side_effect=lambda **kwargs: self.fake_stream(["a", "b", "c"], fail_after=2))
+        mock_client_cls.return_value.aio.models.generate_content_stream = generate_stream
+
+        chunks = list(stream_llm("test prompt"))
+
+        self.assertEqual(chunks, ["a", "b"])
+        generate_stream.assert_called_once()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import patch
+import json
+import logging
+from src.grounding import extract_claims, check_claims, claim_coverage
+from src.agent import AnalysisAgent
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+FACTS = "- BlackRock's Bitcoin ETF recorded $1.2 billion of inflows (Verified by CoinDesk, TheBlock)\n"
+MARKET = "Whale: No significant large transactions detected in mempool.\nPrice: 97482\n24h Change: 3.52%"
+
+class TestClaimExtraction(unittest.TestCase):
+    def test_numbers_prices_percentages_and_names(self):
+        claims = extract_claims("BlackRock ETF sees $1.2B inflows as BTC hits $98k (+3.5%) #BTC #Crypto")
+        by_text = {c["text"]: c for c in claims}
+
+        self.assertEqual(by_text["$1.2B"]["value"], 1.2e9)
+        self.assertEqual(by_text["$98k"]["type"], "price")
+        self.assertEqual(by_text["3.5%"]["type"], "percent")
+        self.assertEqual(by_text["BTC"]["type"], "ticker")
+        self.assertEqual(by_text["BlackRock"]["type"], "entity")
+        self.assertNotIn("Crypto", by_text)  # Hashtags are ignored
+
+    def test_mixed_thai_text(self):
+        claims = extract_claims("ราคา BTCพุ่ง 5%แล้ว")
+        self.assertEqual({c["text"] for c in claims}, {"BTC", "5%"})
+
+class TestCheckClaims(unittest.TestCase):
+    def test_rounded_values_and_ticker_names_are_grounded(self):
+        grounded, unmatched = check_claims("Bitcoin at $97.5k, up 3.5%. BlackRock ETF pulls in $1.2B [Source: CoinDesk]",
+                                           [FACTS, MARKET])
+        self.assertEqual(unmatched, [])
+        self.assertGreater(len(grounded), 0)
+
+    def test_unsupported_claims_are_reported(self):
+        _, unmatched = check_claims("BlackRock ETF pulls in $5B as Fidelity joins", [FACTS, MARKET])
+        self.assertEqual({c["text"] for c in unmatched}, {"$5B", "Fidelity"})
+
+class TestClaimCoverage(unittest.TestCase):
+    def test_claims_must_make_up_the_tweet(self):
+        tweet = "BlackRock Bitcoin ETF pulls in $1.2B. Verified by 2 sources #BTC"
+        self.assertEqual(claim_coverage(tweet, extract_claims(tweet)), 1.0)
+
+        prose = "BlackRock ETF: insiders expect massive outflows"
+        self.assertLess(claim_coverage(prose, extract_claims(prose)), 0.5)
+
+class TestCriticSkip(unittest.TestCase):
+    def setUp(self):
+        self.agent = AnalysisAgent()
+
+    def draft(self, tweet):
+        return json.dumps({"tweet": tweet, "reasoning": "r", "sentiment": "BULLISH"})
+
+    def test_grounded_tweet_skips_critic_call(self):
+        draft = self.draft("BlackRock Bitcoin ETF pulls in $1.2B. Verified by 2 sources #BTC")
+        with patch('src.agent.call_llm') as mock_llm:
+            result = self.agent._critic_loop(draft, FACTS, "prompt", [FACTS, MARKET, "Verified by 2 sources"])
+
+        mock_llm.assert_not_called()
+        self.assertEqual(result, draft)
+        self.assertEqual(self.agent.precheck_stats.snapshot()["skip_rate"], 1.0)
+
+    def test_unmatched_claims_are_sent_to_critic(self):
+        draft = self.draft("BlackRock Bitcoin ETF pulls in $5B")
+        with patch('src.agent.call_llm', return_value="PASS") as mock_llm:
+            self.agent._critic_loop(draft, FACTS, "prompt", [FACTS, MARKET])
+
+        critic_prompt = mock_llm.call_args.args[0]
+        self.assertIn("UNVERIFIED CLAIMS", critic_prompt)
+        self.assertIn("- $5B (price)", critic_prompt)
+        self.assertEqual(self.agent.precheck_stats.snapshot()["skipped"], 0)
+
+    def assert_critic_called(self, tweet):
+        evidence = [FACTS, MARKET, "Verified by 2 sources", "SEC filing"]
+        _, unmatched = check_claims(tweet, evidence)
+        self.assertEqual(unmatched, [])  # Every claim the extractor sees is grounded...
+
+        with patch('src.agent.call_llm', return_value="PASS") as mock_llm:
+            self.agent._critic_loop(self.draft(tweet), FACTS, "prompt", evidence)
+        mock_llm.assert_called_once()  # ...but they are a small part of what the tweet says
+
+    def test_thai_prose_is_sent_to_critic(self):
+        # "SEC revokes approval of all BlackRock ETFs, market collapses": contradicts the facts
+        self.assert_critic_called("SEC ยกเลิกการอนุมัติ ETF ของ BlackRock ทั้งหมด ตลาดล่มสลาย ยืนยันจาก 2 แหล่ง")
+
+    def test_qualitative_claims_are_sent_to_critic(self):
+        self.assert_critic_called("BlackRock Bitcoin ETF: insiders expect massive outflows and a crash next week")
+
+if __name__ == '__main__':
+    unittest.main()
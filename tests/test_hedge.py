@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock, patch
+import asyncio
+import logging
+import src.core.llm as llm
+from src.core.llm import call_llm, reset_client
+from src.core.hedge import HedgeStats, run_hedged
+from src.core.breaker import BreakerRegistry
+from src.core.ratelimit import ModelRateLimiter
+from src.core.routing import ModelRouter
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+class TestRunHedged(unittest.TestCase):
+    def test_fast_primary_is_not_hedged(self):
+        stats = HedgeStats()
+        hedge = AsyncMock(return_value="hedge")
+
+        async def primary():
+            return "primary"
+
+        result = asyncio.run(run_hedged(primary, hedge, 1.0, stats, "events"))
+
+        self.assertEqual(result, "primary")
+        hedge.assert_not_called()
+        self.assertEqual(stats.snapshot()["events"]["hedge_rate"], 0.0)
+
+    def test_slow_primary_loses_and_is_cancelled(self):
+        stats = HedgeStats()
+        cancelled = []
+
+        async def primary():
+            try:
+                await asyncio.sleep(5)
+                return "primary"
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def hedge():
+            return "hedge"
+
+        result = asyncio.run(run_hedged(primary, hedge, 0.01, stats, "facts"))
+
+        self.assertEqual(result, "hedge")
+        self.assertEqual(cancelled, [True])
+        snapshot = stats.snapshot()["facts"]
+        self.assertEqual((snapshot["hedge_rate"], snapshot["win_rate"]), (1.0, 1.0))
+
+    def test_invalid_hedge_falls_back_to_primary(self):
+        stats = HedgeStats()
+
+        async def primary():
+            await asyncio.sleep(0.05)
+            return "primary"
+
+        async def hedge():
+            return None
+
+        self.assertEqual(asyncio.run(run_hedged(primary, hedge, 0.01, stats)), "primary")
+        self.assertEqual(stats.snapshot()["default"]["win_rate"], 0.0)
+
+class TestCallLLMHedging(unittest.TestCase):
+    def setUp(self):
+        reset_client()
+        llm.RATE_LIMITER = ModelRateLimiter()
+        llm.BREAKERS = BreakerRegistry()
+        llm.HEDGE_STATS = HedgeStats()
+        self.settings = patch.dict(llm.HEDGE_SETTINGS, {"enabled": True, "percentile": 0.9, "min_samples": 3, "min_delay": 0.01})
+        self.settings.start()
+        # Default routes only; the live config.json may route stages elsewhere
+        self.router = patch.object(llm, 'ROUTER', ModelRouter("missing-config.json"))
+        self.router.start()
+
+    def tearDown(self):
+        self.settings.stop()
+        self.router.stop()
+
+    @patch('src.core.llm.genai.Client')
+    @patch('src.core.llm.os.getenv', return_value="fake_key")
+    def test_hedges_to_fallback_when_primary_is_slow(self, mock_getenv, mock_client_cls):
+        # Recent primary latencies ~10ms
+        for _ in range(3):
+            llm.BREAKERS.get('gemini-3-flash-preview').record_success(0.01)
+
+        async def generate(model, contents, **kwargs):
+            if model == 'gemini-3-flash-preview':
+                await asyncio.sleep(2)
+                return MagicMock(text="primary")
+            return MagicMock(text="fallback")
+
+        mock_client_cls.return_value.aio.models.generate_content = AsyncMock(side_effect=generate)
+
+        self.assertEqual(call_llm("prompt", stage="critic"), "fallback")
+        self.assertEqual(llm.HEDGE_STATS.snapshot()["critic"]["hedge_wins"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import json
+import tempfile
+import threading
+import logging
+import feedparser
+from sqlalchemy import create_engine
+from src.ingestion import IngestionModule, FeedCacheStore, load_ingestion_settings
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+RSS_BODY = b"<rss><channel><item><title>BTC</title><link>l1</link></item></channel></rss>"
+
+class TestConcurrentFetch(unittest.TestCase):
+    def test_slow_feed_is_recorded_as_timed_out(self):
+        """A feed that misses the deadline is skipped and reported, others are returned."""
+        ingestion = IngestionModule(fetch_deadline=0.2)
+        ingestion.rss_feeds = {"Fast": "fast_url", "Slow": "slow_url"}
+        release = threading.Event()
+
+        def fake_fetch(source_name, url):
+            if source_name == "Slow":
+                release.wait(2)
+                return []
+            return [{"title": "T", "link": "l1", "source": source_name, "id": "l1"}]
+
+        with patch.object(ingestion, 'fetch_rss_feed', side_effect=fake_fetch):
+            items = ingestion.fetch_news()
+        release.set()
+
+        self.assertEqual([i['source'] for i in items], ["Fast"])
+        self.assertEqual(ingestion.timed_out_sources, ["Slow"])
+
+    def test_sequential_mode_matches_feed_order(self):
+        ingestion = IngestionModule()
+        ingestion.rss_feeds = {"A": "a_url", "B": "b_url"}
+
+        def fake_fetch(source_name, url):
+            return [{"title": source_name, "link": url, "source": source_name, "id": url}]
+
+        with patch.object(ingestion, 'fetch_rss_feed', side_effect=fake_fetch):
+            sequential = ingestion.fetch_news(concurrent=False)
+            parallel = ingestion.fetch_news(concurrent=True)
+
+        self.assertEqual(sequential, parallel)
+        self.assertEqual(ingestion.timed_out_sources, [])
+
+    @patch('src.ingestion.http_get')
+    def test_fetch_rss_feed_uses_timeout(self, mock_get):
+        mock_get.return_value = MagicMock(status_code=200, headers={}, content=RSS_BODY)
+        ingestion = IngestionModule(feed_timeout=3, feed_cache=False)
+
+        items = ingestion.fetch_rss_feed("Src", "url")
+
+        self.assertEqual(mock_get.call_args.kwargs['timeout'], 3)
+        self.assertEqual(items[0]['title'], "BTC")
+        self.assertEqual(items[0]['source'], "Src")
+
+class TestFeedCache(unittest.TestCase):
+    def setUp(self):
+        # In-memory store shared by all sessions of this test
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+        self.store = FeedCacheStore(bind=self.engine)
+        self.ingestion = IngestionModule(feed_cache=self.store)
+
+    @patch('src.ingestion.feedparser.parse', wraps=feedparser.parse)
+    @patch('src.ingestion.http_get')
+    def test_not_modified_skips_parse(self, mock_get, mock_parse):
+        mock_get.return_value = MagicMock(status_code=200, headers={"ETag": '"v1"', "Last-Modified": "Mon"}, content=RSS_BODY)
+        first = self.ingestion.fetch_rss_feed("Src", "url")
+
+        mock_get.return_value = MagicMock(status_code=304, headers={}, content=b"")
+        second = self.ingestion.fetch_rss_feed("Src", "url")
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_parse.call_count, 1)
+        sent = mock_get.call_args.kwargs['headers']
+        self.assertEqual(sent["If-None-Match"], '"v1"')
+        self.assertEqual(sent["If-Modified-Since"], "Mon")
+
+    @patch('src.ingestion.feedparser.parse', wraps=feedparser.parse)
+    @patch('src.ingestion.http_get')
+    def test_unchanged_body_skips_parse_and_survives_restart(self, mock_get, mock_parse):
+        mock_get.return_value = MagicMock(status_code=200, headers={}, content=RSS_BODY)
+        self.ingestion.fetch_rss_feed("Src", "url")
+
+        # New store on the same DB simulates a restart
+        restarted = IngestionModule(feed_cache=FeedCacheStore(bind=self.engine))
+        items = restarted.fetch_rss_feed("Src", "url")
+
+        self.assertEqual(items[0]['title'], "BTC")
+        self.assertEqual(mock_parse.call_count, 1)
+
+class TestSharedHttpSession(unittest.TestCase):
+    def test_sources_share_one_pooled_session(self):
+        from src.ingestion import get_http_session, WhaleMonitor, MarketData
+        session = get_http_session()
+        self.assertIs(session, get_http_session())
+        self.assertIn("gzip", session.headers["Accept-Encoding"])
+
+        response = MagicMock()
+        response.json.return_value = {"bitcoin": {"usd": 100000, "usd_24h_change": 1.234}, "txs": []}
+        with patch.object(session, 'get', return_value=response) as mock_get:
+            MarketData().get_market_status("BTC")
+            WhaleMonitor().get_whale_movements("BTC")
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertTrue(all(c.kwargs['timeout'] for c in mock_get.call_args_list))
+
+class TestIngestionSettings(unittest.TestCase):
+    def test_config_selects_local_resolution(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "config.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"ingestion": {"event_resolution": "local", "dedup_threshold": None}}, f)
+            settings = load_ingestion_settings(path)
+        self.assertTrue(settings["stream_events"])  # Unset keys keep their defaults
+
+        ingestion = IngestionModule(feed_cache=False, fact_cache=False, settings=settings)
+        items = [{"id": "a1", "title": "SEC approves spot Bitcoin ETFs"}, {"id": "a2", "title": "SEC approves spot Bitcoin ETFs"}]
+        with patch('src.ingestion.resolve_events', return_value=[]) as mock_resolve:
+            ingestion.process_pipeline(items)
+
+        self.assertEqual(mock_resolve.call_args.kwargs["mode"], "local")
+        self.assertEqual(len(mock_resolve.call_args.args[0]), 2)  # Dedup disabled
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import logging
+from src.core.jsonutil import JsonStreamParser, parse_or_fix, parse_partial, repair_json
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+class TestJsonRepair(unittest.TestCase):
+    def test_valid_json_is_complete(self):
+        self.assertEqual(parse_partial('```json\n[{"a": 1}]\n```'), ([{"a": 1}], True))
+
+    def test_trailing_commas_and_unquoted_keys(self):
+        data, complete = parse_partial('{event_id: "e1", articles: ["a1", "a2",],}')
+        self.assertTrue(complete)
+        self.assertEqual(data, {"event_id": "e1", "articles": ["a1", "a2"]})
+
+    def test_python_literals(self):
+        self.assertEqual(parse_or_fix('{"ok": True, "value": None}'), {"ok": True, "value": None})
+
+    def test_truncated_array_keeps_complete_elements(self):
+        data, complete = parse_partial('[{"id": "e1", "facts": []}, {"id": "e2", "facts": ["cut')
+        self.assertFalse(complete)
+        # The cut-off element keeps only its complete fields; callers check required keys
+        self.assertEqual(data, [{"id": "e1", "facts": []}, {"id": "e2"}])
+
+    def test_truncated_nested_object(self):
+        data, complete = parse_partial('{"e1": {"facts": [], "confidence": 1.0}, "e2": {"facts": [')
+        self.assertFalse(complete)
+        self.assertEqual(data, {"e1": {"facts": [], "confidence": 1.0}})
+
+    def test_surrounding_prose_is_ignored(self):
+        self.assertEqual(parse_or_fix('Here you go: [["s0_a", "s1_b"]] Hope this helps!'), [["s0_a", "s1_b"]])
+
+    def test_brackets_inside_strings_are_left_alone(self):
+        text, truncated = repair_json('{"fact": "price [up], {down},", "n": 1,}')
+        self.assertFalse(truncated)
+        self.assertEqual(parse_or_fix(text), {"fact": "price [up], {down},", "n": 1})
+
+    def test_unsalvageable_returns_empty(self):
+        self.assertEqual(parse_or_fix("Sorry, I can't help with that."), {})
+        self.assertEqual(parse_or_fix(None), {})
+        self.assertEqual(parse_partial('{"a'), ({}, False))
+
+class TestJsonStreamParser(unittest.TestCase):
+    def feed_in_chunks(self, parser, text, size=5):
+        items = []
+        for i in range(0, len(text), size):
+            items.append(parser.feed(text[i:i + size]))
+        return items
+
+    def test_array_items_are_emitted_as_soon_as_complete(self):
+        parser = JsonStreamParser()
+        first = parser.feed('```json\n[{"id": "e1", "articles": ["a1", "a]2"]}, {"id": "e2"')
+        self.assertEqual(first, [{"id": "e1", "articles": ["a1", "a]2"]}])
+        self.assertFalse(parser.complete)
+
+        rest = parser.feed(', articles: [],}, 3]')
+        self.assertEqual(rest, [{"id": "e2", "articles": []}, 3])
+        self.assertTrue(parser.complete)
+
+    def test_chunk_boundaries_do_not_matter(self):
+        text = '[{"id": "e1", "t": "a, \\"quoted\\" {title}"}, ["x", "y"], "z"]'
+        parser = JsonStreamParser()
+        items = [item for batch in self.feed_in_chunks(parser, text, size=3) for item in batch]
+        self.assertEqual(items, [{"id": "e1", "t": 'a, "quoted" {title}'}, ["x", "y"], "z"])
+
+    def test_object_root_yields_pairs(self):
+        parser = JsonStreamParser()
+        self.assertEqual(parser.feed('{"e1": {"facts": []}, "e2": 0.5, "e3": {"fa'), [("e1", {"facts": []}), ("e2", 0.5)])
+
+    def test_truncated_stream_never_emits_partial_element(self):
+        parser = JsonStreamParser()
+        self.assertEqual(parser.feed('[{"id": "e1"}, {"id": "e2", "articles": ["a'), [{"id": "e1"}])
+        self.assertFalse(parser.complete)
+
+if __name__ == '__main__':
+    unittest.main()
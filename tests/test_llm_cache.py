@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import patch
+import os
+import asyncio
+import time
+import tempfile
+import logging
+import src.core.llm_cache as llm_cache
+from src.core.llm import call_llm
+from src.core.llm_cache import ResponseCache, SingleFlight, cache_key
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.db")
+
+    def tearDown(self):
+        llm_cache._cache = None
+        self.tmp.cleanup()
+
+    def test_ttl_lru_and_counters(self):
+        cache = ResponseCache(path=self.path, ttl_seconds=60, max_entries=2)
+        cache.put("k1", "m", "r1")
+        cache.put("k2", "m", "r2")
+        self.assertEqual(cache.get("k1"), "r1")   # k1 most recently used
+        cache.put("k3", "m", "r3")                # evicts k2
+
+        self.assertIsNone(cache.get("k2"))
+        self.assertEqual(cache.get("k3"), "r3")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 1, 2))
+
+    def test_expired_entries_are_purged_on_open(self):
+        ResponseCache(path=self.path, ttl_seconds=60).put("old", "m", "r")
+        env = {"LLM_CACHE_PATH": self.path, "LLM_CACHE_TTL": "60"}
+
+        with patch.dict(os.environ, dict(env, LLM_CACHE_MODE="replay")), \
+                patch('src.core.llm_cache.time.time', return_value=time.time() + 120):
+            self.assertEqual(llm_cache.get_response_cache().stats()["entries"], 1)  # Replay keeps everything
+
+        llm_cache._cache = None
+        with patch.dict(os.environ, dict(env, LLM_CACHE_MODE="cache")), \
+                patch('src.core.llm_cache.time.time', return_value=time.time() + 120):
+            self.assertEqual(llm_cache.get_response_cache().stats()["entries"], 0)
+
+    def test_key_depends_on_model_and_prompt(self):
+        self.assertNotEqual(cache_key("a", "p"), cache_key("b", "p"))
+        self.assertEqual(cache_key("a", "p", fallback="x"), cache_key("a", "p", fallback="x"))
+
+    @patch('src.core.llm._call_llm_uncached', return_value="live")
+    def test_record_then_replay_offline(self, mock_call):
+        llm_cache._cache = ResponseCache(path=self.path)
+
+        with patch.dict(os.environ, {"LLM_CACHE_MODE": "record"}):
+            self.assertEqual(call_llm("prompt"), "live")
+
+        mock_call.return_value = None
+        with patch.dict(os.environ, {"LLM_CACHE_MODE": "replay"}):
+            self.assertEqual(call_llm("prompt"), "live")
+            self.assertIsNone(call_llm("unrecorded prompt"))
+
+        self.assertEqual(mock_call.call_count, 1)
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_awaiters_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(*(flight.do_async("k", slow) for _ in range(3)))
+
+        self.assertEqual(asyncio.run(run()), ["result"] * 3)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.coalesced, 2)
+
+    def test_exception_reaches_every_waiter(self):
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("quota")
+
+        async def run():
+            return await asyncio.gather(*(flight.do_async("k", failing) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertEqual([type(r) for r in results], [RuntimeError] * 3)
+        self.assertEqual(flight._tasks, {})  # The next call starts fresh
+
+if __name__ == '__main__':
+    unittest.main()
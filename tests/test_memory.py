@@ -0,0 +1,198 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import hashlib
+import logging
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+
+# test_dry_run_v2 swaps chromadb for a MagicMock at import time; these tests need the real one
+if isinstance(sys.modules.get('chromadb'), MagicMock):
+    del sys.modules['chromadb']
+
+from src.core.embeddings import EmbeddingService
+from src.memory import DEFAULT_MEMORY_SETTINGS, MemoryModule, QueryCache, decayed_score
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+def hashing_embed(texts):
+    """Deterministic bag-of-words embedding, so tests never download a model."""
+    vectors = []
+    for text in texts:
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+        vectors.append(vector)
+    return vectors
+
+def days_ago(days):
+    return (datetime.utcnow() - timedelta(days=days)).isoformat()
+
+class MemoryBackendTests:
+    """Runs against every storage backend (see the subclasses at the bottom)."""
+    BACKEND = None
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.embedder = EmbeddingService(model=hashing_embed)
+        self.memory = self.make_memory()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def make_memory(self, **settings):
+        settings = dict(DEFAULT_MEMORY_SETTINGS, backend=self.BACKEND, **settings)
+        return MemoryModule(db_path=self.path, embedder=self.embedder, settings=settings)
+
+    # Bulk API
+
+    def test_store_many_is_one_upsert(self):
+        events = [
+            ("Bitcoin crashes after SEC announcement", {"source": "CoinDesk", "timestamp": "2023-01-01"}),
+            ("Whales buy the dip as ETH recovers", {"source": "WatcherGuru", "timestamp": "2023-01-02"}),
+            ("Bitcoin crashes after SEC announcement", {"source": "Duplicate", "timestamp": "2023-01-03"}),
+        ]
+        with patch.object(self.memory.store, 'upsert', wraps=self.memory.store.upsert) as upsert:
+            self.assertEqual(self.memory.store_many(events), 2)
+        upsert.assert_called_once()
+        self.assertEqual(self.memory.store.count(), 2)
+
+    def test_restoring_refreshes_instead_of_duplicating(self):
+        self.assertTrue(self.memory.store_news_event("ETF inflows hit record", {"source": "A", "timestamp": "2023-01-01"}))
+        self.assertTrue(self.memory.store_news_event("ETF inflows hit record", {"source": "B", "timestamp": "2023-02-01"}))
+        self.assertEqual(self.memory.store.count(), 1)
+        self.assertIn("Source: B", self.memory.retrieve_context("ETF inflows"))
+
+    def test_retrieve_many_returns_context_per_query(self):
+        self.memory.store_many([
+            ("Bitcoin crashes after SEC announcement", {"source": "CoinDesk", "timestamp": "2023-01-01"}),
+            ("Solana network outage halts blocks", {"source": "TheBlock", "timestamp": "2023-01-02"}),
+        ])
+        with patch.object(self.memory.store, 'query', wraps=self.memory.store.query) as query:
+            contexts = self.memory.retrieve_many(["SEC bitcoin", "solana outage"], n_results=1)
+        query.assert_called_once()
+        self.assertEqual(contexts, [
+            "Date: 2023-01-01, Event: Bitcoin crashes after SEC announcement, Source: CoinDesk",
+            "Date: 2023-01-02, Event: Solana network outage halts blocks, Source: TheBlock",
+        ])
+
+    def test_empty_collection_and_empty_input(self):
+        self.assertEqual(self.memory.retrieve_many(["anything", "else"]), ["", ""])
+        self.assertEqual(self.memory.retrieve_many([]), [])
+        self.assertEqual(self.memory.store_many([]), 0)
+
+    def test_entries_survive_reopening(self):
+        self.memory.store_news_event("Solana outage halts blocks", {"source": "TheBlock", "timestamp": "2023-01-02"})
+        reopened = self.make_memory()
+        self.assertEqual(reopened.store.count(), 1)
+        self.assertIn("Solana outage", reopened.retrieve_context("solana outage"))
+
+    # Query cache
+
+    def test_repeated_lookups_are_served_from_memory(self):
+        self.memory.store_news_event("Bitcoin crashes after SEC announcement", {"source": "CoinDesk", "timestamp": "2023-01-01"})
+        with patch.object(self.memory.store, 'query', wraps=self.memory.store.query) as query:
+            first = self.memory.retrieve_context("SEC  Bitcoin")
+            second = self.memory.retrieve_context("sec bitcoin")  # Same after normalization
+            self.memory.retrieve_many(["sec bitcoin", "ETH staking"])
+
+        self.assertEqual(first, second)
+        self.assertEqual(query.call_count, 2)
+        self.assertEqual(query.call_args.args[0].shape[0], 1)  # Only the new topic
+        self.assertEqual(self.memory.query_cache.stats()["hits"], 2)
+
+    def test_n_results_is_part_of_the_key(self):
+        self.memory.store_news_event("Bitcoin crashes after SEC announcement", {"source": "CoinDesk", "timestamp": "2023-01-01"})
+        self.memory.retrieve_context("sec bitcoin", n_results=1)
+        with patch.object(self.memory.store, 'query', wraps=self.memory.store.query) as query:
+            self.memory.retrieve_context("sec bitcoin", n_results=3)
+        query.assert_called_once()
+
+    def test_writes_invalidate(self):
+        self.memory.store_news_event("Bitcoin crashes after SEC announcement", {"source": "CoinDesk", "timestamp": "2023-01-01"})
+        before = self.memory.retrieve_context("solana outage")
+        self.memory.store_news_event("Solana outage halts blocks", {"source": "TheBlock", "timestamp": "2023-01-02"})
+        after = self.memory.retrieve_context("solana outage")
+
+        self.assertNotEqual(before, after)
+        self.assertTrue(after.startswith("Date: 2023-01-02"))
+        self.assertEqual(self.memory.query_cache.stats()["generation"], 2)
+
+    # Retention
+
+    def test_recent_events_outrank_stale_exact_matches(self):
+        memory = self.make_memory(decay_half_life_days=30)
+        memory.store_many([
+            ("sec sues binance", {"source": "Old", "timestamp": days_ago(400)}),
+            ("sec sues binance exchange", {"source": "New", "timestamp": days_ago(1)}),
+        ])
+        self.assertIn("Source: New", memory.retrieve_context("sec sues binance", n_results=1))
+
+        undecayed = self.make_memory(decay_half_life_days=0)
+        self.assertIn("Source: Old", undecayed.retrieve_context("sec sues binance", n_results=1))
+
+    def test_max_age_filter(self):
+        self.memory.store_many([
+            ("sec sues binance", {"source": "Old", "timestamp": days_ago(40)}),
+            ("sec drops binance case", {"source": "New", "timestamp": days_ago(2)}),
+        ])
+        context = self.memory.retrieve_context("sec binance", n_results=5, max_age_days=7)
+        self.assertIn("Source: New", context)
+        self.assertNotIn("Source: Old", context)
+
+    def test_compaction_prunes_by_age_and_count(self):
+        memory = self.make_memory(retention_days=30, max_documents=2)
+        memory.store_many([(f"event {n}", {"source": "S", "timestamp": days_ago(n * 10)}) for n in range(5)])
+        memory.retrieve_context("event")
+
+        result = memory.compact()
+
+        # 40 days is past retention; of the remaining four, the two oldest go
+        self.assertEqual(result, {"deleted": 3, "backfilled": 0, "remaining": 2})
+        self.assertEqual(sorted(doc for _, doc, _ in memory.store.items()), ["event 0", "event 1"])
+        self.assertEqual(memory.query_cache.stats()["entries"], 0)
+        self.assertIn("event 1", memory.retrieve_context("event 1", n_results=1))
+
+    def test_compaction_backfills_numeric_timestamps(self):
+        # Written before "ts" existed
+        self.memory.store.upsert(["legacy"], ["legacy event"], self.embedder.embed(["legacy event"]),
+                                 [{"source": "S", "timestamp": days_ago(3)}])
+        self.assertEqual(self.memory.retrieve_context("legacy event", max_age_days=7), "")
+
+        self.assertEqual(self.memory.compact()["backfilled"], 1)
+        self.assertIn("legacy event", self.memory.retrieve_context("legacy event", max_age_days=7))
+
+class TestChromaMemory(MemoryBackendTests, unittest.TestCase):
+    BACKEND = "chroma"
+
+class TestNumpyMemory(MemoryBackendTests, unittest.TestCase):
+    BACKEND = "numpy"
+
+class TestQueryCache(unittest.TestCase):
+    def test_ttl_and_lru(self):
+        cache = QueryCache(max_entries=2, ttl_seconds=60)
+        for key in ("a", "b", "c"):
+            cache.put(key, key.upper(), cache.generation)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), "C")
+
+        with patch('src.memory.time.time', return_value=time.time() + 120):
+            self.assertIsNone(cache.get("c"))
+
+    def test_result_computed_across_a_write_is_dropped(self):
+        cache = QueryCache()
+        generation = cache.generation
+        cache.invalidate()
+        cache.put("a", "stale", generation)
+        self.assertIsNone(cache.get("a"))
+
+    def test_decayed_score(self):
+        self.assertEqual(decayed_score(0.0, 30, 30), 0.5)
+        self.assertEqual(decayed_score(1.0, None, 30), 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
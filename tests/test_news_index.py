@@ -0,0 +1,60 @@
+import unittest
+import logging
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from src.database import Base
+from src.models import ProcessedNews
+from src.news_index import ProcessedNewsIndex
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+class TestProcessedNewsIndex(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.db.add(ProcessedNews(id="old1", title="Old", source="A"))
+        self.db.commit()
+
+        # Count SELECTs issued against processed_news
+        self.queries = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda conn, cursor, stmt, *a: self.queries.append(stmt) if "processed_news" in stmt else None)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_filter_new_uses_single_query_per_batch(self):
+        index = ProcessedNewsIndex()
+        index.load(self.db)
+        self.queries.clear()
+
+        items = [{"id": "old1"}, {"id": "new1"}, {"link": "new2"}]
+        new_items = index.filter_new(self.db, items)
+
+        self.assertEqual(new_items, [{"id": "new1"}, {"link": "new2"}])
+        self.assertEqual(len(self.queries), 1)
+        self.assertIn(" IN ", self.queries[0])
+
+        # Confirmed-new IDs are remembered, so the next cycle needs no DB query
+        self.queries.clear()
+        index.filter_new(self.db, items)
+        self.assertEqual(self.queries, [])
+
+    def test_add_many_keeps_index_in_sync(self):
+        index = ProcessedNewsIndex()
+        index.filter_new(self.db, [{"id": "new1"}])
+
+        index.add_many(["new1"])
+
+        self.assertTrue(index.contains("new1"))
+        self.assertEqual(index.filter_new(self.db, [{"id": "new1"}]), [])
+
+    def test_recent_window_is_bounded(self):
+        index = ProcessedNewsIndex(recent_size=2)
+        index.filter_new(self.db, [{"id": f"n{i}"} for i in range(5)])
+        self.assertEqual(len(index._recent_new), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,7 +12,7 @@ from src.agent import AnalysisAgent
 class TestPipeline(unittest.TestCase):
 
     def setUp(self):
-        self.ingestion = IngestionModule()
+        self.ingestion = IngestionModule(fact_cache=False)
         # Mock client during init to avoid real network calls
         with patch('src.agent.genai.Client') as MockClient:
             self.agent = AnalysisAgent()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import threading
+import logging
+from src.core.ratelimit import ModelRateLimiter, TokenBucket
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+class TestTokenBucket(unittest.TestCase):
+    def test_wait_time_reflects_refill_rate(self):
+        bucket = TokenBucket(per_minute=60)  # 1 per second
+        bucket.consume(60)
+        self.assertAlmostEqual(bucket.wait_time(2, bucket.updated), 2.0, places=3)
+
+class TestModelRateLimiter(unittest.TestCase):
+    def test_requests_queue_once_rpm_is_used_up(self):
+        limiter = ModelRateLimiter({"m": {"rpm": 2, "tpm": 1000}})
+        sleeps = []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+            # Simulate the passage of time by refilling the bucket
+            limiter._buckets["m"][0].level = 1.0
+
+        async def run():
+            for _ in range(3):
+                await limiter.acquire("m", tokens=10)
+
+        with patch('src.core.ratelimit.asyncio.sleep', side_effect=fake_sleep):
+            asyncio.run(run())
+
+        self.assertEqual(len(sleeps), 1)
+        self.assertAlmostEqual(sleeps[0], 30.0, delta=0.5)
+
+    def test_tpm_budget_is_enforced(self):
+        limiter = ModelRateLimiter({"m": {"rpm": 100, "tpm": 600}})
+        asyncio.run(limiter.acquire("m", tokens=600))
+        self.assertGreater(limiter._reserve("m", 300), 0)
+
+    def test_rate_adapts_on_429_and_recovers(self):
+        limiter = ModelRateLimiter({"m": {"rpm": 10, "tpm": 1000}})
+        limiter.on_rate_limited("m")
+        self.assertEqual(limiter.stats()["m"]["rpm"], 5.0)
+
+        for _ in range(10):
+            limiter.on_success("m")
+        self.assertEqual(limiter.stats()["m"]["rpm"], 10.0)
+
+    def test_callers_on_different_loops_share_budget(self):
+        limiter = ModelRateLimiter({"m": {"rpm": 60, "tpm": 100000}})
+        threads = [threading.Thread(target=lambda: asyncio.run(limiter.acquire("m", 1))) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        async def run():
+            await asyncio.gather(*(limiter.acquire("m", 1) for _ in range(20)))
+        asyncio.run(run())
+
+        self.assertLessEqual(limiter.stats()["m"]["requests_available"], 20.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock, patch
+import os
+import json
+import tempfile
+import logging
+import src.core.llm as llm
+from src.core.llm import call_llm, reset_client
+from src.core.routing import ModelRouter, DEFAULT_ROUTE
+from src.core.ratelimit import ModelRateLimiter
+from src.core.breaker import BreakerRegistry
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+def write_config(path, config, mtime=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+class TestModelRouter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "config.json")
+        write_config(self.path, {
+            "language": "th",
+            "model_routing": {
+                "default": {"fallback_model": "fb-default"},
+                "facts": {"model": "cheap-model", "temperature": 0.1}
+            }
+        }, mtime=1000)
+        self.router = ModelRouter(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_stage_route_layers_over_default(self):
+        route = self.router.get("facts")
+        self.assertEqual(route["model"], "cheap-model")
+        self.assertEqual(route["fallback_model"], "fb-default")
+        self.assertEqual(route["temperature"], 0.1)
+        self.assertIsNone(route["max_output_tokens"])
+
+        # Unrouted stage gets the default entry
+        route = self.router.get("critic")
+        self.assertEqual(route["model"], DEFAULT_ROUTE["model"])
+        self.assertEqual(route["fallback_model"], "fb-default")
+
+    def test_missing_config_uses_defaults(self):
+        router = ModelRouter(os.path.join(self.tmpdir.name, "missing.json"))
+        self.assertEqual(router.get("events"), DEFAULT_ROUTE)
+
+    def test_edits_to_config_are_picked_up(self):
+        self.assertEqual(self.router.get("events")["model"], DEFAULT_ROUTE["model"])
+
+        write_config(self.path, {"model_routing": {"events": {"model": "new-model"}}}, mtime=2000)
+
+        self.assertEqual(self.router.get("events")["model"], "new-model")
+
+    def test_update_persists_and_keeps_other_settings(self):
+        route = self.router.update("events", {"model": "m2", "max_output_tokens": 512, "bogus": 1})
+
+        self.assertEqual(route["model"], "m2")
+        self.assertEqual(route["max_output_tokens"], 512)
+
+        with open(self.path, encoding="utf-8") as f:
+            saved = json.load(f)
+        self.assertEqual(saved["language"], "th")
+        self.assertEqual(saved["model_routing"]["events"], {"model": "m2", "max_output_tokens": 512})
+        self.assertEqual(saved["model_routing"]["facts"]["model"], "cheap-model")
+
+        # A fresh router (e.g. after restart) sees the change
+        self.assertEqual(ModelRouter(self.path).get("events")["model"], "m2")
+
+class TestCallLLMRouting(unittest.TestCase):
+    def setUp(self):
+        reset_client()
+        llm.RATE_LIMITER = ModelRateLimiter()
+        llm.BREAKERS = BreakerRegistry(consecutive_threshold=4, cooldown_seconds=600)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmpdir.name, "config.json")
+        write_config(path, {"model_routing": {
+            "facts": {"model": "cheap-model", "fallback_model": "fb-model", "temperature": 0.1, "max_output_tokens": 256}
+        }})
+        self._router = llm.ROUTER
+        llm.ROUTER = ModelRouter(path)
+
+    def tearDown(self):
+        llm.ROUTER = self._router
+        self.tmpdir.cleanup()
+
+    def _mock_client(self, mock_client_cls):
+        client = MagicMock()
+        client.aio.models.generate_content = AsyncMock(return_value=MagicMock(text="ok"))
+        mock_client_cls.return_value = client
+        return client.aio.models.generate_content
+
+    @patch('src.core.llm.genai.Client')
+    @patch('src.core.llm.os.getenv', return_value="fake_key")
+    def test_stage_selects_model_and_generation_config(self, mock_getenv, mock_client_cls):
+        generate = self._mock_client(mock_client_cls)
+
+        self.assertEqual(call_llm("prompt", stage="facts"), "ok")
+
+        kwargs = generate.call_args.kwargs
+        self.assertEqual(kwargs["model"], "cheap-model")
+        self.assertEqual(kwargs["config"].temperature, 0.1)
+        self.assertEqual(kwargs["config"].max_output_tokens, 256)
+
+    @patch('src.core.llm.genai.Client')
+    @patch('src.core.llm.os.getenv', return_value="fake_key")
+    def test_explicit_arguments_override_route(self, mock_getenv, mock_client_cls):
+        generate = self._mock_client(mock_client_cls)
+
+        call_llm("prompt", model="explicit-model", stage="facts", temperature=0.9)
+
+        kwargs = generate.call_args.kwargs
+        self.assertEqual(kwargs["model"], "explicit-model")
+        self.assertEqual(kwargs["config"].temperature, 0.9)
+        self.assertEqual(kwargs["config"].max_output_tokens, 256)
+
+    @patch('src.core.llm.genai.Client')
+    @patch('src.core.llm.os.getenv', return_value="fake_key")
+    def test_unrouted_stage_sends_no_config(self, mock_getenv, mock_client_cls):
+        generate = self._mock_client(mock_client_cls)
+
+        call_llm("prompt", stage="analysis")
+
+        kwargs = generate.call_args.kwargs
+        self.assertEqual(kwargs["model"], DEFAULT_ROUTE["model"])
+        self.assertNotIn("config", kwargs)
+
+    @patch('src.core.llm.genai.Client')
+    @patch('src.core.llm.os.getenv', return_value="fake_key")
+    def test_response_schema_requests_json_output(self, mock_getenv, mock_client_cls):
+        generate = self._mock_client(mock_client_cls)
+        schema = {"type": "ARRAY", "items": {"type": "STRING"}}
+
+        call_llm("prompt", stage="analysis", response_schema=schema)
+
+        config = generate.call_args.kwargs["config"]
+        self.assertEqual(config.response_mime_type, "application/json")
+        self.assertEqual(config.response_schema, schema)
+
+if __name__ == '__main__':
+    unittest.main()
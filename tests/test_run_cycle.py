@@ -0,0 +1,186 @@
+import unittest
+from unittest.mock import DEFAULT, patch
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from src.database import Base
+from src.models import PendingAnalysis, ProcessedNews
+from src.agent import AnalysisAgent
+
+# Importing the app builds its module-level BotController; keep its RAG store, browser and
+# Twitter client out of the picture
+with patch('src.memory.MemoryModule'), patch('src.visualizer.Visualizer'), patch('src.publisher.TwitterPublisher'):
+    from src.web.app import BotController
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+COMPONENTS = ("IngestionModule", "WhaleMonitor", "MarketData", "MemoryModule", "AnalysisAgent",
+              "Visualizer", "TwitterPublisher")
+
+def make_item(name):
+    return {"id": f"id-{name}", "title": f"Bitcoin story {name}", "source": f"Source {name}", "link": f"http://x/{name}"}
+
+def fake_pipeline(items):
+    """One event per item; the source count comes from the item name's length (a < bb < ccc)."""
+    events = [{
+        "event_id": f"ev-{item['id']}",
+        "title": item['title'],
+        "source_count": len(item['id']) - 2,
+        "sources": [item['source']],
+        "facts": [{"fact": item['title'], "sources": [item['source']]}],
+        "items": [item]
+    } for item in items]
+    return sorted(events, key=lambda e: e['source_count'], reverse=True)
+
+def fake_batch(events, whale_data, history):
+    return {e['event_id']: {"sentiment": "BULLISH", "reasoning": "r", "tweet": f"tweet {e['event_id']}",
+                            "knowledge_base_entry": f"kb {e['event_id']}", "hallucination_check": []}
+            for e in events}
+
+class TestRunCycle(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+
+        with patch.multiple('src.web.app', **{name: DEFAULT for name in COMPONENTS}) as mocks:
+            mocks["AnalysisAgent"].return_value.batch_max_age_hours = 6
+            self.bot = BotController()
+
+        self.items = [make_item("a"), make_item("bb"), make_item("ccc")]
+        self.bot.ingestion.fetch_news.side_effect = lambda: list(self.items)
+        self.bot.ingestion.process_pipeline.side_effect = fake_pipeline
+        self.bot.whale_monitor.get_whale_movements.return_value = "Whale: quiet"
+        self.bot.market_data.get_market_status.return_value = {"price": 97000, "change_24h": 1.5}
+        self.bot.memory.retrieve_many.side_effect = lambda titles: [""] * len(titles)
+        self.bot.agent.batch_size = 3
+        self.bot.agent.analyze_batch.side_effect = fake_batch
+        self.bot.visualizer.capture_chart.return_value = "chart.png"
+        self.tweet_ids = iter(range(100, 200))
+        self.bot.publisher.post_tweet.side_effect = lambda text, chart: next(self.tweet_ids)
+
+    def tearDown(self):
+        self.db.close()
+
+    def processed(self):
+        return {row.id: row.sentiment for row in self.db.query(ProcessedNews).all()}
+
+    def posted(self):
+        return [c.args[0] for c in self.bot.publisher.post_tweet.call_args_list]
+
+    def test_one_batch_fills_later_slots(self):
+        self.bot.run_cycle(self.db)
+
+        self.bot.agent.analyze_batch.assert_called_once()
+        self.assertEqual(self.posted(), ["tweet ev-id-ccc"])
+        # Only the published event's items are processed; the rest wait in the backlog
+        self.assertEqual(self.processed(), {"id-ccc": "BULLISH"})
+        self.assertEqual(self.bot.analysis_backlog.pending_count(self.db), 2)
+
+        # Later cycles publish from the backlog without fetching
+        self.bot.run_cycle(self.db)
+        self.bot.run_cycle(self.db)
+        self.bot.run_cycle(self.db)
+
+        self.bot.agent.analyze_batch.assert_called_once()
+        self.bot.ingestion.process_pipeline.assert_called_once()
+        self.assertEqual(self.posted(), ["tweet ev-id-ccc", "tweet ev-id-bb", "tweet ev-id-a"])
+        self.assertEqual(self.processed(), {"id-a": "BULLISH", "id-bb": "BULLISH", "id-ccc": "BULLISH"})
+        self.assertEqual(self.bot.analysis_backlog.pending_count(self.db), 0)
+        self.bot.memory.store_news_event.assert_called()
+
+    def test_new_stories_wait_for_the_backlog(self):
+        self.bot.run_cycle(self.db)
+        # Fresh stories arrive every cycle
+        self.items = [make_item("dddd"), make_item("eeeee")]
+        self.bot.run_cycle(self.db)
+        self.bot.run_cycle(self.db)
+
+        self.bot.ingestion.fetch_news.assert_called_once()
+        self.bot.agent.analyze_batch.assert_called_once()
+        self.assertEqual(self.posted(), ["tweet ev-id-ccc", "tweet ev-id-bb", "tweet ev-id-a"])
+
+        # The backlog has run dry, so the next cycle analyzes the new stories
+        self.bot.run_cycle(self.db)
+        self.assertEqual(self.bot.agent.analyze_batch.call_count, 2)
+        self.assertEqual(self.posted()[-1], "tweet ev-id-eeeee")
+
+    def test_failed_publish_keeps_the_entry_pending(self):
+        self.bot.publisher.post_tweet.side_effect = lambda text, chart: None
+        self.bot.run_cycle(self.db)
+
+        self.assertEqual(self.bot.last_run_status, "Failed (Publish Error)")
+        self.assertEqual(self.processed(), {})
+        self.assertEqual(self.bot.analysis_backlog.pending_count(self.db), 3)
+        self.bot.memory.store_news_event.assert_not_called()
+
+        # The next slot retries the same analysis without re-running the pipeline
+        self.bot.publisher.post_tweet.side_effect = lambda text, chart: 101
+        self.bot.run_cycle(self.db)
+
+        self.bot.ingestion.process_pipeline.assert_called_once()
+        self.assertEqual(self.posted(), ["tweet ev-id-ccc", "tweet ev-id-ccc"])
+        self.assertEqual(self.processed(), {"id-ccc": "BULLISH"})
+
+    def test_expired_entries_release_their_items(self):
+        self.bot.run_cycle(self.db)
+        self.db.query(PendingAnalysis).update({"created_at": datetime.utcnow() - timedelta(hours=7)})
+        self.db.commit()
+
+        self.bot.run_cycle(self.db)
+
+        # The stale analyses are dropped and their items go through the pipeline again
+        second_batch = self.bot.ingestion.process_pipeline.call_args_list[1].args[0]
+        self.assertEqual(sorted(item['id'] for item in second_batch), ["id-a", "id-bb"])
+        self.assertEqual(self.posted(), ["tweet ev-id-ccc", "tweet ev-id-bb"])
+        self.assertEqual(self.processed(), {"id-bb": "BULLISH", "id-ccc": "BULLISH"})
+
+    def test_only_the_published_entry_is_reviewed(self):
+        def batch_with_context(events, whale_data, history):
+            results = fake_batch(events, whale_data, history)
+            for analysis in results.values():
+                analysis["critic_context"] = {"facts": "f", "evidence": ["f"]}
+            return results
+
+        def review(analysis):
+            analysis = dict(analysis)
+            del analysis["critic_context"]
+            analysis["tweet"] = "reviewed " + analysis["tweet"]
+            return analysis
+
+        self.bot.agent.analyze_batch.side_effect = batch_with_context
+        self.bot.agent.review_analysis.side_effect = review
+        self.bot.publisher.post_tweet.side_effect = lambda text, chart: None
+        self.bot.run_cycle(self.db)
+
+        self.bot.agent.review_analysis.assert_called_once()
+        self.assertEqual(self.posted(), ["reviewed tweet ev-id-ccc"])
+
+        # The retry posts the stored review instead of critiquing again
+        self.bot.publisher.post_tweet.side_effect = lambda text, chart: 101
+        self.bot.run_cycle(self.db)
+
+        self.bot.agent.review_analysis.assert_called_once()
+        self.assertEqual(self.posted(), ["reviewed tweet ev-id-ccc", "reviewed tweet ev-id-ccc"])
+
+    def test_fallback_analysis_is_never_queued(self):
+        self.bot.agent.analyze_batch.side_effect = lambda events, whale, history: {}
+        self.bot.agent.analyze_situation.return_value = AnalysisAgent()._fallback_response("quota")
+
+        self.bot.run_cycle(self.db)
+
+        self.bot.agent.analyze_situation.assert_called_once()
+        self.bot.publisher.post_tweet.assert_not_called()
+        self.assertEqual(self.bot.analysis_backlog.pending_count(self.db), 0)
+        self.assertEqual(self.processed(), {})
+
+        # Nothing was consumed: the next cycle analyzes the same items again
+        self.bot.agent.analyze_batch.side_effect = fake_batch
+        self.bot.run_cycle(self.db)
+        self.assertEqual(self.posted(), ["tweet ev-id-ccc"])
+
+if __name__ == '__main__':
+    unittest.main()
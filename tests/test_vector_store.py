@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import logging
+import shutil
+import tempfile
+import numpy as np
+
+# test_dry_run_v2 swaps chromadb for a MagicMock at import time; these tests need the real one
+if isinstance(sys.modules.get('chromadb'), MagicMock):
+    del sys.modules['chromadb']
+
+from src.vector_store import NumpyStore, make_store
+
+# Disable logging during tests
+logging.disable(logging.CRITICAL)
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+class VectorStoreTests:
+    """Storage contract shared by every backend (see the subclasses at the bottom)."""
+    BACKEND = None
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = make_store(self.BACKEND, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def fill(self):
+        self.store.upsert(
+            ["a", "b", "c"], ["doc a", "doc b", "doc c"],
+            np.vstack([unit(1, 0, 0), unit(1, 1, 0), unit(0, 0, 1)]),
+            [{"ts": 100.0}, {"ts": 200.0}, {"source": "no ts"}]
+        )
+
+    def test_nearest_first_with_squared_l2_distance(self):
+        self.fill()
+        [results] = self.store.query(np.vstack([unit(1, 0, 0)]), 2)
+        self.assertEqual([doc for doc, _, _ in results], ["doc a", "doc b"])
+        self.assertAlmostEqual(results[0][2], 0.0, places=5)
+        self.assertAlmostEqual(results[1][2], 2 - 2 * unit(1, 1, 0)[0], places=5)
+
+    def test_min_ts_excludes_older_and_undated_entries(self):
+        self.fill()
+        [results] = self.store.query(np.vstack([unit(0, 0, 1)]), 3, min_ts=150.0)
+        self.assertEqual([doc for doc, _, _ in results], ["doc b"])
+
+    def test_upsert_overwrites_and_delete_removes(self):
+        self.fill()
+        self.store.upsert(["a"], ["doc a v2"], np.vstack([unit(0, 1, 0)]), [{"ts": 300.0}])
+        self.store.delete(["b", "missing"])
+
+        self.assertEqual(self.store.count(), 2)
+        self.assertEqual(sorted(doc for _, doc, _ in self.store.items()), ["doc a v2", "doc c"])
+        [results] = self.store.query(np.vstack([unit(0, 1, 0)]), 1)
+        self.assertEqual(results[0][:2], ("doc a v2", {"ts": 300.0}))
+
+    def test_update_metadatas(self):
+        self.fill()
+        self.store.update_metadatas(["c"], [{"ts": 500.0}])
+        [results] = self.store.query(np.vstack([unit(0, 0, 1)]), 3, min_ts=400.0)
+        self.assertEqual([doc for doc, _, _ in results], ["doc c"])
+
+    def test_several_queries_at_once(self):
+        self.fill()
+        results = self.store.query(np.vstack([unit(1, 0, 0), unit(0, 0, 1)]), 1)
+        self.assertEqual([r[0][0] for r in results], ["doc a", "doc c"])
+
+class TestChromaStore(VectorStoreTests, unittest.TestCase):
+    BACKEND = "chroma"
+
+class TestNumpyStore(VectorStoreTests, unittest.TestCase):
+    BACKEND = "numpy"
+
+    def test_grows_past_initial_capacity_and_reopens(self):
+        vectors = np.random.default_rng(0).normal(size=(NumpyStore.MIN_CAPACITY + 10, 8))
+        ids = [f"id{i}" for i in range(len(vectors))]
+        self.store.upsert(ids, ids, vectors, [{} for _ in ids])
+
+        reopened = NumpyStore(self.path)
+        self.assertEqual(reopened.count(), len(ids))
+        [results] = reopened.query(vectors[-1:], 1)
+        self.assertEqual(results[0][0], ids[-1])
+
+    def test_dimension_mismatch_is_rejected(self):
+        self.fill()
+        with self.assertRaises(ValueError):
+            self.store.upsert(["d"], ["doc d"], np.ones((1, 5)), [{}])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            make_store("faiss", self.path)
+
+if __name__ == '__main__':
+    unittest.main()